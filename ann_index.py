@@ -0,0 +1,108 @@
+"""
+Approximate nearest-neighbour index for the FaceTrack gallery.
+
+Implements an inverted-file (IVF) index in plain NumPy: the gallery samples are
+partitioned with k-means, each sample is assigned to its nearest centroid, and a
+query only scans the samples of the `nprobe` partitions whose centroids are
+closest to it. `nprobe` is the recall/latency knob - probing more partitions
+approaches the exact scan. The candidates found this way are re-ranked exactly by
+the gallery (see FaceGallery.match_batch), so the index only decides *which*
+employees are scored, never the score itself.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Galleries smaller than this are scanned exactly; partitioning does not pay off
+MIN_TRAIN_SAMPLES = 2048
+
+# Upper bound on the number of samples used to fit the centroids
+MAX_TRAIN_SAMPLES_PER_LIST = 64
+
+
+def squared_distances(queries, points, point_sq_norms=None):
+    """Squared Euclidean distances between (q, d) queries and (n, d) points"""
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum('ij,ij->i', points, points)
+    d2 = queries @ points.T
+    d2 *= -2.0
+    d2 += point_sq_norms[None, :]
+    d2 += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return np.maximum(d2, 0.0, out=d2)
+
+
+def kmeans(data, n_clusters, iterations=12, seed=0):
+    """Lloyd's k-means on float32 data; returns (n_clusters, d) centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = np.argmin(squared_distances(data, centroids), axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters on random points so every list stays usable
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file partitioning of gallery samples around k-means centroids"""
+
+    def __init__(self, n_lists=0, nprobe=8, rerank=16, seed=0):
+        """
+        n_lists: number of partitions (0 picks ~sqrt(samples) at training time)
+        nprobe: partitions scanned per query; higher means better recall
+        rerank: number of candidate employees scored exactly per query
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.seed = seed
+        self.centroids = None
+        self.trained_size = 0
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def needs_training(self, size):
+        """True when the gallery is large enough and has outgrown the centroids"""
+        if size < MIN_TRAIN_SAMPLES:
+            return False
+        return not self.trained or size > 4 * self.trained_size
+
+    def train(self, matrix):
+        """Fit the partition centroids on (a sample of) the gallery matrix"""
+        size = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(size)))
+        n_lists = min(n_lists, size)
+
+        sample_size = min(size, n_lists * MAX_TRAIN_SAMPLES_PER_LIST)
+        rng = np.random.default_rng(self.seed)
+        sample = matrix[rng.choice(size, sample_size, replace=False)]
+
+        self.centroids = kmeans(np.ascontiguousarray(sample, dtype=np.float32), n_lists, seed=self.seed)
+        self.trained_size = size
+        logger.info(f"Trained IVF index with {n_lists} lists on {sample_size} of {size} samples")
+
+    def assign(self, vectors):
+        """Partition id of the nearest centroid for each vector"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        return np.argmin(squared_distances(vectors, self.centroids), axis=1).astype(np.int32)
+
+    def probe(self, query):
+        """Ids of the `nprobe` partitions closest to a single query"""
+        d2 = squared_distances(np.asarray(query, dtype=np.float32).reshape(1, -1), self.centroids)[0]
+        nprobe = min(self.nprobe, len(d2))
+        if nprobe == len(d2):
+            return np.arange(len(d2))
+        return np.argpartition(d2, nprobe - 1)[:nprobe]
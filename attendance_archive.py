@@ -0,0 +1,317 @@
+"""
+Time-partitioned attendance archive for the XML storage backend.
+
+Instead of one ever-growing attendance.xml, records are kept in one XML file per
+day or month under face_data/attendance/:
+
+    index.json              {"granularity", "partitions": {key: {"file", "first", "last", "count", "sealed"}}}
+    2026-10.xml             the current partition, indented like attendance.xml
+    2026-09.xml.gz          a sealed partition: sorted, unindented and (optionally) gzipped
+
+The index keeps each partition's time range and record count, so a query parses
+only the partitions that overlap its range, newest first, and stops once the
+page is full; counting the history reads no partition at all. Parsed partitions
+are cached as AttendanceIndex objects, least recently used first out, up to a
+record budget: a history that fits is parsed once, a larger one keeps the hot
+(usually recent) partitions in memory.
+
+Rollover is automatic: a record goes to the partition named after its own
+timestamp, which is created on first use. Once a period has ended its partition
+is sealed on the next write. Late records still land in the right partition,
+sealed or not.
+"""
+
+import bisect
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# Partition key = this many leading characters of the ISO timestamp
+KEY_LENGTHS = {"day": 10, "month": 7}
+
+INDEX_FILE = "index.json"
+
+
+class AttendanceIndex:
+    """
+    Time-ordered in-memory index of attendance records.
+
+    Records are kept in lists sorted by (timestamp, id): one for all records and
+    one per employee and per type. A query bisects to the end of its time range
+    and walks backwards, so "latest N" or "this employee this month" touch only
+    the records they return.
+    """
+
+    def __init__(self, records=()):
+        self._lock = threading.Lock()
+        self._all = []
+        self._by_employee = {}
+        self._by_type = {}
+        for record in sorted(records, key=lambda r: (r["timestamp"], r["id"])):
+            self._insert(record)
+
+    def __len__(self):
+        return len(self._all)
+
+    def _insert(self, record):
+        entry = (record["timestamp"], record["id"], record)
+        for entries in (self._all,
+                        self._by_employee.setdefault(record["employee_id"], []),
+                        self._by_type.setdefault(record["type"], [])):
+            # Check-ins arrive in time order, so this is almost always an append
+            if not entries or entries[-1][:2] <= entry[:2]:
+                entries.append(entry)
+            else:
+                bisect.insort(entries, entry)
+
+    def add(self, record):
+        with self._lock:
+            self._insert(record)
+
+    def records(self):
+        """All records in (timestamp, id) order"""
+        with self._lock:
+            return [entry[2] for entry in self._all]
+
+    def ids(self):
+        with self._lock:
+            return {entry[1] for entry in self._all}
+
+    def query(self, since=None, until=None, employee_id=None, attendance_type=None, after=None, limit=100):
+        """Matching records newest first; `after` is a decoded cursor"""
+        with self._lock:
+            if employee_id is not None:
+                entries = self._by_employee.get(employee_id, [])
+            elif attendance_type is not None:
+                entries = self._by_type.get(attendance_type, [])
+            else:
+                entries = self._all
+
+            hi = len(entries)
+            if until is not None:
+                hi = bisect.bisect_left(entries, (until,))
+            if after is not None:
+                hi = min(hi, bisect.bisect_left(entries, after))
+            lo = bisect.bisect_left(entries, (since,)) if since is not None else 0
+
+            results = []
+            for index in range(hi - 1, lo - 1, -1):
+                record = entries[index][2]
+                if attendance_type is not None and record["type"] != attendance_type:
+                    continue
+                results.append(dict(record))
+                if len(results) >= limit:
+                    break
+            return results
+
+
+def _replace_durably(tmp_path, path):
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AttendanceArchive:
+    """
+    Attendance records in per-day or per-month XML partitions.
+
+    Not thread-safe by itself: XMLStorage serializes every call under its
+    xml_lock, which the journal's compaction also holds.
+    """
+
+    def __init__(self, directory, granularity=None, compress=True, cache_records=100000):
+        """
+        directory: archive directory (holds index.json and the partitions)
+        granularity: "day" or "month" for a new archive; an existing archive
+                     keeps the granularity it was created with
+        compress: gzip partitions when they are sealed
+        cache_records: records of parsed partitions kept in memory (the most
+                       recently used partition is always kept)
+        """
+        self.directory = directory
+        self.compress = compress
+        self.cache_records = cache_records
+        os.makedirs(directory, exist_ok=True)
+
+        index = self._read_index()
+        stored = index.get("granularity")
+        if stored and granularity and stored != granularity:
+            logger.warning(f"Attendance archive {directory} is partitioned by {stored}; ignoring {granularity!r}")
+        self.granularity = stored or granularity or "month"
+        if self.granularity not in KEY_LENGTHS:
+            raise ValueError(f"Unknown attendance partition granularity: {self.granularity}")
+        self._key_length = KEY_LENGTHS[self.granularity]
+        self.partitions = index.get("partitions", {})
+        self._cache = OrderedDict()
+        if not stored:
+            self._write_index()
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, INDEX_FILE))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def partition_key(self, timestamp):
+        """Partition of an ISO timestamp: "YYYY-MM" or "YYYY-MM-DD" """
+        return timestamp[:self._key_length]
+
+    # ------------------------------------------------------------------
+    # Index and partition files
+    # ------------------------------------------------------------------
+    def _read_index(self):
+        try:
+            with open(self._path(INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_index(self):
+        tmp_path = self._path(INDEX_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"granularity": self.granularity, "partitions": self.partitions}, f, indent=1, sort_keys=True)
+        _replace_durably(tmp_path, self._path(INDEX_FILE))
+
+    def _read_partition(self, key):
+        path = self._path(self.partitions[key]["file"])
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            root = etree.parse(f).getroot()
+        return AttendanceIndex(dict(element.attrib) for element in root.iter("record"))
+
+    def _write_partition(self, key, partition, sealed):
+        """Rewrite a partition file in (timestamp, id) order; returns its index entry"""
+        root = etree.Element("attendance_records")
+        records = partition.records()
+        for record in records:
+            element = etree.SubElement(root, "record")
+            for field in ("id", "employee_id", "timestamp", "type"):
+                element.set(field, record[field])
+        tree = etree.ElementTree(root)
+
+        name = f"{key}.xml.gz" if sealed and self.compress else f"{key}.xml"
+        tmp_path = self._path(name + ".tmp")
+        if name.endswith(".gz"):
+            with gzip.open(tmp_path, "wb") as f:
+                tree.write(f, encoding="utf-8", xml_declaration=True)
+        else:
+            tree.write(tmp_path, encoding="utf-8", xml_declaration=True, pretty_print=not sealed)
+        _replace_durably(tmp_path, self._path(name))
+        return self._entry(name, partition, sealed)
+
+    @staticmethod
+    def _entry(name, partition, sealed):
+        records = partition.records()
+        return {
+            "file": name,
+            "first": records[0]["timestamp"] if records else "",
+            "last": records[-1]["timestamp"] if records else "",
+            "count": len(records),
+            "sealed": sealed,
+        }
+
+    def _load(self, key):
+        partition = self._cache.get(key)
+        if partition is None:
+            partition = self._read_partition(key) if key in self.partitions else AttendanceIndex()
+            self._cache[key] = partition
+            cached = sum(len(cached_partition) for cached_partition in self._cache.values())
+            while cached > self.cache_records and len(self._cache) > 1:
+                cached -= len(self._cache.popitem(last=False)[1])
+        self._cache.move_to_end(key)
+        return partition
+
+    def _remove_stale(self, keys):
+        """Delete the files of the given partitions that the index no longer names"""
+        for key in keys:
+            for name in (f"{key}.xml", f"{key}.xml.gz"):
+                if name != self.partitions[key]["file"] and os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, records, skip_existing=False):
+        """
+        Add records to their partitions (one rewrite per touched partition), then
+        seal partitions whose period has ended. Used as the journal's compaction
+        writer; skip_existing drops records already archived (crash recovery).
+        """
+        groups = {}
+        for record in records:
+            groups.setdefault(self.partition_key(record["timestamp"]), []).append(record)
+
+        for key, group in sorted(groups.items()):
+            partition = self._load(key)
+            sealed = self.partitions.get(key, {}).get("sealed", False)
+            if skip_existing:
+                existing = partition.ids()
+                group = [record for record in group if record["id"] not in existing]
+            for record in group:
+                partition.add(record)
+            if group or key not in self.partitions:
+                self.partitions[key] = self._write_partition(key, partition, sealed)
+            else:
+                # Nothing new, but the index may predate an interrupted write
+                self.partitions[key] = self._entry(self.partitions[key]["file"], partition, sealed)
+        sealed_keys = self._seal_ended()
+        self._write_index()
+        self._remove_stale(set(groups) | set(sealed_keys))
+
+    def _seal_ended(self, now=None):
+        current = self.partition_key((now or datetime.now()).isoformat())
+        sealed_keys = [key for key in sorted(self.partitions) if key < current and not self.partitions[key]["sealed"]]
+        for key in sealed_keys:
+            self.partitions[key] = self._write_partition(key, self._load(key), sealed=True)
+            logger.info(f"Sealed attendance partition {key} ({self.partitions[key]['count']} records)")
+        return sealed_keys
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def count(self):
+        """Total number of archived records (from the index alone)"""
+        return sum(entry["count"] for entry in self.partitions.values())
+
+    def overlapping(self, since=None, until=None, after=None):
+        """Keys of the partitions that can hold matching records, newest first"""
+        keys = []
+        for key in sorted(self.partitions, reverse=True):
+            entry = self.partitions[key]
+            if not entry["count"]:
+                continue
+            if since is not None and entry["last"] < since:
+                # Partitions are disjoint and ordered, so every older one ends even earlier
+                break
+            if until is not None and entry["first"] >= until:
+                continue
+            if after is not None and entry["first"] > after[0]:
+                continue
+            keys.append(key)
+        return keys
+
+    def query(self, since=None, until=None, employee_id=None, attendance_type=None, after=None, limit=100):
+        """Matching records newest first, reading only overlapping partitions"""
+        results = []
+        for key in self.overlapping(since, until, after):
+            results.extend(self._load(key).query(since, until, employee_id, attendance_type, after,
+                                                 limit - len(results)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def records(self):
+        """Every archived record in time order (parses all partitions)"""
+        records = []
+        for key in sorted(self.partitions):
+            records.extend(dict(record) for record in self._load(key).records())
+        return records
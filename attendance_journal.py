@@ -0,0 +1,262 @@
+"""
+Append-only attendance journal for the FaceTrack recognition server.
+
+A check-in appends one JSON line to `attendance.journal` instead of re-parsing and
+re-writing the whole attendance XML file. A background flusher fsyncs the journal
+in batches (group commit), and a background compactor periodically folds the
+journaled records into `attendance.xml` with a single parse/write, so existing
+consumers of the XML file keep working. With a partitioned attendance archive the
+compactor hands the records to the archive's writer instead.
+
+Records that are journaled but not yet compacted are kept in memory and exposed
+through pending_records() so readers see them immediately. On startup any journal
+left behind by a crash is replayed (a torn last line is ignored) and compacted.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+
+class AttendanceJournal:
+    """Line-delimited JSON journal of attendance records compacted into XML"""
+
+    def __init__(self, journal_path, xml_path, xml_lock, flush_interval=0.05,
+                 compact_interval=30.0, compact_threshold=1000, wait_durable=False, writer=None):
+        """
+        journal_path: active journal file (JSON lines)
+        xml_path: attendance XML file the journal is compacted into
+        xml_lock: lock guarding xml_path, shared with the other XML readers/writers
+        flush_interval: seconds between batched fsyncs
+        compact_interval: seconds between background compactions
+        compact_threshold: pending record count that triggers an early compaction
+        wait_durable: make append() block until its record has been fsynced
+        writer: optional callable(records, skip_existing) that persists compacted
+                records instead of appending them to xml_path
+        """
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.xml_path = xml_path
+        self.xml_lock = xml_lock
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.compact_threshold = compact_threshold
+        self.wait_durable = wait_durable
+        self.writer = writer or self._write_xml
+
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._compact_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+        self._file = None
+        self._pending = []
+        self._compacting = []
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._started = False
+        self._threads = []
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Recover leftovers from a previous run and start the background threads"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._recover()
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+            for target, name in ((self._flush_loop, "journal-flusher"), (self._compact_loop, "journal-compactor")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+            logger.info(f"Attendance journal started at {self.journal_path}")
+
+    def close(self):
+        """Flush, compact everything into the XML file and stop the threads"""
+        if not self._started:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._sync()
+        self.compact()
+        with self._lock:
+            self._file.close()
+            self._started = False
+
+    def _recover(self):
+        """Replay journal files left by a previous process and compact them"""
+        for path in (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                records = self._read_journal(path)
+                if records:
+                    logger.info(f"Recovered {len(records)} attendance records from {path}")
+                self._compacting.extend(records)
+        if self._compacting:
+            with self.xml_lock:
+                # A crash between the XML replace and the journal removal would
+                # otherwise replay records that are already in the XML file
+                self.writer(self._compacting, skip_existing=True)
+                self._compacting = []
+        for path in (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _read_journal(path):
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn write at the tail of the journal; everything before it is intact
+                    logger.warning(f"Skipping corrupt journal line in {path}")
+        return records
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, record, wait=True):
+        """
+        Journal one attendance record (a dict of XML attributes) and return its
+        sequence number. wait=False skips the wait_durable fsync wait, so the
+        caller can do it with wait_synced() after releasing its own locks.
+        """
+        self.start()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending.append(record)
+            self._written_seq += 1
+            seq = self._written_seq
+            if len(self._pending) >= self.compact_threshold:
+                self._wakeup.set()
+            if wait:
+                self._wait_synced(seq)
+        return seq
+
+    def wait_synced(self, seq):
+        """With wait_durable, block until the record with this sequence number is fsynced"""
+        with self._lock:
+            self._wait_synced(seq)
+
+    def _wait_synced(self, seq):
+        if self.wait_durable:
+            while self._synced_seq < seq and not self._stopping.is_set():
+                self._flushed.wait()
+
+    def _sync(self):
+        """fsync everything written so far and wake durable writers"""
+        with self._lock:
+            if self._synced_seq == self._written_seq or self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._synced_seq = self._written_seq
+            self._flushed.notify_all()
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self._sync()
+            except Exception as e:
+                logger.error(f"Error syncing attendance journal: {e}")
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def _compact_loop(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error compacting attendance journal: {e}")
+
+    def compact(self):
+        """Fold all pending records into the attendance XML file"""
+        with self._compact_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                # Rotate: the current journal becomes the compaction input
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced_seq = self._written_seq
+                self._flushed.notify_all()
+                self._file.close()
+                if os.path.exists(self.compacting_path):
+                    # A previous compaction failed; keep its input and add to it
+                    with open(self.journal_path, "rb") as src, open(self.compacting_path, "ab") as dst:
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.compacting_path)
+                self._file = open(self.journal_path, "a", encoding="utf-8")
+                self._compacting.extend(self._pending)
+                self._pending = []
+
+            count = len(self._compacting)
+            with self.xml_lock:
+                self.writer(self._compacting)
+                self._compacting = []
+            os.remove(self.compacting_path)
+            logger.info(f"Compacted {count} attendance records into {self.xml_path}")
+            return count
+
+    def _write_xml(self, records, skip_existing=False):
+        """Append records to the XML file with one parse and an atomic replace"""
+        parser = etree.XMLParser(remove_blank_text=True)
+        tree = etree.parse(self.xml_path, parser)
+        root = tree.getroot()
+        existing = {element.get("id") for element in root.iter("record")} if skip_existing else ()
+        for record in records:
+            if record["id"] in existing:
+                continue
+            element = etree.SubElement(root, "record")
+            for key in ("id", "employee_id", "timestamp", "type"):
+                element.set(key, record[key])
+
+        tmp_path = self.xml_path + ".tmp"
+        tree.write(tmp_path, encoding="utf-8", xml_declaration=True, pretty_print=True)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.xml_path)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def pending_records(self):
+        """
+        Records journaled but not yet in the XML file.
+
+        Call while holding xml_lock so a concurrent compaction cannot move records
+        between the XML file and this list mid-read. The journal must have been
+        started first, since startup recovery itself takes xml_lock.
+        """
+        with self._lock:
+            return self._compacting + self._pending
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._compacting) + len(self._pending)
@@ -0,0 +1,92 @@
+"""
+Running attendance counters for the /api/stats endpoint.
+
+AttendanceCounters keeps the total number of attendance records and today's
+IN/OUT counts and unique attendees in memory. It is rebuilt once from storage at
+startup and updated on every recorded check-in, so reading the stats does not
+scan the attendance history. Today's counters reset lazily when the local date
+changes. Processes sharing one database only see their own check-ins, so they
+rebuild whenever the counts are older than they can accept (age()).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Page size used when reading today's records during a rebuild
+REBUILD_PAGE = 1000
+
+
+class AttendanceCounters:
+    """Attendance total plus today's IN/OUT counts and unique attendees"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+        self._day = datetime.now().date()
+        self._today = {"IN": 0, "OUT": 0}
+        self._attendees = set()
+        self._rebuilt_at = None
+
+    def age(self):
+        """Seconds since the last rebuild (None before the first)"""
+        rebuilt_at = self._rebuilt_at
+        return None if rebuilt_at is None else time.monotonic() - rebuilt_at
+
+    def _roll_day(self, day):
+        # Caller holds the lock
+        if day != self._day:
+            self._day = day
+            self._today = {"IN": 0, "OUT": 0}
+            self._attendees = set()
+
+    def rebuild(self, storage):
+        """Recount from storage: one count plus a query over today's records"""
+        day = datetime.now().date()
+        total = storage.attendance_count()
+        since = datetime.combine(day, datetime.min.time()).isoformat()
+
+        today = {"IN": 0, "OUT": 0}
+        attendees = set()
+        after = None
+        while True:
+            page = storage.query_attendance(since=since, after=after, limit=REBUILD_PAGE)
+            for record in page:
+                today[record["type"]] = today.get(record["type"], 0) + 1
+                attendees.add(record["employee_id"])
+            if len(page) < REBUILD_PAGE:
+                break
+            after = (page[-1]["timestamp"], page[-1]["id"])
+
+        with self._lock:
+            self._total = total
+            self._day = day
+            self._today = today
+            self._attendees = attendees
+            first = self._rebuilt_at is None
+            self._rebuilt_at = time.monotonic()
+        (logger.info if first else logger.debug)(f"Counted {total} attendance records, {sum(today.values())} today")
+
+    def record(self, employee_id, attendance_type, timestamp):
+        """Count a newly recorded check-in (timestamp is its ISO string)"""
+        day = datetime.fromisoformat(timestamp).date()
+        with self._lock:
+            self._total += 1
+            self._roll_day(max(day, self._day))
+            if day == self._day:
+                self._today[attendance_type] = self._today.get(attendance_type, 0) + 1
+                self._attendees.add(employee_id)
+
+    def snapshot(self):
+        """{"total", "todayIn", "todayOut", "todayAttendees"}"""
+        with self._lock:
+            self._roll_day(datetime.now().date())
+            return {
+                "total": self._total,
+                "todayIn": self._today.get("IN", 0),
+                "todayOut": self._today.get("OUT", 0),
+                "todayAttendees": len(self._attendees),
+            }
@@ -0,0 +1,68 @@
+"""
+Recall and latency of the IVF matcher against the exact gallery scan.
+
+Usage:
+    python benchmarks/bench_ann.py --sizes 1000 10000 50000 --nprobe 4 8 16
+
+For each gallery size the exact matcher and the IVF matcher (one run per nprobe
+value) answer the same probes. Recall is the fraction of probes for which the IVF
+matcher returns the same employee as the exact matcher.
+"""
+
+import argparse
+
+from common import (build_gallery, emit, latency_summary, synthetic_centres,
+                    synthetic_probes, synthetic_samples, time_calls)
+
+from ann_index import IVFIndex
+from face_gallery import FaceGallery
+
+# Threshold below any real confidence so every probe yields a best candidate
+NO_THRESHOLD = -1e9
+
+
+def run(sizes, samples_per_employee, nprobes, rerank, n_probes):
+    results = []
+    for size in sizes:
+        centres = synthetic_centres(size)
+        samples = synthetic_samples(centres, samples_per_employee)
+        _, probes = synthetic_probes(centres, n_probes)
+        args = [(probe, NO_THRESHOLD) for probe in probes]
+
+        exact = build_gallery(samples)
+        truth = [exact.match(probe, NO_THRESHOLD)["id"] for probe in probes]
+        entry = {
+            "employees": size,
+            "samples": size * samples_per_employee,
+            "exact": latency_summary(time_calls(exact.match, args)),
+            "ivf": [],
+        }
+
+        for nprobe in nprobes:
+            approximate = build_gallery(samples, FaceGallery())
+            approximate.attach_index(IVFIndex(nprobe=nprobe, rerank=rerank))
+            found = [approximate.match(probe, NO_THRESHOLD)["id"] for probe in probes]
+            recall = sum(a == b for a, b in zip(found, truth)) / len(truth)
+            summary = latency_summary(time_calls(approximate.match, args))
+            summary.update({"nprobe": nprobe, "rerank": rerank, "recall": round(recall, 4)})
+            entry["ivf"].append(summary)
+
+        results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--samples-per-employee", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[2, 8, 32])
+    parser.add_argument("--rerank", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("ann", run(args.sizes, args.samples_per_employee, args.nprobe, args.rerank, args.probes), args.output)
+
+
+if __name__ == "__main__":
+    main()
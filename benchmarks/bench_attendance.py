@@ -0,0 +1,121 @@
+"""
+Attendance path: recording and querying over synthetic histories.
+
+Usage:
+    python benchmarks/bench_attendance.py --history 1000 10000 100000 --backends xml xml-month xml-day sqlite
+
+For each storage backend and history size a fresh store is filled with a
+synthetic history (30 days unless --days), then the operations behind record_attendance() and
+the attendance/stats endpoints are timed: recording a check-in, the latest page,
+one employee's page, the last day's page and the total count. The first query
+(which builds the XML backend's in-memory index) is reported separately as
+"first_query".
+
+xml-month and xml-day are the XML backend with a partitioned attendance archive:
+the history is split once (as on first start), and a query parses only the
+partitions overlapping its range. "old_week_page" reads a week from the start of
+the history, "history_bytes" is the on-disk size of the attendance files.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import emit, latency_summary, synthetic_attendance, time_calls
+
+from storage import SQLiteStorage, create_storage, export_sqlite_to_xml
+
+EMPLOYEES = 500
+
+PARTITIONS = {"xml-month": "month", "xml-day": "day"}
+
+
+def fill(backend, directory, records):
+    """Create a store of the given backend holding `records`"""
+    db_path = os.path.join(directory, "facetrack.db")
+    seed = SQLiteStorage(db_path)
+    seed.record_attendance_many(records)
+    seed.close()
+    if backend != "sqlite":
+        export_sqlite_to_xml(db_path, directory)
+        os.remove(db_path)
+    if backend in PARTITIONS:
+        return create_storage("xml", directory, archive_options={"granularity": PARTITIONS[backend]})
+    return create_storage(backend, directory, db_path)
+
+
+def history_bytes(directory):
+    """Bytes of attendance data on disk (the split-off original is not counted)"""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(directory) for name in files
+               if name != "employees.xml" and not name.endswith(".pre-partition"))
+
+
+def bench_backend(backend, history, calls, days=30):
+    directory = tempfile.mkdtemp(prefix="facetrack-bench-")
+    records = synthetic_attendance(history, EMPLOYEES, days=days)
+    storage = fill(backend, directory, records)
+    try:
+        size = history_bytes(directory)
+        start = time.perf_counter()
+        storage.latest_attendance(100)
+        first_query = time.perf_counter() - start
+
+        def record(index):
+            storage.record_attendance({
+                "id": str(uuid.uuid4()),
+                "employee_id": str(index % EMPLOYEES),
+                "timestamp": datetime.now().isoformat(),
+                "type": "IN",
+            })
+
+        since = (datetime.now() - timedelta(days=1)).isoformat()
+        oldest = min(record["timestamp"] for record in records)
+        old_week = (oldest, (datetime.fromisoformat(oldest) + timedelta(days=7)).isoformat())
+        return {
+            "backend": backend,
+            "history": history,
+            "days": days,
+            "history_bytes": size,
+            "first_query": latency_summary([first_query]),
+            "record": latency_summary(time_calls(record, [(index,) for index in range(calls)])),
+            "latest_page": latency_summary(time_calls(storage.latest_attendance, [(100,)] * calls)),
+            "employee_page": latency_summary(time_calls(
+                lambda employee_id: storage.query_attendance(employee_id=employee_id, limit=100),
+                [(str(index % EMPLOYEES),) for index in range(calls)])),
+            "last_day_page": latency_summary(time_calls(
+                lambda: storage.query_attendance(since=since, limit=100), [()] * calls)),
+            "old_week_page": latency_summary(time_calls(
+                lambda: storage.query_attendance(since=old_week[0], until=old_week[1], limit=100), [()] * calls)),
+            "count": latency_summary(time_calls(storage.attendance_count, [()] * min(calls, 20))),
+        }
+    finally:
+        storage.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(histories, backends=("xml", "sqlite"), calls=100, days=30):
+    return [bench_backend(backend, history, calls, days) for history in histories for backend in backends]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=["xml", "xml-month", "xml-day", "sqlite"],
+                        default=["xml", "xml-month", "sqlite"])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--days", type=int, default=30, help="span of the synthetic history")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    emit("attendance", run(args.history, args.backends, args.calls, args.days), args.output)
+
+
+if __name__ == "__main__":
+    main()
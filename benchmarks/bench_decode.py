@@ -0,0 +1,111 @@
+"""
+Per-frame decode + detect + encode latency with reduced-resolution detection.
+
+Usage:
+    python benchmarks/bench_decode.py --images path/to/faces --max-side 0 320 240 --upsample 1
+
+Each frame goes through the server's recognition stages with a DecodedFrame of
+the given --max-side (0 = full resolution, the behaviour before the fast decode
+path): base64, decode for detection, face detection, and for frames with a face
+the full-resolution decode and the encoding of the first face. Reported per
+setting:
+- per-frame latency of the whole path and of each stage
+- frames with a face, and agreement with full-resolution detection
+- Euclidean distance between each encoding and the full-resolution one (the
+  match threshold works on distances of about 0.4)
+
+Needs face_recognition (dlib); without --images, frames composed from the canned
+face photo (see common.py) are used.
+"""
+
+import argparse
+import base64
+import time
+
+import numpy as np
+
+from common import emit, latency_summary, load_frames
+
+from frame_decoder import DecodedFrame
+
+
+def recognize_stages(frame_data, max_side, upsample, face_recognition):
+    """(encoding or None, {stage: seconds}) for one base64 data-URL frame"""
+    timings = {}
+    start = time.perf_counter()
+    image_bytes = base64.b64decode(frame_data.split(",", 1)[1])
+    timings["base64"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = DecodedFrame(image_bytes, max_side)
+    timings["image_decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    locations = face_recognition.face_locations(frame.detection, number_of_times_to_upsample=upsample)
+    timings["detect"] = time.perf_counter() - start
+    if not locations:
+        return None, timings
+
+    start = time.perf_counter()
+    rgb_image = frame.full()
+    timings["full_decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encodings = face_recognition.face_encodings(rgb_image, frame.to_full(locations[:1]))
+    timings["encode"] = time.perf_counter() - start
+    return (encodings[0] if encodings else None), timings
+
+
+def run(frames, max_sides, upsample=1, repeats=3):
+    import face_recognition
+
+    results = []
+    reference = None
+    for max_side in max_sides:
+        totals, stages, encodings = [], {}, []
+        for _ in range(repeats):
+            encodings = []
+            for frame_data in frames:
+                start = time.perf_counter()
+                encoding, timings = recognize_stages(frame_data, max_side, upsample, face_recognition)
+                totals.append(time.perf_counter() - start)
+                encodings.append(encoding)
+                for stage, seconds in timings.items():
+                    stages.setdefault(stage, []).append(seconds)
+        if reference is None:
+            reference = encodings
+
+        both = [(a, b) for a, b in zip(reference, encodings) if a is not None and b is not None]
+        distances = np.array([np.linalg.norm(a - b) for a, b in both]) if both else np.zeros(1)
+        results.append({
+            "max_side": max_side,
+            "upsample": upsample,
+            "frames": len(frames),
+            "per_frame": latency_summary(totals),
+            "stages": {stage: latency_summary(timings) for stage, timings in stages.items()},
+            "faces_found": sum(encoding is not None for encoding in encodings),
+            "detection_agreement": round(
+                sum((a is None) == (b is None) for a, b in zip(reference, encodings)) / len(frames), 4),
+            "encoding_distance_max": round(float(distances.max()), 4),
+            "encoding_distance_mean": round(float(distances.mean()), 4),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of .jpg/.png face photos (else synthetic frames)")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--max-side", type=int, nargs="+", default=[0, 320, 240],
+                        help="detection resolutions to compare; the first is the reference")
+    parser.add_argument("--upsample", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.images)
+    emit("decode", run(frames, args.max_side, args.upsample, args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Enrollment bookkeeping and encodings-store startup by gallery size.
+
+Usage:
+    python benchmarks/bench_enroll.py --sizes 100 1000 10000 100000
+
+"enroll" times what store_face_encodings() does after the samples are encoded:
+FaceGallery.add() plus an fsynced EncodingStore.append(). "load" times a cold
+EncodingStore.load() of a compacted store of that size (the server's startup).
+The dlib encoding stage of enrollment is measured by bench_enroll_pool.py.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from common import (DEFAULT_SIZES, build_gallery, emit, latency_summary, synthetic_centres,
+                    synthetic_samples, time_calls)
+
+from encoding_store import EncodingStore
+from face_gallery import FaceGallery
+
+
+def run(sizes, samples_per_employee=5, enrollments=100):
+    results = []
+    for size in sizes:
+        samples = synthetic_samples(synthetic_centres(size), samples_per_employee)
+        new_samples = synthetic_samples(synthetic_centres(enrollments, seed=7), samples_per_employee, seed=8)
+        directory = tempfile.mkdtemp(prefix="facetrack-bench-")
+        try:
+            gallery = build_gallery(samples)
+            store = EncodingStore(directory)
+            store.compact(gallery)
+
+            def enroll(index):
+                employee_id = f"new-{index}"
+                gallery.add(employee_id, employee_id, new_samples[index])
+                store.append(employee_id, employee_id, new_samples[index])
+
+            enroll_timings = time_calls(enroll, [(index,) for index in range(enrollments)])
+            store.compact(gallery)
+            store.close()
+
+            load_timings = []
+            for _ in range(3):
+                reloaded = EncodingStore(directory)
+                start = time.perf_counter()
+                reloaded.load(FaceGallery())
+                load_timings.append(time.perf_counter() - start)
+                reloaded.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        results.append({
+            "employees": size,
+            "samples": size * samples_per_employee,
+            "enroll": latency_summary(enroll_timings),
+            "load": latency_summary(load_timings),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--samples-per-employee", type=int, default=5)
+    parser.add_argument("--enrollments", type=int, default=100)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("enroll", run(args.sizes, args.samples_per_employee, args.enrollments), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Enrollment encoding: sequential path versus the EncoderPool process pool.
+
+Usage:
+    python benchmarks/bench_enroll_pool.py --samples 20 --workers 2 4 8 [--images DIR]
+
+Requires face_recognition (dlib). With --images the samples are JPEG/PNG files
+from DIR (cycled to reach --samples); otherwise 640x480 frames composed from the
+canned face photo (see common.py) are used.
+"""
+
+import argparse
+import os
+import time
+
+from common import emit, load_frames
+
+from face_encoder import EncoderPool
+
+
+def time_encode(pool, samples, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pool.encode_samples(samples)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(samples, worker_counts, repeats):
+    sequential = EncoderPool(workers=1)
+    baseline = time_encode(sequential, samples, repeats)
+    results = {
+        "samples": len(samples),
+        "sequential_s": round(baseline, 4),
+        "pool": [],
+    }
+
+    for workers in worker_counts:
+        pool = EncoderPool(workers=workers)
+        pool.start()  # process start-up is a one-off cost, excluded like in the server
+        try:
+            elapsed = time_encode(pool, samples, repeats)
+        finally:
+            pool.shutdown()
+        results["pool"].append({
+            "workers": workers,
+            "elapsed_s": round(elapsed, 4),
+            "samples_per_s": round(len(samples) / elapsed, 2),
+            "speedup": round(baseline / elapsed, 2),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--images", help="directory of face images to use as samples")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    samples = load_frames(args.samples, args.images)
+    emit("enroll_pool", run(samples, sorted(set(args.workers)), args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Detections skipped by the near-duplicate frame cache on a kiosk's frame stream.
+
+Usage:
+    python benchmarks/bench_frame_cache.py --images path/to/faces --fps 5 --distance 0 4 8
+    python benchmarks/bench_frame_cache.py --fps 5 --distance 0 4 8
+
+Builds the stream a kiosk sends over a few arrivals: idle frames of an empty scene,
+then a person standing in front of the camera, in turn for each face photo from
+--images (photos without a face are used as the empty scene). Every frame is shifted
+by up to --jitter pixels and gets Gaussian sensor noise of --noise grey levels before
+JPEG encoding, like consecutive frames of a real camera. Every photo with a face is
+enrolled as an employee, photos of the same person (encodings within the match
+threshold) as one. Without --images the arrivals are the canned photo at about the
+same spot of an empty scene (common.canned_scene()), all one employee.
+
+The stream is replayed in real time through the server's single-frame path
+(decode_frame(), process_face_image() with a kiosk id, recognize_faces()), first
+without the frame cache (the behaviour before it) and then once per --distance
+(FACETRACK_FRAME_CACHE_DISTANCE), with the kiosk tracker at its default. The
+check-in cooldown, tracks and cache are reset before each replay. Reported per
+setting:
+- cache hit rate and detections run
+- 128-d encodings run
+- per-frame latency
+- check-ins recorded, and whether every frame's matched people and check-in
+  outcomes equal those without the cache
+
+Needs face_recognition (dlib).
+"""
+
+import argparse
+import glob
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import canned_scene, emit, latency_summary
+
+KIOSK_ID = "bench-kiosk"
+
+
+def import_server():
+    os.environ.setdefault("FACETRACK_DATA_DIR", tempfile.mkdtemp(prefix="facetrack-bench-"))
+    os.environ.setdefault("FACETRACK_WARMUP", "0")
+    os.environ.setdefault("FACETRACK_ENCODER_WORKERS", "1")
+    import face_recognition_server
+    return face_recognition_server
+
+
+def camera_frames(image, count, jitter, noise, rng):
+    """`count` JPEG frames of an RGB array, each shifted by up to `jitter` pixels, with sensor noise"""
+    frames = []
+    for _ in range(count):
+        dy, dx = rng.integers(-jitter, jitter + 1, size=2)
+        shifted = np.roll(image, (int(dy), int(dx)), axis=(0, 1)).astype(np.float32)
+        noisy = np.clip(shifted + rng.normal(0.0, noise, size=image.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(noisy).save(buffer, "JPEG", quality=85)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+def replay(server, stream, fps):
+    """(outcome per frame, latency per frame, encodings run) for one real-time replay"""
+    encodings_before = server.faces_total.value
+    outcomes, latencies = [], []
+    start = time.monotonic()
+    for index, jpeg in enumerate(stream):
+        delay = start + index / fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        began = time.perf_counter()
+        faces = server.process_face_image(server.decode_frame(jpeg), KIOSK_ID)
+        result = server.recognize_faces(*faces) if faces[0] else {"faces": []}
+        latencies.append(time.perf_counter() - began)
+        outcomes.append(tuple(((face["person"] or {}).get("id"), face.get("attendance", {}).get("recorded"))
+                              for face in result["faces"]))
+    return outcomes, latencies, server.faces_total.value - encodings_before
+
+
+def run(photos, distances, fps=5, idle_seconds=4, person_seconds=4, jitter=2, noise=3, ttl_ms=1000,
+        people=2, seed=0):
+    server = import_server()
+    server.readiness.wait("models")
+    server.readiness.wait("gallery")
+    face_recognition = server.face_recognition
+
+    faces, empty = [], None
+    for jpeg in photos:
+        image = np.asarray(Image.open(io.BytesIO(jpeg)).convert("RGB"))
+        encodings = face_recognition.face_encodings(image)
+        if encodings:
+            faces.append((image, encodings[0]))
+        elif empty is None:
+            empty = image
+    if not faces:
+        raise SystemExit("No faces found in the photos")
+    faces = faces[:people]
+    if empty is None:
+        empty = np.full_like(faces[0][0], 128)
+
+    rng = np.random.default_rng(seed)
+    stream, employees = [], {}
+    for index, (image, encoding) in enumerate(faces):
+        # Photos of one person share an employee, as they would share a match
+        known = list(employees.values())
+        if not known or face_recognition.face_distance(known, encoding).min() > server.MATCH_THRESHOLD:
+            employee_id = f"bench-{index}"
+            server.store_face_encodings(employee_id, f"Employee {index}", np.asarray([encoding], dtype=np.float32))
+            employees[employee_id] = encoding
+        stream.extend(camera_frames(empty, round(fps * idle_seconds), jitter, noise, rng))
+        stream.extend(camera_frames(image, round(fps * person_seconds), jitter, noise, rng))
+    stream.extend(camera_frames(empty, round(fps * idle_seconds), jitter, noise, rng))
+
+    results, reference = [], None
+    for distance in [None] + list(distances):
+        server.FRAME_CACHE_TTL_MS = 0 if distance is None else ttl_ms
+        server.frame_cache.ttl_seconds = ttl_ms / 1000
+        server.frame_cache.max_distance = distance or 0
+        server.frame_cache.clear()
+        server.face_tracker.clear()
+        for employee_id in employees:
+            server.checkin_cooldown.forget(employee_id)
+        hits_before = server.frame_cache_hits.value
+        misses_before = server.frame_cache_misses.value
+
+        outcomes, latencies, encodings = replay(server, stream, fps)
+        if reference is None:
+            reference = outcomes
+        hits = server.frame_cache_hits.value - hits_before
+        lookups = hits + server.frame_cache_misses.value - misses_before
+        results.append({
+            "distance": "off" if distance is None else distance,
+            "ttl_ms": ttl_ms,
+            "frames": len(stream),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "detections": len(stream) - hits,
+            "encodings": encodings,
+            "per_frame": latency_summary(latencies),
+            "checkins_recorded": sum(recorded is True for outcome in outcomes for _, recorded in outcome),
+            "same_results": outcomes == reference,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of .jpg/.png photos, with and without faces (else the canned photo)")
+    parser.add_argument("--people", type=int, default=2, help="arrivals in the stream")
+    parser.add_argument("--fps", type=float, default=5)
+    parser.add_argument("--idle-seconds", type=float, default=4)
+    parser.add_argument("--person-seconds", type=float, default=4)
+    parser.add_argument("--jitter", type=int, default=2)
+    parser.add_argument("--noise", type=float, default=3)
+    parser.add_argument("--ttl-ms", type=float, default=1000)
+    parser.add_argument("--distance", type=int, nargs="+", default=[0, 4, 8],
+                        help="FACETRACK_FRAME_CACHE_DISTANCE values compared with the cache off")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+        photos = []
+        for path in paths:
+            with open(path, "rb") as f:
+                photos.append(f.read())
+    else:
+        photos = canned_scene(args.people)
+    emit("frame_cache", run(photos, args.distance, args.fps, args.idle_seconds, args.person_seconds,
+                            args.jitter, args.noise, args.ttl_ms, args.people), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Overhead of the /api/metrics instrumentation.
+
+Usage:
+    python benchmarks/bench_metrics.py --employees 1000 --frames 500
+
+Measures the cost of the metric operations a recognized frame performs (six
+stage timers and three counter increments) and compares it with the part of the
+pipeline that runs without dlib: decoding a 640x480 JPEG frame and matching one
+encoding against a synthetic gallery. Detection and encoding make a real frame
+much slower than that, so the reported percentage is an upper bound.
+"""
+
+import argparse
+import base64
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import build_gallery, emit, synthetic_centres, synthetic_probes, synthetic_samples
+
+from metrics import MetricsRegistry
+
+MATCH_THRESHOLD = 0.6
+STAGES = ("base64", "image_decode", "detect", "encode", "match", "attendance")
+
+
+def synthetic_frame(width=640, height=480, seed=0):
+    """Base64 JPEG of random noise, roughly the size of a kiosk frame"""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def per_frame_metrics(registry):
+    stages = {stage: registry.histogram("facetrack_stage_seconds", "stage time", stage=stage) for stage in STAGES}
+    frames = registry.counter("facetrack_frames_total", "frames")
+    matches = registry.counter("facetrack_matches_total", "matches")
+    checkins = registry.counter("facetrack_checkins_total", "check-ins", result="recorded")
+
+    def record():
+        frames.inc()
+        for stage in STAGES:
+            with stages[stage].time():
+                pass
+        matches.inc()
+        checkins.inc()
+    return record
+
+
+def best_of(fn, repeats, calls):
+    """Best mean seconds per call over several repeats"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def run(employees, frames, repeats):
+    centres = synthetic_centres(employees)
+    gallery = build_gallery(synthetic_samples(centres, 5))
+    _, probes = synthetic_probes(centres, 1)
+    frame = synthetic_frame()
+
+    def pipeline():
+        image = Image.open(io.BytesIO(base64.b64decode(frame)))
+        np.array(image)
+        gallery.match(probes[0], MATCH_THRESHOLD)
+
+    registry = MetricsRegistry()
+    record = per_frame_metrics(registry)
+    instrumentation = best_of(record, repeats, frames * 10)
+    frame_cost = best_of(pipeline, repeats, frames)
+    render = best_of(registry.render, repeats, 100)
+
+    return {
+        "employees": employees,
+        "instrumentation_us_per_frame": round(instrumentation * 1e6, 3),
+        "decode_and_match_ms_per_frame": round(frame_cost * 1000, 4),
+        "overhead_percent_upper_bound": round(100 * instrumentation / frame_cost, 4),
+        "render_ms": round(render * 1000, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("metrics", run(args.employees, args.frames, args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Accuracy equivalence and latency of prototype (coarse-to-fine) matching.
+
+Usage:
+    python benchmarks/bench_prototypes.py --sizes 1000 10000 --shortlist 0 8 32
+
+Compares FaceGallery with prototype matching against the full scan (the
+average-confidence rule used by recognize_face()) on probes of enrolled employees
+and on impostors who are not enrolled. Agreement counts a probe as equal when
+both matchers return the same employee (or both return no match) at the server's
+0.6 confidence threshold. shortlist 0 means "no cap", which is exact by
+construction; a positive cap trades equivalence for a bounded re-rank.
+"""
+
+import argparse
+
+import numpy as np
+
+from common import (build_gallery, emit, latency_summary, synthetic_centres,
+                    synthetic_probes, synthetic_samples, time_calls)
+
+from face_gallery import FaceGallery
+
+MATCH_THRESHOLD = 0.6
+
+
+def agreement(reference, candidate):
+    same = 0
+    max_confidence_delta = 0.0
+    for a, b in zip(reference, candidate):
+        if a is None or b is None:
+            same += a is None and b is None
+        elif a["id"] == b["id"]:
+            same += 1
+            max_confidence_delta = max(max_confidence_delta, abs(a["confidence"] - b["confidence"]))
+    return round(same / len(reference), 6), max_confidence_delta
+
+
+def run(sizes, samples_per_employee, shortlists, n_probes):
+    results = []
+    for size in sizes:
+        centres = synthetic_centres(size)
+        samples = synthetic_samples(centres, samples_per_employee)
+        _, probes = synthetic_probes(centres, n_probes)
+        impostors = synthetic_centres(n_probes, seed=99)
+        queries = np.vstack([probes, impostors])
+        args = [(query, MATCH_THRESHOLD) for query in queries]
+
+        exact = build_gallery(samples)
+        reference = exact.match_batch(queries, MATCH_THRESHOLD)
+        entry = {
+            "employees": size,
+            "samples": size * samples_per_employee,
+            "queries": len(queries),
+            "exact": latency_summary(time_calls(exact.match, args)),
+            "prototype": [],
+        }
+
+        for shortlist in shortlists:
+            gallery = build_gallery(samples, FaceGallery())
+            gallery.enable_prototypes(shortlist)
+            agree, delta = agreement(reference, gallery.match_batch(queries, MATCH_THRESHOLD))
+            summary = latency_summary(time_calls(gallery.match, args))
+            summary.update({"shortlist": shortlist, "agreement": agree, "max_confidence_delta": delta})
+            entry["prototype"].append(summary)
+
+        results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--samples-per-employee", type=int, default=10)
+    parser.add_argument("--shortlist", type=int, nargs="+", default=[0, 8, 32])
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("prototypes", run(args.sizes, args.samples_per_employee, args.shortlist, args.probes), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Memory, accuracy and latency of quantized gallery storage.
+
+Usage:
+    python benchmarks/bench_quantization.py --sizes 1000 10000 --rerank 0 8
+
+Builds the gallery in float32, float16 and int8 (per-dimension scales), with and
+without float32 re-ranking of the best candidates, and compares each against the
+reference the server used before the gallery existed: face_recognition's
+face_distance (float64 Euclidean distances) averaged per employee, with the
+average-confidence rule at the 0.6 threshold.
+
+Reported per configuration:
+- memory: resident bytes of the gallery arrays, and the ratio to float32
+- agreement: probes (enrolled employees and impostors) with the same decision
+- decision flips at thresholds around 0.6, i.e. the threshold impact
+- confidence error against the float64 reference for agreeing matches
+"""
+
+import argparse
+
+import numpy as np
+
+from common import (build_gallery, emit, latency_summary, synthetic_centres,
+                    synthetic_probes, synthetic_samples, time_calls)
+
+from face_gallery import FaceGallery
+
+MATCH_THRESHOLD = 0.6
+THRESHOLDS = (0.5, 0.55, 0.6, 0.65)
+
+
+def reference_best(samples, queries):
+    """(employee index, confidence) per query from float64 face_distance averages"""
+    samples64 = samples.astype(np.float64)
+    best = []
+    for query in queries.astype(np.float64):
+        mean_distances = np.linalg.norm(samples64 - query, axis=2).mean(axis=1)
+        column = int(np.argmin(mean_distances))
+        best.append((str(column), 1.0 - float(mean_distances[column])))
+    return best
+
+
+def compare(reference, gallery, queries):
+    """Decision agreement per threshold and confidence errors against the reference"""
+    # A threshold of -inf returns the best employee for every query
+    candidates = gallery.match_batch(queries, -np.inf)
+    errors = []
+    flips = {threshold: 0 for threshold in THRESHOLDS}
+    for (reference_id, reference_confidence), candidate in zip(reference, candidates):
+        if candidate["id"] == reference_id:
+            errors.append(abs(candidate["confidence"] - reference_confidence))
+        for threshold in THRESHOLDS:
+            expected = reference_id if reference_confidence > threshold else None
+            actual = candidate["id"] if candidate["confidence"] > threshold else None
+            flips[threshold] += expected != actual
+    errors = np.asarray(errors) if errors else np.zeros(1)
+    return {
+        "agreement": round(1 - flips[MATCH_THRESHOLD] / len(queries), 6),
+        "decision_flips": {str(threshold): count for threshold, count in flips.items()},
+        "confidence_error_p50": float(np.percentile(errors, 50)),
+        "confidence_error_p99": float(np.percentile(errors, 99)),
+        "confidence_error_max": float(errors.max()),
+    }
+
+
+def run(sizes, samples_per_employee, reranks, n_probes):
+    results = []
+    for size in sizes:
+        centres = synthetic_centres(size)
+        samples = synthetic_samples(centres, samples_per_employee)
+        _, probes = synthetic_probes(centres, n_probes)
+        impostors = synthetic_centres(n_probes, seed=99)
+        queries = np.vstack([probes, impostors])
+        reference = reference_best(samples, queries)
+        args = [(query, MATCH_THRESHOLD) for query in queries]
+
+        baseline_bytes = None
+        for precision in ("float32", "float16", "int8"):
+            for rerank in (reranks if precision != "float32" else [0]):
+                gallery = build_gallery(samples, FaceGallery(precision=precision, rerank=rerank))
+                # build_gallery hands over an in-memory matrix; count only what the gallery owns
+                memory = gallery.memory_bytes()
+                baseline_bytes = baseline_bytes or memory
+                entry = {
+                    "employees": size,
+                    "samples": size * samples_per_employee,
+                    "precision": precision,
+                    "rerank": rerank,
+                    "memory_bytes": memory,
+                    "memory_ratio": round(memory / baseline_bytes, 4),
+                    "latency": latency_summary(time_calls(gallery.match, args)),
+                }
+                entry.update(compare(reference, gallery, queries))
+                results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--samples-per-employee", type=int, default=5)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 8])
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("quantization", run(args.sizes, args.samples_per_employee, args.rerank, args.probes), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Recognition path: gallery matching by gallery size, and the per-frame stages.
+
+Usage:
+    python benchmarks/bench_recognize.py --sizes 100 1000 10000 100000 [--images DIR]
+
+"match" times FaceGallery.match() (one face of the server's match_encodings) for each
+matcher over synthetic galleries of the given sizes. "stages" times the steps of
+process_face_image() on canned frames: base64 + image decode (detection-sized,
+--detect-max-side), face detection and face encoding (including the full-resolution
+decode). Detection and encoding need face_recognition (dlib) and are
+reported as skipped without it. Without --images the frames show the canned face
+(see common.py); encoding only runs on frames where a face was found, and the
+result says so when none was.
+"""
+
+import argparse
+import base64
+
+from common import (DEFAULT_SIZES, build_gallery, emit, latency_summary, load_frames,
+                    synthetic_centres, synthetic_probes, synthetic_samples, time_calls)
+
+from face_gallery import FaceGallery
+from frame_decoder import DecodedFrame
+
+MATCH_THRESHOLD = 0.6
+
+
+def bench_match(sizes, samples_per_employee, matchers, n_probes):
+    results = []
+    for size in sizes:
+        centres = synthetic_centres(size)
+        samples = synthetic_samples(centres, samples_per_employee)
+        _, probes = synthetic_probes(centres, n_probes)
+        args = [(probe, MATCH_THRESHOLD) for probe in probes]
+
+        entry = {"employees": size, "samples": size * samples_per_employee}
+        for matcher in matchers:
+            gallery = FaceGallery()
+            if matcher == "prototype":
+                gallery.enable_prototypes(0)
+            build_gallery(samples, gallery)
+            gallery.match(probes[0], MATCH_THRESHOLD)  # build lazy caches outside the timings
+            entry[matcher] = latency_summary(time_calls(gallery.match, args))
+        results.append(entry)
+    return results
+
+
+def _decode(frame, max_side):
+    return DecodedFrame(base64.b64decode(frame.split(",", 1)[1]), max_side)
+
+
+def bench_stages(frames, detection_model, max_side=0):
+    results = {"frames": len(frames), "detect_max_side": max_side,
+               "decode": latency_summary(time_calls(_decode, [(frame, max_side) for frame in frames]))}
+    try:
+        import face_recognition
+    except ImportError:
+        results["detect"] = results["encode"] = "skipped: face_recognition is not installed"
+        return results
+
+    decoded = [_decode(frame, max_side) for frame in frames]
+    locations = []
+
+    def detect(decoded_frame):
+        locations.append(face_recognition.face_locations(decoded_frame.detection, model=detection_model))
+
+    def encode(decoded_frame, found):
+        return face_recognition.face_encodings(decoded_frame.full(), decoded_frame.to_full(found[:1]))
+
+    results["detect"] = latency_summary(time_calls(detect, [(decoded_frame,) for decoded_frame in decoded]))
+    with_faces = [(decoded_frame, found) for decoded_frame, found in zip(decoded, locations) if found]
+    results["faces_found"] = len(with_faces)
+    if with_faces:
+        results["encode"] = latency_summary(time_calls(encode, with_faces))
+    else:
+        results["encode"] = "skipped: no face found in any frame"
+    return results
+
+
+def run(sizes, samples_per_employee=5, matchers=("exact", "prototype"), n_probes=200,
+        frames=20, images_dir=None, detection_model="hog", detect_max_side=0):
+    return {
+        "match": bench_match(sizes, samples_per_employee, matchers, n_probes),
+        "stages": bench_stages(load_frames(frames, images_dir), detection_model, detect_max_side),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--samples-per-employee", type=int, default=5)
+    parser.add_argument("--matchers", nargs="+", choices=["exact", "prototype"], default=["exact", "prototype"])
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--images", help="directory of face images used as frames")
+    parser.add_argument("--detection-model", choices=["hog", "cnn"], default="hog")
+    parser.add_argument("--detect-max-side", type=int, default=0, help="0 = detect at full resolution")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("recognize", run(args.sizes, args.samples_per_employee, args.matchers, args.probes,
+                          args.frames, args.images, args.detection_model, args.detect_max_side), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Throughput/latency trade-off of the micro-batching recognition scheduler.
+
+Usage:
+    python benchmarks/bench_scheduler.py --clients 1 8 32 --max-batch 1 8 16 --max-wait-ms 2 10
+    python benchmarks/bench_scheduler.py --pipeline real --clients 1 4 --max-batch 1 8 --requests 64 [--images DIR]
+
+Closed-loop clients each submit one probe at a time and wait for its result.
+"direct" runs the batch function once per request with no scheduler, like
+/api/recognize without FACETRACK_SCHEDULER. Latency is measured from submit to result; throughput is
+requests per wall-clock second.
+
+--pipeline selects the batch function:
+- model: a fixed per-batch cost (model dispatch, thread fan-out), a per-frame cost
+  for decode/detect/encode, and one real FaceGallery.match_batch() over the whole
+  batch. The modelled costs hold the GIL, as dlib does, so concurrent requests cannot
+  overlap them for free. The default costs share most of a batch's work, so this is
+  an upper bound on what batching can gain.
+- real: the server's own recognize_frames() on JPEG face frames (--images, else the
+  canned face frames), with decoding, dlib detection and encoding in the encoder
+  pool and one gallery match per batch. Detection and encoding are per frame, so
+  only the match and the dispatch are shared.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from common import (build_gallery, emit, latency_summary, load_frames, synthetic_centres,
+                    synthetic_probes, synthetic_samples)
+
+from recognition_scheduler import MicroBatchScheduler
+
+MATCH_THRESHOLD = 0.6
+
+
+def busy_wait(seconds):
+    """Burn CPU while holding the GIL, like dlib's detector and encoder do"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def make_batch_fn(gallery, batch_overhead_ms, frame_ms, batch_sizes):
+    def process_batch(queries):
+        batch_sizes.append(len(queries))
+        busy_wait((batch_overhead_ms + frame_ms * len(queries)) / 1000.0)
+        return gallery.match_batch(np.asarray(queries), MATCH_THRESHOLD)
+    return process_batch
+
+
+def import_server():
+    os.environ.setdefault("FACETRACK_DATA_DIR", tempfile.mkdtemp(prefix="facetrack-bench-"))
+    os.environ.setdefault("FACETRACK_WARMUP", "0")
+    import face_recognition_server
+    return face_recognition_server
+
+
+def make_server_batch_fn(server, batch_sizes):
+    def process_batch(frames):
+        batch_sizes.append(len(frames))
+        return server.recognize_frames(frames)
+    return process_batch
+
+
+def drive(call, probes, clients, requests_per_client):
+    """Run closed-loop clients; returns (per-request latencies, wall seconds)"""
+    latencies = [[] for _ in range(clients)]
+
+    def client(index):
+        for i in range(requests_per_client):
+            probe = probes[(index * requests_per_client + i) % len(probes)]
+            start = time.perf_counter()
+            call(probe)
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return [t for client_latencies in latencies for t in client_latencies], wall
+
+
+def summarize(latencies, wall, batch_sizes):
+    summary = latency_summary(latencies)
+    summary["throughput_per_s"] = round(len(latencies) / wall, 2)
+    summary["mean_batch_size"] = round(float(np.mean(batch_sizes)), 2) if batch_sizes else None
+    return summary
+
+
+def run(make_batch, probes, clients_list, max_batches, max_waits, workers, requests):
+    results = []
+    for clients in clients_list:
+        per_client = max(1, requests // clients)
+        entry = {"clients": clients, "configs": []}
+
+        batch_sizes = []
+        process_batch = make_batch(batch_sizes)
+        direct = summarize(*drive(lambda probe: process_batch([probe])[0], probes, clients, per_client), batch_sizes)
+        direct["mode"] = "direct"
+        entry["configs"].append(direct)
+
+        for max_batch in max_batches:
+            for max_wait in max_waits:
+                batch_sizes = []
+                scheduler = MicroBatchScheduler(
+                    make_batch(batch_sizes), max_batch_size=max_batch, max_wait_ms=max_wait, workers=workers)
+                try:
+                    latencies, wall = drive(lambda probe: scheduler.submit(probe).result(), probes, clients, per_client)
+                finally:
+                    scheduler.shutdown()
+                summary = summarize(latencies, wall, batch_sizes)
+                summary.update({"mode": "scheduler", "max_batch": max_batch, "max_wait_ms": max_wait})
+                entry["configs"].append(summary)
+
+        results.append(entry)
+    return results
+
+
+def run_model(employees, clients_list, max_batches, max_waits, workers, batch_overhead_ms, frame_ms, requests):
+    centres = synthetic_centres(employees)
+    gallery = build_gallery(synthetic_samples(centres, 5))
+    _, probes = synthetic_probes(centres, 500)
+    return run(lambda batch_sizes: make_batch_fn(gallery, batch_overhead_ms, frame_ms, batch_sizes),
+               probes, clients_list, max_batches, max_waits, workers, requests)
+
+
+def run_real(frames, clients_list, max_batches, max_waits, workers, requests):
+    server = import_server()
+    for component in server.RECOGNIZE_REQUIRES:
+        server.readiness.wait(component)
+    return run(lambda batch_sizes: make_server_batch_fn(server, batch_sizes),
+               frames, clients_list, max_batches, max_waits, workers, requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[2, 10])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-overhead-ms", type=float, default=5.0, help="modelled fixed cost per batch")
+    parser.add_argument("--frame-ms", type=float, default=2.0, help="modelled decode/encode cost per frame")
+    parser.add_argument("--requests", type=int, default=512, help="requests per client count")
+    parser.add_argument("--pipeline", choices=["model", "real"], nargs="+", default=["model"])
+    parser.add_argument("--frames", type=int, default=16, help="distinct frames for --pipeline real")
+    parser.add_argument("--images", help="directory of .jpg/.png face photos (else canned face frames)")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    if "model" in args.pipeline:
+        results["model"] = run_model(args.employees, args.clients, args.max_batch, args.max_wait_ms, args.workers,
+                                     args.batch_overhead_ms, args.frame_ms, args.requests)
+    if "real" in args.pipeline:
+        results["real"] = run_real(load_frames(args.frames, args.images), args.clients, args.max_batch,
+                                   args.max_wait_ms, args.workers, args.requests)
+    emit("scheduler", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
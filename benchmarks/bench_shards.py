@@ -0,0 +1,172 @@
+"""
+Scatter-gather recognition across local shard servers.
+
+Usage:
+    python benchmarks/bench_shards.py --employees 10000 --shards 1 2 4 --slow-ms 0 2000
+
+For each shard count, starts that many face_recognition_server.py processes on
+free local ports (FACETRACK_SHARD_INDEX/COUNT, one data directory each), enrolls
+synthetic employees through a ShardCoordinator (each goes to its owning shard)
+and times ShardCoordinator.match_batch() for single-probe queries. Accuracy is
+checked against one in-process FaceGallery holding every employee.
+
+--slow-ms adds a stub shard that answers only after that delay; with a delay
+above --timeout-ms the queries return at the timeout with no match (the server
+refuses them), and the stub is reported as missing. The servers need Flask installed; matching does not need
+face_recognition.
+"""
+
+import argparse
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_startup import free_port, get
+from common import (REPO_ROOT, build_gallery, emit, latency_summary, synthetic_centres, synthetic_probes,
+                    synthetic_samples)
+
+from sharding import ShardCoordinator
+
+MATCH_THRESHOLD = 0.6
+
+SERVER_SCRIPT = (
+    "import sys; sys.path.insert(0, {root!r})\n"
+    "import face_recognition_server as server\n"
+    "server.app.run(host='127.0.0.1', port={port}, use_reloader=False, threaded=True)\n"
+)
+
+
+def gallery_ready(url):
+    _, body = get(f"{url}/api/ready")
+    return bool(body) and body["components"].get("gallery", {}).get("state") == "ready"
+
+
+def start_shards(count, directory):
+    """Launch `count` shard servers; returns (urls, processes) once all are serving"""
+    urls, processes = [], []
+    for index in range(count):
+        port = free_port()
+        shard_dir = os.path.join(directory, f"shard-{index}")
+        os.makedirs(shard_dir)
+        env = dict(os.environ, FACETRACK_SHARD_INDEX=str(index), FACETRACK_SHARD_COUNT=str(count),
+                   FACETRACK_ENCODER_WORKERS="1", FACETRACK_WARMUP="0")
+        processes.append(subprocess.Popen(
+            [sys.executable, "-c", SERVER_SCRIPT.format(root=REPO_ROOT, port=port)],
+            cwd=shard_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    deadline = time.perf_counter() + 60
+    for url in urls:
+        # Shards only need their gallery component (not the dlib models) to match
+        while not gallery_ready(url):
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"Shard {url} did not start")
+            time.sleep(0.05)
+    return urls, processes
+
+
+def start_slow_shard(delay_s):
+    """In-process stub shard that answers /api/shard/match with no candidates after a delay"""
+
+    class SlowShard(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            queries = json.loads(self.rfile.read(length))["encodings"]
+            time.sleep(delay_s)
+            body = json.dumps({"success": True, "results": [[] for _ in queries]}).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # the coordinator gave up on us
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowShard)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(n_employees, shard_counts, slow_delays, n_probes=200, samples_per_employee=5, timeout_ms=500):
+    centres = synthetic_centres(n_employees)
+    samples = synthetic_samples(centres, samples_per_employee)
+    owners, probes = synthetic_probes(centres, n_probes)
+    reference = build_gallery(samples).match_batch(probes, MATCH_THRESHOLD)
+
+    results = []
+    for count in shard_counts:
+        directory = tempfile.mkdtemp(prefix="facetrack-bench-")
+        processes = []
+        try:
+            urls, processes = start_shards(count, directory)
+            enroller = ShardCoordinator(urls, timeout=timeout_ms / 1000)
+            start = time.perf_counter()
+            for index in range(n_employees):
+                enroller.store(str(index), f"Employee {index}", samples[index])
+            enroll_s = time.perf_counter() - start
+            # Shards apply enrollments immediately; let their matchers rebuild once
+            enroller.match_batch(probes[:1], MATCH_THRESHOLD)
+            enroller.shutdown()
+
+            for delay_ms in slow_delays:
+                slow_server = None
+                shard_urls = list(urls)
+                if delay_ms:
+                    slow_server, slow_url = start_slow_shard(delay_ms / 1000)
+                    shard_urls.append(slow_url)
+                coordinator = ShardCoordinator(shard_urls, timeout=timeout_ms / 1000)
+
+                timings, agreed, missing_total = [], 0, 0
+                for probe, expected in zip(probes, reference):
+                    start = time.perf_counter()
+                    (match,), missing = coordinator.match_batch(probe[None, :], MATCH_THRESHOLD)
+                    timings.append(time.perf_counter() - start)
+                    missing_total += len(missing)
+                    agreed += (match["id"] if match else None) == (expected["id"] if expected else None)
+
+                coordinator.shutdown()
+                if slow_server is not None:
+                    slow_server.shutdown()
+                results.append({
+                    "employees": n_employees,
+                    "shards": count,
+                    "slow_shard_ms": delay_ms,
+                    "timeout_ms": timeout_ms,
+                    "enroll_s": round(enroll_s, 3),
+                    "query": latency_summary(timings),
+                    "agreement_with_single_gallery": round(agreed / len(probes), 4),
+                    "missing_shard_answers": missing_total,
+                })
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--slow-ms", type=int, nargs="+", default=[0], help="delay of an extra stub shard (0 = none)")
+    parser.add_argument("--timeout-ms", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("shards", run(args.employees, args.shards, args.slow_ms, args.probes, timeout_ms=args.timeout_ms),
+         args.output)
+
+
+if __name__ == "__main__":
+    main()
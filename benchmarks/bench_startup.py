@@ -0,0 +1,131 @@
+"""
+Cold start of the recognition server.
+
+Usage:
+    python benchmarks/bench_startup.py --sizes 0 1000 10000 --runs 3
+
+Starts face_recognition_server.py in a fresh process (Flask only, no Eel window)
+on a synthetic encodings store of each size, then polls it. "health" is the time
+from process launch until /api/health answers, "ready" until /api/ready returns
+200. The per-component load times reported by /api/ready (gallery, models,
+attendance, encoder pool) are averaged over the runs. Needs the server's
+dependencies (Flask, face_recognition) installed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from common import REPO_ROOT, build_gallery, emit, latency_summary, synthetic_centres, synthetic_samples
+
+from encoding_store import EncodingStore
+
+SERVER_SCRIPT = (
+    "import sys; sys.path.insert(0, {root!r})\n"
+    "import face_recognition_server as server\n"
+    "server.app.run(host='127.0.0.1', port={port}, use_reloader=False)\n"
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_store(directory, employees, samples_per_employee):
+    """Write a compacted encodings store of `employees` synthetic employees"""
+    if not employees:
+        return  # the server starts with an empty gallery
+    store = EncodingStore(os.path.join(directory, "face_data", "encodings"))
+    store.compact(build_gallery(synthetic_samples(synthetic_centres(employees), samples_per_employee)))
+    store.close()
+
+
+def get(url):
+    """(status, parsed JSON body) or (None, None) while the server is not listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None, None
+
+
+def start_once(directory, env, timeout):
+    """Launch the server once; returns (health seconds, ready seconds, components)"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT.format(root=REPO_ROOT, port=port)],
+                               cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health = None
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"Server exited with status {process.returncode}")
+            if health is None and get(f"{base}/api/health")[0] == 200:
+                health = time.perf_counter() - start
+            if health is not None:
+                status, body = get(f"{base}/api/ready")
+                if status == 200:
+                    return health, time.perf_counter() - start, body["components"]
+            time.sleep(0.01)
+        raise SystemExit(f"Server not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(sizes, runs=3, samples_per_employee=5, timeout=120.0, warmup=True):
+    env = dict(os.environ, FACETRACK_WARMUP="1" if warmup else "0")
+    results = []
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="facetrack-bench-")
+        try:
+            seed_store(directory, size, samples_per_employee)
+            health_timings, ready_timings, components = [], [], {}
+            for _ in range(runs):
+                health, ready, loaded = start_once(directory, env, timeout)
+                health_timings.append(health)
+                ready_timings.append(ready)
+                for name, info in loaded.items():
+                    components.setdefault(name, []).append(info["seconds"])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        results.append({
+            "employees": size,
+            "warmup": warmup,
+            "health": latency_summary(health_timings),
+            "ready": latency_summary(ready_timings),
+            "components_s": {name: round(sum(seconds) / len(seconds), 3) for name, seconds in components.items()},
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--samples-per-employee", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for readiness")
+    parser.add_argument("--no-warmup", action="store_true", help="start with FACETRACK_WARMUP=0")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("startup", run(args.sizes, args.runs, args.samples_per_employee, args.timeout, not args.no_warmup),
+         args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Encodings saved by per-kiosk face tracking on a kiosk's frame stream.
+
+Usage:
+    python benchmarks/bench_tracking.py --images path/to/faces --fps 5 --seconds 10 --refresh 0 1 2
+    python benchmarks/bench_tracking.py --fps 5 --seconds 10 --refresh 0 1 2
+    python benchmarks/bench_tracking.py --swap-gaps 0 1 3 --swap-idle 0 1
+
+"swaps" checks the tracker alone (no dlib or photos): people take turns at the same
+spot of a kiosk, each held for a few seconds with a few pixels of jitter, with
+--swap-gaps frames without a face between two of them. The faces the tracker does not
+reuse get the identity of the person actually there (as an encoding would), and a
+reused identity that is not that person is counted as a wrong frame, per gap and
+FACETRACK_TRACK_IDLE_S value in --swap-idle.
+
+"stream" runs the server on real frames:
+
+Builds the stream a kiosk sends while people take turns in front of it: each face
+photo from --images is held for an equal share of --seconds, as JPEG frames shifted
+by up to --jitter pixels (a person never stands perfectly still), at --fps. Between
+two people, --gap frames without a face stand for the first one leaving; the next
+one steps into about the same spot (the photos' faces overlap), which is the case
+where a tracker that trusted box overlap alone would keep the previous identity.
+Every photo is enrolled as an employee, photos of the same person (encodings within
+the match threshold) as one; photos without a face (or a grey frame) make the empty
+frames. Without --images the people are the canned photo arriving --people times
+over an empty scene (common.canned_scene()): encodings and latency are measured the
+same way, but with one employee a wrong identity carried over cannot show.
+
+The stream is replayed in real time through the server's single-frame path
+(decode_frame(), process_face_image() with a kiosk id, recognize_faces()) once per
+--refresh (FACETRACK_TRACK_REFRESH_S; 0 = no tracking, the behaviour before
+tracking), with tracks surviving --idle seconds of missed frames and the frame cache
+off. The check-in cooldown is reset before each replay. Reported per
+setting:
+- 128-d encodings run, per frame and as a reduction against no tracking
+- per-frame latency
+- check-ins recorded, and whether every frame's faces, matches and check-in
+  outcomes equal those without tracking
+
+The stream needs face_recognition (dlib).
+"""
+
+import argparse
+import base64
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import canned_scene, emit, latency_summary, load_frames
+
+from face_tracker import FaceTracker
+
+KIOSK_ID = "bench-kiosk"
+
+
+def import_server():
+    os.environ.setdefault("FACETRACK_DATA_DIR", tempfile.mkdtemp(prefix="facetrack-bench-"))
+    os.environ.setdefault("FACETRACK_WARMUP", "0")
+    os.environ.setdefault("FACETRACK_ENCODER_WORKERS", "1")
+    import face_recognition_server
+    return face_recognition_server
+
+
+def jittered(jpeg, count, jitter, rng):
+    """`count` JPEG copies of a frame, each shifted by up to `jitter` pixels"""
+    image = Image.open(io.BytesIO(jpeg)).convert("RGB")
+    frames = []
+    for _ in range(count):
+        dx, dy = rng.integers(-jitter, jitter + 1, size=2)
+        shifted = image.transform(image.size, Image.AFFINE, (1, 0, int(dx), 0, 1, int(dy)))
+        buffer = io.BytesIO()
+        shifted.save(buffer, "JPEG", quality=90)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+def replay(server, stream, fps):
+    """(outcome per frame, latency per frame, encodings run) for one real-time replay"""
+    encodings_before = server.faces_total.value
+    outcomes, latencies = [], []
+    start = time.monotonic()
+    for index, jpeg in enumerate(stream):
+        delay = start + index / fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        began = time.perf_counter()
+        faces = server.process_face_image(server.decode_frame(jpeg), KIOSK_ID)
+        result = server.recognize_faces(*faces) if faces[0] else {"faces": []}
+        latencies.append(time.perf_counter() - began)
+        outcomes.append(tuple((tuple(face["box"].values()), (face["person"] or {}).get("id"),
+                               face.get("attendance", {}).get("recorded")) for face in result["faces"]))
+    return outcomes, latencies, server.faces_total.value - encodings_before
+
+
+def simulate_swaps(gaps, idles, refresh=2.0, fps=5, people=20, hold_seconds=3, jitter=3, seed=0):
+    """Frames whose reused identity is not the person in view, people taking turns at one spot"""
+    results = []
+    for idle in idles:
+        for gap in gaps:
+            rng = np.random.default_rng(seed)
+            tracker = FaceTracker(refresh_seconds=refresh, idle_seconds=idle)
+            now, frames, encodings, wrong = 0.0, 0, 0, 0
+            for person in range(people):
+                for _ in range(gap if person else 0):
+                    tracker.update(KIOSK_ID, [], now)
+                    now += 1 / fps
+                for _ in range(round(hold_seconds * fps)):
+                    dy, dx = (int(value) for value in rng.integers(-jitter, jitter + 1, size=2))
+                    tracks, reused = tracker.update(KIOSK_ID, [(140 + dy, 420 + dx, 360 + dy, 200 + dx)], now)
+                    if reused[0]:
+                        wrong += tracks[0].match != person
+                    else:
+                        tracker.identify(tracks[0], person, now)
+                        encodings += 1
+                    frames += 1
+                    now += 1 / fps
+            results.append({"idle_s": idle, "gap_frames": gap, "refresh_s": refresh, "people": people,
+                            "frames": frames, "encodings": encodings, "wrong_identity_frames": wrong})
+    return results
+
+
+def run(photos, refreshes, fps=5, seconds=10, jitter=3, gap=1, idle=0.0, seed=0):
+    server = import_server()
+    server.readiness.wait("models")
+    server.readiness.wait("gallery")
+    face_recognition = server.face_recognition
+
+    people, empty = [], None
+    for jpeg in photos:
+        image = Image.open(io.BytesIO(jpeg)).convert("RGB")
+        encodings = face_recognition.face_encodings(np.asarray(image))
+        if encodings:
+            people.append((jpeg, encodings[0]))
+        elif empty is None:
+            empty = jpeg
+    if not people:
+        raise SystemExit("No faces found in the --images photos")
+    if empty is None:
+        buffer = io.BytesIO()
+        Image.new("RGB", image.size, (128, 128, 128)).save(buffer, "JPEG")
+        empty = buffer.getvalue()
+
+    rng = np.random.default_rng(seed)
+    stream, employees = [], {}
+    per_photo = max(1, round(fps * seconds / len(people)))
+    for index, (jpeg, encoding) in enumerate(people):
+        # Photos of one person share an employee, as they would share a match
+        known = list(employees.values())
+        if not known or face_recognition.face_distance(known, encoding).min() > server.MATCH_THRESHOLD:
+            employee_id = f"bench-{index}"
+            server.store_face_encodings(employee_id, f"Employee {index}", np.asarray([encoding], dtype=np.float32))
+            employees[employee_id] = encoding
+        if index:
+            stream.extend(jittered(empty, gap, jitter, rng))
+        stream.extend(jittered(jpeg, per_photo, jitter, rng))
+
+    # Detections come from every frame, not from the near-duplicate frame cache
+    server.FRAME_CACHE_TTL_MS = 0
+    results, reference = [], None
+    for refresh in refreshes:
+        server.TRACK_REFRESH_S = refresh
+        server.face_tracker.refresh_seconds = refresh
+        server.face_tracker.idle_seconds = idle
+        server.face_tracker.clear()
+        for employee_id in employees:
+            server.checkin_cooldown.forget(employee_id)
+        outcomes, latencies, encodings = replay(server, stream, fps)
+        if reference is None:
+            reference = (outcomes, encodings)
+        results.append({
+            "refresh_s": refresh,
+            "idle_s": idle,
+            "gap_frames": gap,
+            "fps": fps,
+            "frames": len(stream),
+            "encodings": encodings,
+            "encodings_per_frame": round(encodings / len(stream), 3),
+            "reduction": round(reference[1] / encodings, 2) if encodings else None,
+            "per_frame": latency_summary(latencies),
+            "checkins_recorded": sum(recorded is True for outcome in outcomes for _, _, recorded in outcome),
+            "same_results": outcomes == reference[0],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of .jpg/.png photos of different people (else the canned photo)")
+    parser.add_argument("--people", type=int, default=3, help="photos held in turn during the stream")
+    parser.add_argument("--gap", type=int, default=1, help="frames without a face between two people")
+    parser.add_argument("--idle", type=float, default=0.0, help="FACETRACK_TRACK_IDLE_S")
+    parser.add_argument("--fps", type=float, default=5)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--jitter", type=int, default=3)
+    parser.add_argument("--refresh", type=float, nargs="+", default=[0, 1, 2],
+                        help="FACETRACK_TRACK_REFRESH_S values; the first is the reference")
+    parser.add_argument("--swap-gaps", type=int, nargs="+", default=[0, 1, 3])
+    parser.add_argument("--swap-idle", type=float, nargs="+", default=[0, 1])
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"swaps": simulate_swaps(args.swap_gaps, args.swap_idle, max(args.refresh), args.fps)}
+    if args.images:
+        photos = [base64.b64decode(frame.split(",", 1)[1]) for frame in load_frames(args.people, args.images)]
+    else:
+        photos = canned_scene(args.people)
+    results["stream"] = run(photos, args.refresh, args.fps, args.seconds, args.jitter, args.gap, args.idle)
+    emit("tracking", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Wire size and server CPU of JSON/base64 versus binary frame uploads.
+
+Usage:
+    python benchmarks/bench_upload.py --frames 20 --batch 8 [--images DIR]
+
+Builds the request bodies a kiosk sends for the same JPEG frames:
+- json: {"image": "data:image/jpeg;base64,..."} to /api/recognize
+- raw: the JPEG bytes as an image/jpeg body to /api/recognize
+- json_batch / multipart_batch: --batch frames to /api/recognize/batch
+
+and runs the server's own request handling on each (request_frame() /
+request_frames() inside a Flask request context, then decode_frame() into the
+detection-sized DecodedFrame). Reported per format: body bytes per frame, and the
+calling thread's CPU time per frame for parsing plus decoding. Detection and
+encoding, which follow the same way for every format, are not included.
+
+The server module is imported with a temporary data directory and without
+warm-up or encoder processes.
+"""
+
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+
+from common import emit, latency_summary, load_frames
+
+
+def import_server():
+    os.environ.setdefault("FACETRACK_DATA_DIR", tempfile.mkdtemp(prefix="facetrack-bench-"))
+    os.environ.setdefault("FACETRACK_WARMUP", "0")
+    os.environ.setdefault("FACETRACK_ENCODER_WORKERS", "1")
+    import face_recognition_server
+    return face_recognition_server
+
+
+def multipart_body(jpegs, boundary="facetrack-bench-boundary"):
+    parts = []
+    for index, jpeg in enumerate(jpegs):
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"images\"; filename=\"frame{index}.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode("ascii") + jpeg + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def measure(server, path, body, content_type, batch, repeats):
+    """(CPU seconds per frame for each call, frames decoded) for one request body"""
+    extract = server.request_frames if batch else (lambda: [server.request_frame()])
+    cpu = []
+    decoded = 0
+    for _ in range(repeats):
+        with server.app.test_request_context(path, method="POST", data=body, content_type=content_type):
+            start = time.thread_time()
+            frames = [server.decode_frame(image_data) for image_data in extract()]
+            elapsed = time.thread_time() - start
+        decoded = sum(frame is not None for frame in frames)
+        cpu.append(elapsed / len(frames))
+    return cpu, decoded
+
+
+def run(frames, batch=8, repeats=5):
+    server = import_server()
+    jpegs = [base64.b64decode(frame.split(",", 1)[1]) for frame in frames]
+    results = []
+
+    cases = {"json": [], "raw": []}
+    for frame, jpeg in zip(frames, jpegs):
+        cases["json"].append((json.dumps({"image": frame}).encode("utf-8"), "application/json"))
+        cases["raw"].append((jpeg, "image/jpeg"))
+    for name, bodies in cases.items():
+        cpu, sizes, decoded = [], [], 0
+        for body, content_type in bodies:
+            timings, ok = measure(server, "/api/recognize", body, content_type, False, repeats)
+            cpu.extend(timings)
+            sizes.append(len(body))
+            decoded += ok
+        results.append({"format": name, "frames": len(bodies), "decoded": decoded,
+                        "bytes_per_frame": round(sum(sizes) / len(sizes)), "cpu_per_frame": latency_summary(cpu)})
+
+    groups = [range(start, min(start + batch, len(frames))) for start in range(0, len(frames), batch)]
+    batch_cases = {
+        "json_batch": [(json.dumps({"images": [frames[i] for i in group]}).encode("utf-8"), "application/json")
+                       for group in groups],
+        "multipart_batch": [multipart_body([jpegs[i] for i in group]) for group in groups],
+    }
+    for name, bodies in batch_cases.items():
+        cpu, total_bytes, decoded = [], 0, 0
+        for (body, content_type), group in zip(bodies, groups):
+            timings, ok = measure(server, "/api/recognize/batch", body, content_type, True, repeats)
+            cpu.extend(timings)
+            total_bytes += len(body)
+            decoded += ok
+        results.append({"format": name, "frames": len(frames), "batch": batch, "decoded": decoded,
+                        "bytes_per_frame": round(total_bytes / len(frames)), "cpu_per_frame": latency_summary(cpu)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--images", help="directory of .jpg/.png face photos (else synthetic frames)")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    emit("upload", run(load_frames(args.frames, args.images), args.batch, args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Shared helpers for the FaceTrack benchmarks.
+
+Benchmarks run offline on synthetic data. Synthetic encodings mimic the geometry of
+dlib's 128-d face descriptors: samples of the same person lie ~0.4 apart while
+different people are ~1.0 apart, so match thresholds behave as in production.
+
+Frames for the detection/encoding stages come from a directory of face images
+(--images, or FACETRACK_BENCH_IMAGES); without one, deterministic 640x480 JPEG
+frames are composed from the canned face in data/face.jpg (a crop of NASA's
+public-domain portrait of Eileen Collins, also used as scikit-image's
+"astronaut"), pasted at varying sizes and positions onto synthetic noise, so
+detection and encoding both run. Being one person, canned frames cannot stand
+for different employees.
+"""
+
+import base64
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+ENCODING_DIM = 128
+IDENTITY_SPREAD = 0.07  # per-dimension std of identity centres
+SAMPLE_NOISE = 0.025  # per-dimension std of samples around their centre
+
+# Gallery sizes (employees) covered by the suite
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Face photo the frames are composed from when no --images directory is given
+CANNED_FACE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "face.jpg")
+
+
+def synthetic_centres(n_employees, seed=0):
+    """Random identity centres, one row per employee"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, IDENTITY_SPREAD, size=(n_employees, ENCODING_DIM)).astype(np.float32)
+
+
+def synthetic_samples(centres, samples_per_employee, seed=1):
+    """(n_employees, samples, dim) enrollment samples around each centre"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0.0, SAMPLE_NOISE, size=(len(centres), samples_per_employee, ENCODING_DIM))
+    return (centres[:, None, :] + noise).astype(np.float32)
+
+
+def synthetic_probes(centres, n_probes, seed=2):
+    """Probe encodings of randomly chosen employees; returns (owner_index, probes)"""
+    rng = np.random.default_rng(seed)
+    owners = rng.integers(0, len(centres), size=n_probes)
+    probes = centres[owners] + rng.normal(0.0, SAMPLE_NOISE, size=(n_probes, ENCODING_DIM))
+    return owners, probes.astype(np.float32)
+
+
+def build_gallery(samples, gallery=None):
+    """Fill a FaceGallery from a synthetic samples array"""
+    from face_gallery import FaceGallery
+
+    gallery = gallery if gallery is not None else FaceGallery()
+    n_employees, samples_per_employee, dim = samples.shape
+    gallery.load_arrays(
+        [str(index) for index in range(n_employees)],
+        [f"Employee {index}" for index in range(n_employees)],
+        [samples_per_employee] * n_employees,
+        np.ascontiguousarray(samples.reshape(-1, dim), dtype=np.float32),
+    )
+    return gallery
+
+
+def synthetic_attendance(n_records, n_employees, days=30, seed=3):
+    """Attendance records spread over the last `days` days, oldest first"""
+    rng = np.random.default_rng(seed)
+    now = datetime.now()
+    ages = np.sort(rng.uniform(0, days * 86400, size=n_records))[::-1]
+    employees = rng.integers(0, n_employees, size=n_records)
+    types = rng.integers(0, 2, size=n_records)
+    return [
+        {
+            "id": f"bench-{index:09d}",
+            "employee_id": str(employee),
+            "timestamp": (now - timedelta(seconds=float(age))).isoformat(),
+            "type": "OUT" if attendance_type else "IN",
+        }
+        for index, (age, employee, attendance_type) in enumerate(zip(ages, employees, types))
+    ]
+
+
+def canned_frames(count, seed=0):
+    """`count` 640x480 JPEG frames with the canned photo 120 to 240 px wide (faces of about 60 to 130 px)"""
+    rng = np.random.default_rng(seed)
+    face = Image.open(CANNED_FACE).convert("RGB")
+    frames = []
+    for _ in range(count):
+        background = rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+        frame = Image.fromarray(background).resize((640, 480), Image.BILINEAR)
+        width = int(rng.integers(120, 241))
+        scaled = face.resize((width, round(width * face.height / face.width)), Image.BILINEAR)
+        left = int(rng.integers(0, 640 - scaled.width + 1))
+        top = int(rng.integers(0, 480 - scaled.height + 1))
+        frame.paste(scaled, (left, top))
+        buffer = io.BytesIO()
+        frame.save(buffer, "JPEG", quality=90)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+def canned_scene(arrivals, seed=0):
+    """An empty 640x480 scene, then `arrivals` JPEG frames of it with the canned photo at about the same spot"""
+    rng = np.random.default_rng(seed)
+    face = Image.open(CANNED_FACE).convert("RGB")
+    # Smoother than canned_frames()' noise: HOG finds no faces in it under camera noise
+    background = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    background = Image.fromarray(background).resize((640, 480), Image.BILINEAR)
+    scenes = [background]
+    for _ in range(arrivals):
+        width = int(rng.integers(260, 301))
+        scaled = face.resize((width, round(width * face.height / face.width)), Image.BILINEAR)
+        centre = int(rng.integers(300, 341))
+        frame = background.copy()
+        frame.paste(scaled, (centre - width // 2, int(rng.integers(80, 121))))
+        scenes.append(frame)
+    jpegs = []
+    for scene in scenes:
+        buffer = io.BytesIO()
+        scene.save(buffer, "JPEG", quality=90)
+        jpegs.append(buffer.getvalue())
+    return jpegs
+
+
+def load_frames(count, images_dir=None, seed=0):
+    """`count` base64 data-URL frames from images_dir, or canned face frames (cycled)"""
+    images_dir = images_dir or os.environ.get("FACETRACK_BENCH_IMAGES")
+    if images_dir:
+        paths = sorted(glob.glob(os.path.join(images_dir, "*.jpg")) + glob.glob(os.path.join(images_dir, "*.png")))
+        if not paths:
+            raise SystemExit(f"No .jpg/.png images found in {images_dir}")
+        payloads = []
+        for path in paths:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    else:
+        payloads = canned_frames(min(count, 8), seed)
+
+    return ["data:image/jpeg;base64," + base64.b64encode(payloads[i % len(payloads)]).decode("ascii")
+            for i in range(count)]
+
+
+def time_calls(fn, args_list):
+    """Call fn once per argument tuple; returns per-call wall times in seconds"""
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def latency_summary(timings):
+    """Throughput and latency percentiles (milliseconds) for a list of call times"""
+    timings = np.asarray(timings, dtype=np.float64)
+    total = float(timings.sum())
+    return {
+        "calls": int(len(timings)),
+        "throughput_per_s": round(len(timings) / total, 2) if total else None,
+        "mean_ms": round(float(timings.mean()) * 1000, 4),
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 4),
+        "p95_ms": round(float(np.percentile(timings, 95)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 4),
+    }
+
+
+def environment():
+    """Machine description stored with every result for cross-version comparison"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def emit(benchmark, results, output=None):
+    """Print the results as JSON and optionally write them to a file"""
+    document = {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return document
@@ -0,0 +1,61 @@
+"""
+Compare two benchmark JSON documents (e.g. from two versions).
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json [--metric p95_ms] [--threshold 1.2]
+
+Every latency summary present in both documents is matched by its path (list
+entries are keyed by their employees/history/backend fields where present) and
+printed with the candidate/baseline ratio. Ratios above --threshold are flagged
+and make the exit status 1, so the script can gate a CI job.
+"""
+
+import argparse
+import json
+import sys
+
+KEY_FIELDS = ("backend", "employees", "history", "clients", "mode", "max_batch", "max_wait_ms",
+              "nprobe", "shortlist", "workers")
+
+
+def summaries(node, path=()):
+    """Yield (path, summary) for every latency summary in a results tree"""
+    if isinstance(node, dict):
+        if "p50_ms" in node:
+            yield path, node
+            return
+        for key, value in node.items():
+            yield from summaries(value, path + (key,))
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            label = ",".join(f"{field}={value[field]}" for field in KEY_FIELDS
+                             if isinstance(value, dict) and field in value) or str(index)
+            yield from summaries(value, path + (label,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--threshold", type=float, default=1.2, help="flag ratios above this")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(summaries(json.load(f)["results"]))
+    with open(args.candidate) as f:
+        candidate = dict(summaries(json.load(f)["results"]))
+
+    regressions = 0
+    for path in sorted(set(baseline) & set(candidate)):
+        before, after = baseline[path][args.metric], candidate[path][args.metric]
+        ratio = after / before if before else float("inf")
+        flag = "  REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{'/'.join(path):70s} {before:12.4f} {after:12.4f} {ratio:7.2f}x{flag}")
+    print(f"{regressions} regression(s) above {args.threshold}x in {args.metric}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
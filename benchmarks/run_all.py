@@ -0,0 +1,54 @@
+"""
+Run the enroll, recognize and attendance benchmarks and write one JSON document.
+
+Usage:
+    python benchmarks/run_all.py --output results.json [--quick] [--images DIR]
+    python benchmarks/compare.py baseline.json results.json
+
+--quick limits gallery sizes to 10k employees and histories to 10k records for a
+run of a few minutes; the full run covers 100 to 100k employees.
+"""
+
+import argparse
+import logging
+import time
+
+from common import DEFAULT_SIZES, emit
+
+import bench_attendance
+import bench_enroll
+import bench_recognize
+
+
+def run(quick=False, images_dir=None):
+    sizes = [size for size in DEFAULT_SIZES if size <= 10000] if quick else DEFAULT_SIZES
+    histories = [1000, 10000] if quick else [1000, 10000, 100000]
+    calls = 50 if quick else 100
+
+    suite = {}
+    for name, bench in (
+        ("enroll", lambda: bench_enroll.run(sizes, enrollments=calls)),
+        ("recognize", lambda: bench_recognize.run(sizes, n_probes=calls * 2, images_dir=images_dir)),
+        ("attendance", lambda: bench_attendance.run(histories, calls=calls)),
+    ):
+        start = time.perf_counter()
+        suite[name] = bench()
+        logging.info(f"{name} benchmarks finished in {time.perf_counter() - start:.1f}s")
+    return suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast check")
+    parser.add_argument("--images", help="directory of face images used as frames")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    for noisy in ("storage", "attendance_journal", "encoding_store"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+    emit("suite", run(args.quick, args.images), args.output)
+
+
+if __name__ == "__main__":
+    main()
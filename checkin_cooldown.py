@@ -0,0 +1,168 @@
+"""
+Check-in cooldown cache for the FaceTrack recognition server.
+
+A kiosk recognizes the same person many times while they stand in front of the
+camera. CheckinCooldown remembers the last recorded check-in per employee and
+suppresses repeats inside a cooldown window, so only the first recognition of an
+arrival reaches storage. It also alternates the attendance type: a recognition
+after the cooldown records OUT when the previous record was an IN within the
+maximum shift length, and IN otherwise.
+
+A check-in reserves the employee's slot until the caller reports how storing the
+record went: confirm() keeps it, cancel() restores the previous state so a failed
+record does not start a cooldown (concurrent recognitions meanwhile are
+suppressed, so one arrival is never recorded twice).
+
+The state is kept in memory and periodically written to a small JSON snapshot
+(atomically), so a restart does not produce a burst of duplicate check-ins.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CheckinCooldown:
+    """Per-employee "recently recorded" cache with IN/OUT toggling"""
+
+    def __init__(self, cooldown_seconds=300, max_shift_seconds=16 * 3600,
+                 snapshot_path=None, snapshot_interval=5.0):
+        self.cooldown_seconds = cooldown_seconds
+        self.max_shift_seconds = max_shift_seconds
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._last = {}  # employee_id -> (epoch seconds, attendance type)
+        self._pending = {}  # employee_id -> (reserved entry, entry it replaced) until confirmed
+        self._dirty = False
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                self._last = {employee_id: (float(at), attendance_type)
+                              for employee_id, (at, attendance_type) in json.load(f).items()}
+            logger.info(f"Restored check-in state for {len(self._last)} employees")
+        except Exception as e:
+            logger.error(f"Error loading check-in snapshot: {e}")
+
+    def check_in(self, employee_id, now=None):
+        """
+        Decide whether a recognition should be recorded.
+
+        Returns the attendance type to record ("IN"/"OUT"), or None when the
+        employee was already recorded within the cooldown window. A returned type
+        must be followed by confirm() or cancel().
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last.get(employee_id)
+            attendance_type = self.decide(last, now)
+            if attendance_type is None:
+                return None
+            self._last[employee_id] = (now, attendance_type)
+            self._pending[employee_id] = (self._last[employee_id], last)
+            self._dirty = True
+        self._ensure_snapshot_thread()
+        return attendance_type
+
+    def decide(self, last, now):
+        """Attendance type following the last (epoch seconds, type) check-in (or None), None within the cooldown"""
+        if last is not None and now - last[0] < self.cooldown_seconds:
+            return None
+        if last is not None and last[1] == "IN" and now - last[0] < self.max_shift_seconds:
+            return "OUT"
+        return "IN"
+
+    def sync(self, employee_id, entry):
+        """Settle a check_in() with the (epoch seconds, type) check-in actually stored, e.g. by another process"""
+        with self._lock:
+            self._pending.pop(employee_id, None)
+            if entry is None:
+                self._last.pop(employee_id, None)
+            else:
+                self._last[employee_id] = entry
+            self._dirty = True
+
+    def confirm(self, employee_id):
+        """The check-in returned by check_in() was recorded"""
+        with self._lock:
+            self._pending.pop(employee_id, None)
+
+    def cancel(self, employee_id):
+        """The check-in returned by check_in() was not recorded; restore the previous state"""
+        with self._lock:
+            pending = self._pending.pop(employee_id, None)
+            if pending is None or self._last.get(employee_id) != pending[0]:
+                return
+            if pending[1] is None:
+                del self._last[employee_id]
+            else:
+                self._last[employee_id] = pending[1]
+            self._dirty = True
+
+    def forget(self, employee_id):
+        """Drop an employee's state (e.g. when the employee is deleted)"""
+        with self._lock:
+            self._pending.pop(employee_id, None)
+            if self._last.pop(employee_id, None) is not None:
+                self._dirty = True
+
+    def last_check_in(self, employee_id):
+        """(epoch seconds, type) of the last recorded check-in, or None"""
+        with self._lock:
+            return self._last.get(employee_id)
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def _ensure_snapshot_thread(self):
+        if not self.snapshot_path or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._snapshot_loop, name="checkin-snapshot", daemon=True)
+                self._thread.start()
+
+    def _snapshot_loop(self):
+        while not self._stopping.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def snapshot(self):
+        """Write the state to disk if it changed; entries older than a shift are dropped"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            horizon = time.time() - max(self.cooldown_seconds, self.max_shift_seconds)
+            self._last = {employee_id: entry for employee_id, entry in self._last.items() if entry[0] >= horizon}
+            # Unconfirmed check-ins are saved as the state they replaced
+            state = {employee_id: self._pending[employee_id][1] if employee_id in self._pending else entry
+                     for employee_id, entry in self._last.items()}
+            state = {employee_id: entry for employee_id, entry in state.items() if entry is not None}
+            self._dirty = False
+
+        try:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error(f"Error writing check-in snapshot: {e}")
+
+    def close(self):
+        self._stopping.set()
+        self.snapshot()
@@ -0,0 +1,315 @@
+"""
+Binary on-disk store for the face encodings gallery.
+
+Layout of the store directory:
+
+    manifest.json     current generation plus the compact employee index
+                      ([{"id", "name", "count"}, ...] in row order)
+    base-<gen>.npy    float32 (rows, 128) matrix, rows grouped per employee
+    delta-<gen>.log   append-only log of enrollments and deletions since the base
+
+Enroll and delete append one checksummed record to the delta log, so their cost
+depends on the size of the change rather than the size of the gallery. Startup
+memory-maps the base matrix (copy-on-write) and replays the delta log; a torn
+record at the end of the log is detected by its checksum and discarded.
+
+When the log grows past a fraction of the base, the gallery is compacted into a
+new generation: the new base, index and empty log are written and fsynced first,
+and only then is manifest.json atomically replaced to point at them. A crash at
+any point therefore leaves either the old or the new generation intact.
+
+With shared=True several processes can use one store: appends, loads and
+compactions are serialized by an exclusive lock on store.lock, an appender whose
+delta log was compacted away reopens the current one, and follow() applies the
+records other processes appended since the last load (see shared_gallery.py).
+"""
+
+import contextlib
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared stores are unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+RECORD_MAGIC = b"FTE1"
+RECORD_HEADER = struct.Struct("<4sII")  # magic, payload length, crc32
+META_LENGTH = struct.Struct("<I")
+
+
+def _fsync_directory(directory):
+    """Make renames in a directory durable (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _FileLock:
+    """Reentrant exclusive lock on a file, shared between threads and processes"""
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("Shared encoding stores need fcntl (POSIX)")
+        self._file = open(path, "a+b")
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class EncodingStore:
+    """Base matrix + delta log persistence for a FaceGallery"""
+
+    def __init__(self, directory, dim=128, compact_ratio=0.5, min_compact_bytes=1 << 20, shared=False):
+        """
+        directory: store directory (created if missing)
+        compact_ratio: compact when the delta log exceeds this fraction of the base
+        min_compact_bytes: never compact for delta logs smaller than this
+        shared: the store is written by several processes (POSIX only)
+        """
+        self.directory = directory
+        self.dim = dim
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._base_bytes = 0
+        self._delta = None
+        self._follow_offset = 0
+        os.makedirs(directory, exist_ok=True)
+        self.shared = shared
+        self._file_lock = _FileLock(self._path("store.lock")) if shared else contextlib.nullcontext()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self):
+        return os.path.exists(self._path(MANIFEST))
+
+    def exclusive(self):
+        """Context manager excluding other processes of a shared store (no-op otherwise)"""
+        return self._file_lock
+
+    def _read_manifest(self):
+        with open(self._path(MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def load(self, gallery):
+        """Fill the gallery from the base matrix and delta log; False if no store"""
+        with self._file_lock, self._lock:
+            if not self.exists():
+                return False
+
+            manifest = self._read_manifest()
+            self._generation = manifest["generation"]
+            employees = manifest["employees"]
+
+            base_path = self._path(f"base-{self._generation}.npy")
+            matrix = np.load(base_path, mmap_mode="c") if employees else np.empty((0, self.dim), np.float32)
+            self._base_bytes = os.path.getsize(base_path)
+            gallery.load_arrays(
+                [e["id"] for e in employees],
+                [e["name"] for e in employees],
+                [e["count"] for e in employees],
+                matrix,
+            )
+
+            replayed, self._follow_offset = self._replay(gallery, self._path(f"delta-{self._generation}.log"))
+            self._open_delta()
+            logger.info(f"Loaded {len(employees)} employees from encodings store generation "
+                        f"{self._generation} and replayed {replayed} delta records")
+            return True
+
+    def follow(self, gallery):
+        """
+        Apply the records appended since the last load() or follow().
+
+        Reloads the gallery when the store was compacted in the meantime.
+        Returns the number of records applied (-1 after a reload).
+        """
+        with self._file_lock, self._lock:
+            if self.exists() and self._read_manifest()["generation"] != self._generation:
+                reload = True
+            else:
+                reload = False
+                path = self._path(f"delta-{self._generation}.log")
+                count, self._follow_offset = self._replay(gallery, path, self._follow_offset, truncate=False)
+        if reload:
+            self.load(gallery)
+            return -1
+        return count
+
+    def _replay(self, gallery, path, start_offset=0, truncate=True):
+        """Apply the delta log from start_offset; returns (records, end of the last one)"""
+        if not os.path.exists(path):
+            return 0, start_offset
+
+        count = 0
+        valid_end = start_offset
+        with open(path, "rb") as f:
+            f.seek(start_offset)
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            magic, length, crc = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if magic != RECORD_MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            self._apply(gallery, payload)
+            count += 1
+            offset = start + length
+
+        valid_end = start_offset + offset
+        if truncate and offset != len(data):
+            logger.warning(f"Discarding {len(data) - offset} bytes of incomplete delta log {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid_end)
+                os.fsync(f.fileno())
+        return count, valid_end
+
+    def _apply(self, gallery, payload):
+        (meta_length,) = META_LENGTH.unpack_from(payload)
+        meta = json.loads(payload[META_LENGTH.size:META_LENGTH.size + meta_length])
+        if meta["op"] == "add":
+            rows = np.frombuffer(payload, dtype=np.float32, offset=META_LENGTH.size + meta_length)
+            gallery.add(meta["id"], meta["name"], rows.reshape(meta["count"], self.dim))
+        elif meta["op"] == "delete":
+            gallery.remove(meta["id"])
+
+    def _open_delta(self):
+        if self._delta is not None:
+            self._delta.close()
+        self._delta = open(self._path(f"delta-{self._generation}.log"), "ab")
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _append_record(self, meta, rows=None):
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        payload = META_LENGTH.pack(len(meta_bytes)) + meta_bytes
+        if rows is not None:
+            payload += np.ascontiguousarray(rows, dtype=np.float32).tobytes()
+        record = RECORD_HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+        with self._file_lock, self._lock:
+            if self.shared and (self._delta is None or os.fstat(self._delta.fileno()).st_nlink == 0):
+                # Another process compacted the log we had open
+                self._generation = self._read_manifest()["generation"]
+                self._open_delta()
+            elif self._delta is None:
+                self._open_delta()
+            self._delta.write(record)
+            self._delta.flush()
+            os.fsync(self._delta.fileno())
+            return self._delta.tell()
+
+    def append(self, employee_id, name, encodings):
+        """Persist an enrollment (replacing any previous samples of the employee)"""
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        return self._append_record({"op": "add", "id": employee_id, "name": name, "count": len(rows)}, rows)
+
+    def tombstone(self, employee_id):
+        """Persist the deletion of an employee"""
+        return self._append_record({"op": "delete", "id": employee_id})
+
+    def needs_compaction(self, delta_bytes):
+        return delta_bytes > max(self.min_compact_bytes, self.compact_ratio * self._base_bytes)
+
+    def delta_bytes(self):
+        """Current size of the delta log, including records of other processes"""
+        try:
+            return os.path.getsize(self._path(f"delta-{self._generation}.log"))
+        except OSError:
+            return 0
+
+    def compact(self, gallery):
+        """Write the gallery as a new base generation and start an empty delta log"""
+        with self._file_lock, self._lock:
+            employee_ids, names, counts, matrix = gallery.export_arrays()
+            generation = self._generation + 1
+
+            base_path = self._path(f"base-{generation}.npy")
+            with open(base_path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(base_path + ".tmp", base_path)
+            _atomic_write(self._path(f"delta-{generation}.log"), b"")
+
+            manifest = {
+                "generation": generation,
+                "dim": self.dim,
+                "employees": [
+                    {"id": employee_id, "name": name, "count": int(count)}
+                    for employee_id, name, count in zip(employee_ids, names, counts)
+                ],
+            }
+            _atomic_write(self._path(MANIFEST), json.dumps(manifest).encode("utf-8"))
+            _fsync_directory(self.directory)
+
+            previous = self._generation
+            self._generation = generation
+            self._base_bytes = os.path.getsize(base_path)
+            self._follow_offset = 0
+            self._open_delta()
+            for name in (f"base-{previous}.npy", f"delta-{previous}.log"):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    # Missing, or still memory-mapped on platforms that forbid removal
+                    pass
+            if len(matrix):
+                # A quantized gallery drops its float32 copies of the compacted enrollments
+                gallery.adopt_exact(employee_ids, counts, np.load(base_path, mmap_mode="r"))
+            logger.info(f"Compacted encodings store to generation {generation} ({len(matrix)} samples)")
+
+    def close(self):
+        with self._lock:
+            if self._delta is not None:
+                self._delta.close()
+                self._delta = None
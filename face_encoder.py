@@ -0,0 +1,119 @@
+"""
+Parallel face encoding for enrollment.
+
+Enrollment submits many face samples at once. Decoding a sample and running dlib's
+detector and encoder on it is CPU-bound and holds the GIL, so EncoderPool fans
+the samples out over a process pool instead. The pool is created once and reused
+for every request; results come back in the order the samples were submitted.
+
+With workers <= 1 the samples are encoded sequentially in the calling process.
+"""
+
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def encode_sample(sample, detection_model="hog"):
+    """
+    Decode one face sample (base64 string or raw image bytes) and return its
+    first face encoding.
+
+    Returns None when the sample cannot be decoded or contains no face. Runs in
+    pool worker processes, so it only depends on its arguments.
+    """
+    import face_recognition
+
+    try:
+        if isinstance(sample, str):
+            if ',' in sample:
+                sample = sample.split(',')[1]
+            sample = base64.b64decode(sample)
+        rgb_image = np.array(Image.open(io.BytesIO(sample)))
+
+        face_locations = face_recognition.face_locations(rgb_image, model=detection_model)
+        if not face_locations:
+            return None
+        face_encodings = face_recognition.face_encodings(rgb_image, face_locations[:1])
+        return face_encodings[0] if face_encodings else None
+    except Exception as e:
+        logger.error(f"Error encoding face sample: {e}")
+        return None
+
+
+def _warm_up(_index):
+    """Runs once per worker so process start-up is paid before the first request"""
+    import face_recognition  # noqa: F401
+    return os.getpid()
+
+
+class EncoderPool:
+    """Reusable process pool that encodes face samples in submission order"""
+
+    def __init__(self, workers=None, detection_model="hog"):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.detection_model = detection_model
+        self._executor = None
+        self._warm_up_futures = []
+        self._lock = threading.Lock()
+
+    def _mp_context(self):
+        # Fork where available: spawn would re-import the server module in every worker
+        if "fork" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("fork")
+        return multiprocessing.get_context()
+
+    def start(self, block=True):
+        """
+        Create the worker processes (idempotent).
+
+        With block=False the workers are forked immediately but their warm-up
+        (importing face_recognition) continues in the background; see wait_warm().
+        """
+        if self.workers <= 1:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._mp_context())
+                self._warm_up_futures = [self._executor.submit(_warm_up, index) for index in range(self.workers)]
+                logger.info(f"Started face encoder pool with {self.workers} workers")
+        if block:
+            self.wait_warm()
+
+    def wait_warm(self):
+        """Block until every worker finished its warm-up; re-raises a warm-up error"""
+        for future in self._warm_up_futures:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+                self._warm_up_futures = []
+
+    def encode_samples(self, samples):
+        """Encodings (or None) for each sample (base64 or raw bytes), in the same order"""
+        if self.workers <= 1 or len(samples) <= 1:
+            return [encode_sample(sample, self.detection_model) for sample in samples]
+
+        self.start()
+        models = [self.detection_model] * len(samples)
+        try:
+            return list(self._executor.map(encode_sample, samples, models))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); rebuild the pool and retry once
+            logger.error("Face encoder pool broke; restarting it")
+            self.shutdown()
+            self.start()
+            return list(self._executor.map(encode_sample, samples, models))
@@ -0,0 +1,698 @@
+"""
+Face gallery for the FaceTrack recognition server.
+
+All enrolled face encodings live in one contiguous float32 matrix with a parallel
+owner array mapping each row to an employee slot. Matching a probe computes the
+distance to every stored sample with a single matrix product and then reduces the
+distances per employee (mean and min) with a segmented reduction, so the cost of
+a lookup no longer depends on Python-level loops over employees.
+
+Enroll and delete update the matrix in place: new samples are appended (the
+buffer grows geometrically) and removed samples are back-filled from the tail.
+
+For very large galleries an IVFIndex (see ann_index.py) can be attached; matching
+then scans only the probed partitions and re-ranks the shortlisted employees
+exactly over all of their samples.
+
+With prototype matching enabled each employee also has a prototype: the
+centroid c of their samples and the spread r (mean sample distance to c). By the triangle inequality the mean
+distance of a probe q to the samples lies in [|q - c|, |q - c| + r], so with
+prototype matching enabled only employees whose lower bound beats the best upper
+bound are re-scored against their full sample sets - the same result as the
+full scan, at the cost of one distance per employee plus a short re-rank.
+
+With precision="float16" or "int8" the matrix is stored quantized (2 or 1 bytes
+per value; int8 uses a per-dimension scale) and distances are computed on the
+quantized rows, dequantized one block at a time. The float32 samples are kept
+per employee only to re-rank the `rerank` best approximate candidates exactly
+and for export; after load_arrays() they are views of the (memory-mapped) source
+matrix, and adopt_exact() swaps later enrollments for views of the base an
+encodings store compaction wrote, so only enrollments made since the last load
+or compaction are resident in float32.
+"""
+
+import threading
+
+import numpy as np
+
+ENCODING_DIM = 128
+
+# Slack for float32 rounding when pruning with prototype bounds
+BOUND_TOLERANCE = 1e-4
+
+PRECISIONS = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Rows dequantized at a time when scanning a quantized matrix
+DEQUANTIZE_BLOCK = 32768
+
+# Extra range given to the int8 scales beyond the samples they were fitted on
+INT8_HEADROOM = 1.25
+
+
+class FaceGallery:
+    """Contiguous float32 store of face encodings grouped by employee"""
+
+    def __init__(self, dim=ENCODING_DIM, initial_capacity=1024, precision="float32", rerank=0):
+        """
+        precision: storage of the sample matrix, "float32", "float16" or "int8"
+        rerank: with a quantized precision, re-score this many of the best
+            approximate candidates on float32 samples (0 = approximate only)
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown gallery precision {precision!r}")
+        self._lock = threading.RLock()
+        self._dim = dim
+        self.precision = precision
+        self._quantized = precision != "float32"
+        self._rerank = rerank if self._quantized else 0
+        self._scale = None  # int8: float32 value of one step, per dimension
+        self._matrix = np.zeros((initial_capacity, dim), dtype=PRECISIONS[precision])
+        self._sq_norms = np.zeros(initial_capacity, dtype=np.float32)
+        self._owners = np.zeros(initial_capacity, dtype=np.int32)
+        self._size = 0
+
+        # Employee slots; a slot is reused after its employee is deleted
+        self._slots = {}
+        self._slot_ids = []
+        self._slot_names = []
+        self._slot_counts = []
+        self._free_slots = []
+        # Quantized precisions: float32 samples per slot, for re-ranking and export
+        self._slot_exact = []
+
+        # Rows ordered by owner, rebuilt lazily after a mutation
+        self._segments = None
+
+        # Per-slot prototypes (centroid and spread), only kept while prototype matching is on
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        self._spreads = np.zeros(0, dtype=np.float32)
+        self._prototype_shortlist = None
+        self._prototypes = None
+
+        # Optional approximate index: partition id per row, grouped lazily like owners
+        self._index = None
+        self._lists = np.zeros(initial_capacity, dtype=np.int32)
+        self._list_segments = None
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, employee_id):
+        return employee_id in self._slots
+
+    @property
+    def dim(self):
+        return self._dim
+
+    @property
+    def total_samples(self):
+        return self._size
+
+    def memory_bytes(self):
+        """Resident bytes of the per-sample arrays (float32 views of a memory map excluded)"""
+        with self._lock:
+            total = sum(array.nbytes for array in (self._matrix, self._sq_norms, self._owners, self._lists))
+            return total + sum(exact.nbytes for exact in self._slot_exact
+                               if exact is not None and exact.base is None)
+
+    def employee_ids(self):
+        """Return the ids of all employees in the gallery"""
+        with self._lock:
+            return list(self._slots)
+
+    def name(self, employee_id):
+        """Return the enrolled name for an employee, or None"""
+        slot = self._slots.get(employee_id)
+        return self._slot_names[slot] if slot is not None else None
+
+    def sample_count(self, employee_id):
+        """Return the number of stored samples for an employee"""
+        slot = self._slots.get(employee_id)
+        return self._slot_counts[slot] if slot is not None else 0
+
+    def encodings(self, employee_id):
+        """Return a copy of an employee's encodings as an (n, dim) array"""
+        with self._lock:
+            slot = self._slots.get(employee_id)
+            if slot is None:
+                return np.empty((0, self._dim), dtype=np.float32)
+            if self._quantized:
+                return np.array(self._slot_exact[slot], dtype=np.float32)
+            rows = np.flatnonzero(self._owners[:self._size] == slot)
+            return self._matrix[rows].copy()
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+    def add(self, employee_id, name, encodings):
+        """Store the encodings for an employee, replacing any previous samples"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self._dim)
+        with self._lock:
+            if employee_id in self._slots:
+                self._remove_rows(self._slots[employee_id])
+                slot = self._slots[employee_id]
+            elif self._free_slots:
+                slot = self._free_slots.pop()
+                self._slots[employee_id] = slot
+                self._slot_ids[slot] = employee_id
+            else:
+                slot = len(self._slot_ids)
+                self._slots[employee_id] = slot
+                self._slot_ids.append(employee_id)
+                self._slot_names.append(None)
+                self._slot_counts.append(0)
+                self._slot_exact.append(None)
+
+            self._slot_names[slot] = name
+            self._slot_counts[slot] = len(encodings)
+            if self._quantized:
+                self._slot_exact[slot] = encodings.copy()
+            if self._prototype_shortlist is not None:
+                self._set_prototype(slot, encodings)
+            self._append_rows(slot, encodings)
+            self._segments = None
+            self._list_segments = None
+
+    def remove(self, employee_id):
+        """Remove an employee and all of their samples; returns False if unknown"""
+        with self._lock:
+            slot = self._slots.pop(employee_id, None)
+            if slot is None:
+                return False
+            self._remove_rows(slot)
+            self._slot_ids[slot] = None
+            self._slot_names[slot] = None
+            self._slot_counts[slot] = 0
+            if self._quantized:
+                self._slot_exact[slot] = None
+            self._free_slots.append(slot)
+            self._segments = None
+            self._list_segments = None
+            return True
+
+    def clear(self):
+        """Drop every employee from the gallery"""
+        with self._lock:
+            self._size = 0
+            self._slots.clear()
+            self._slot_ids.clear()
+            self._slot_names.clear()
+            self._slot_counts.clear()
+            self._free_slots.clear()
+            self._slot_exact.clear()
+            self._segments = None
+            self._prototypes = None
+            self._list_segments = None
+            if self._index is not None:
+                self._index.centroids = None
+
+    def _set_prototype(self, slot, encodings):
+        """Centroid and spread of one employee's samples"""
+        if slot >= len(self._centroids):
+            capacity = max(slot + 1, 2 * len(self._centroids), 64)
+            self._centroids = self._grow(self._centroids, capacity)
+            self._spreads = self._grow(self._spreads, capacity)
+        if not len(encodings):
+            return
+        centroid = encodings.mean(axis=0)
+        self._centroids[slot] = centroid
+        self._spreads[slot] = np.linalg.norm(encodings - centroid, axis=1).mean()
+
+    def _append_rows(self, slot, encodings):
+        count = len(encodings)
+        needed = self._size + count
+        if needed > len(self._matrix):
+            capacity = max(needed, 2 * len(self._matrix))
+            self._matrix = self._grow(self._matrix, capacity)
+            self._sq_norms = self._grow(self._sq_norms, capacity)
+            self._owners = self._grow(self._owners, capacity)
+            self._lists = self._grow(self._lists, capacity)
+
+        end = self._size + count
+        self._matrix[self._size:end] = self._quantize(encodings)
+        stored = self._dequantize(self._matrix[self._size:end])
+        self._sq_norms[self._size:end] = np.einsum('ij,ij->i', stored, stored)
+        self._owners[self._size:end] = slot
+        if self._index is not None and self._index.trained:
+            self._lists[self._size:end] = self._index.assign(encodings)
+        self._size = end
+
+    # ------------------------------------------------------------------
+    # Quantization
+    # ------------------------------------------------------------------
+    def _fit_scale(self, encodings):
+        """Widen the int8 scales to cover the encodings, re-quantizing stored rows"""
+        needed = np.abs(encodings).max(axis=0) * INT8_HEADROOM / 127.0
+        needed = np.maximum(needed, 1e-6).astype(np.float32)
+        if self._scale is None:
+            self._scale = needed
+            return
+        if np.all(needed <= self._scale):
+            return
+        scale = np.maximum(self._scale, needed)
+        # Rare: only for samples beyond the headroom of the first fit
+        stored = self._matrix[:self._size].astype(np.float32) * (self._scale / scale)
+        self._matrix[:self._size] = np.rint(stored).astype(np.int8)
+        self._scale = scale
+        dequantized = self._dequantize(self._matrix[:self._size])
+        self._sq_norms[:self._size] = np.einsum('ij,ij->i', dequantized, dequantized)
+
+    def _quantize(self, encodings):
+        """float32 rows in the storage precision"""
+        if self.precision == "int8":
+            self._fit_scale(encodings)
+            return np.clip(np.rint(encodings / self._scale), -127, 127).astype(np.int8)
+        return encodings.astype(self._matrix.dtype, copy=False)
+
+    def _dequantize(self, rows):
+        """Stored rows as float32"""
+        if self.precision == "int8":
+            return rows.astype(np.float32) * self._scale
+        return rows.astype(np.float32, copy=False)
+
+    def _products(self, queries, rows=None):
+        """queries @ (stored rows).T in float32, dequantizing the matrix block by block"""
+        if not self._quantized:
+            matrix = self._matrix[:self._size] if rows is None else self._matrix[rows]
+            return queries @ matrix.T
+        if self.precision == "int8":
+            # Fold the scales into the queries so blocks only need a cast
+            queries = queries * self._scale
+        count = self._size if rows is None else len(rows)
+        products = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, DEQUANTIZE_BLOCK):
+            end = min(start + DEQUANTIZE_BLOCK, count)
+            block = self._matrix[start:end] if rows is None else self._matrix[rows[start:end]]
+            products[:, start:end] = queries @ block.astype(np.float32).T
+        return products
+
+    def _rerank_exact(self, query, employee_ids, mean_distances):
+        """The `rerank` best approximate candidates, re-scored on float32 samples"""
+        if not self._rerank or not len(employee_ids):
+            return employee_ids, mean_distances
+        mean_distances = np.asarray(mean_distances)
+        if len(mean_distances) > self._rerank:
+            best = np.argpartition(mean_distances, self._rerank - 1)[:self._rerank]
+        else:
+            best = np.arange(len(mean_distances))
+        reranked = [employee_ids[column] for column in best]
+        exact = np.array([
+            np.linalg.norm(self._slot_exact[self._slots[employee_id]] - query, axis=1).mean()
+            for employee_id in reranked
+        ], dtype=np.float32)
+        return reranked, exact
+
+    @staticmethod
+    def _grow(array, capacity):
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _remove_rows(self, slot):
+        """Delete a slot's rows by back-filling the holes with live rows from the tail"""
+        owners = self._owners[:self._size]
+        rows = np.flatnonzero(owners == slot)
+        if not len(rows):
+            return
+
+        tail = self._size - len(rows)
+        holes = rows[rows < tail]
+        donors = np.setdiff1d(np.arange(tail, self._size), rows, assume_unique=True)
+        self._matrix[holes] = self._matrix[donors]
+        self._sq_norms[holes] = self._sq_norms[donors]
+        self._owners[holes] = self._owners[donors]
+        self._lists[holes] = self._lists[donors]
+        self._size = tail
+
+    # ------------------------------------------------------------------
+    # Serialization (compatible with the legacy encodings.pkl layout)
+    # ------------------------------------------------------------------
+    def to_dict(self):
+        """Export as {employee_id: {"name": ..., "encodings": [...]}}"""
+        with self._lock:
+            return {
+                employee_id: {
+                    "name": self._slot_names[slot],
+                    "encodings": [row.astype(np.float64) for row in self.encodings(employee_id)],
+                }
+                for employee_id, slot in self._slots.items()
+            }
+
+    def load_arrays(self, employee_ids, names, counts, matrix):
+        """
+        Replace the gallery with a matrix whose rows are grouped per employee.
+
+        The matrix is adopted without copying (e.g. a copy-on-write memory map);
+        it is only copied once the gallery has to grow. An attached index keeps
+        its partitions and is only retrained when the gallery outgrew them.
+        """
+        with self._lock:
+            index_state = (self._index.centroids, self._index.trained_size) if self._index is not None else None
+            self.clear()
+            self._centroids = np.zeros((0, self._dim), dtype=np.float32)
+            self._spreads = np.zeros(0, dtype=np.float32)
+            counts = np.asarray(counts, dtype=np.int64)
+            matrix = matrix.reshape(-1, self._dim)
+            if not len(employee_ids):
+                return
+
+            starts = np.r_[0, np.cumsum(counts)[:-1]]
+            if self._quantized:
+                # Quantize block by block; the float32 source stays mapped, not resident
+                self._matrix = np.empty(matrix.shape, dtype=self._matrix.dtype)
+                self._sq_norms = np.empty(len(matrix), dtype=np.float32)
+                if self.precision == "int8":
+                    self._fit_scale(np.abs(matrix).max(axis=0, keepdims=True))
+                for start in range(0, len(matrix), DEQUANTIZE_BLOCK):
+                    end = start + DEQUANTIZE_BLOCK
+                    self._matrix[start:end] = self._quantize(np.asarray(matrix[start:end], dtype=np.float32))
+                    stored = self._dequantize(self._matrix[start:end])
+                    self._sq_norms[start:end] = np.einsum('ij,ij->i', stored, stored)
+                self._slot_exact = [matrix[start:start + count] for start, count in zip(starts, counts)]
+            else:
+                self._matrix = matrix
+                self._sq_norms = np.einsum('ij,ij->i', matrix, matrix).astype(np.float32)
+                self._slot_exact = [None] * len(employee_ids)
+            self._size = len(matrix)
+            self._owners = np.repeat(np.arange(len(employee_ids), dtype=np.int32), counts)
+            self._lists = np.zeros(len(matrix), dtype=np.int32)
+            self._slot_ids = list(employee_ids)
+            self._slot_names = list(names)
+            self._slot_counts = [int(count) for count in counts]
+            self._slots = {employee_id: slot for slot, employee_id in enumerate(employee_ids)}
+
+            if self._prototype_shortlist is not None:
+                self._centroids = (np.add.reduceat(matrix, starts, axis=0, dtype=np.float64)
+                                   / counts[:, None]).astype(np.float32)
+                offsets = np.empty(len(matrix), dtype=np.float32)
+                for start in range(0, len(matrix), DEQUANTIZE_BLOCK):
+                    end = start + DEQUANTIZE_BLOCK
+                    offsets[start:end] = np.linalg.norm(matrix[start:end] - self._centroids[self._owners[start:end]],
+                                                        axis=1)
+                self._spreads = (np.add.reduceat(offsets, starts) / counts).astype(np.float32)
+
+            if self._index is not None:
+                # The partitions survive a reload; only the rows are assigned to them
+                self._index.centroids, self._index.trained_size = index_state
+                if self._index.trained and not self._index.needs_training(self._size):
+                    for start in range(0, len(matrix), DEQUANTIZE_BLOCK):
+                        end = start + DEQUANTIZE_BLOCK
+                        self._lists[start:end] = self._index.assign(matrix[start:end])
+                else:
+                    self._ensure_index()
+
+    def export_arrays(self):
+        """(employee_ids, names, counts, matrix) with rows grouped per employee"""
+        with self._lock:
+            if not self._size:
+                return [], [], np.empty(0, dtype=np.int64), np.empty((0, self._dim), dtype=np.float32)
+            order, _, slots, counts = self._ordered_segments()
+            if self._quantized:
+                matrix = np.concatenate([self._slot_exact[slot] for slot in slots]).astype(np.float32, copy=False)
+            else:
+                matrix = self._matrix[order]
+            return ([self._slot_ids[slot] for slot in slots],
+                    [self._slot_names[slot] for slot in slots],
+                    counts.copy(),
+                    matrix)
+
+    def adopt_exact(self, employee_ids, counts, matrix):
+        """
+        Quantized precisions: replace resident float32 samples by the same rows of a
+        matrix grouped per employee, e.g. the memory-mapped base just written by
+        EncodingStore.compact(). Employees changed since that export keep their copy.
+        """
+        if not self._quantized:
+            return
+        with self._lock:
+            starts = np.r_[0, np.cumsum(counts)[:-1]] if len(counts) else []
+            for employee_id, start, count in zip(employee_ids, starts, counts):
+                slot = self._slots.get(employee_id)
+                if slot is None or self._slot_exact[slot].base is not None:
+                    continue
+                rows = matrix[start:start + count]
+                if rows.shape == self._slot_exact[slot].shape and np.array_equal(rows, self._slot_exact[slot]):
+                    self._slot_exact[slot] = rows
+
+    def load_dict(self, data):
+        """Replace the gallery contents with a legacy encodings dict"""
+        with self._lock:
+            self.clear()
+            for employee_id, employee_data in data.items():
+                if len(employee_data.get("encodings", [])):
+                    self.add(employee_id, employee_data["name"], employee_data["encodings"])
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+    def _ordered_segments(self):
+        """Row permutation grouping rows by owner plus segment starts and slots"""
+        if self._segments is None:
+            owners = self._owners[:self._size]
+            order = np.argsort(owners, kind='stable')
+            sorted_owners = owners[order]
+            starts = np.flatnonzero(np.r_[True, sorted_owners[1:] != sorted_owners[:-1]])
+            counts = np.diff(np.r_[starts, len(order)])
+            self._segments = (order, starts, sorted_owners[starts], counts)
+        return self._segments
+
+    def _segment_means(self, query, segments):
+        """Exact mean distance from one query to the samples of the given segments"""
+        order, starts, _, counts = self._ordered_segments()
+        rows = self._segment_rows((order, starts, counts), segments)
+        distances = np.sqrt(self._row_sq_distances(query, rows))
+        offsets = np.r_[0, np.cumsum(counts[segments])[:-1]]
+        return np.add.reduceat(distances, offsets) / counts[segments]
+
+    def _segment_rows(self, segments, ids):
+        """Concatenated row indices of the given segment ids"""
+        order, starts, counts = segments
+        if not len(ids):
+            return np.empty(0, dtype=order.dtype)
+        return np.concatenate([order[starts[i]:starts[i] + counts[i]] for i in ids])
+
+    # ------------------------------------------------------------------
+    # Approximate index
+    # ------------------------------------------------------------------
+    def attach_index(self, index):
+        """Use an IVFIndex to shortlist candidates once the gallery is large enough"""
+        with self._lock:
+            self._index = index
+            self._list_segments = None
+            self._ensure_index()
+
+    def _ensure_index(self):
+        """(Re)train the attached index when the gallery has outgrown it"""
+        if self._index is None or not self._index.needs_training(self._size):
+            return
+        samples = self._dequantize(self._matrix[:self._size])
+        self._index.train(samples)
+        self._lists[:self._size] = self._index.assign(samples)
+        self._list_segments = None
+
+    def _ordered_lists(self):
+        """Rows grouped by index partition: (order, starts, counts) per partition id"""
+        if self._list_segments is None:
+            n_lists = len(self._index.centroids)
+            lists = self._lists[:self._size]
+            order = np.argsort(lists, kind='stable')
+            counts = np.bincount(lists, minlength=n_lists)
+            starts = np.r_[0, np.cumsum(counts)[:-1]]
+            self._list_segments = (order, starts, counts)
+        return self._list_segments
+
+    def _ann_scores(self, query):
+        """
+        Mean distances for the employees shortlisted by the index.
+
+        The probed partitions yield candidate samples; the `rerank` employees with
+        the closest candidate samples are then scored exactly over all their rows.
+        """
+        index = self._index
+        rows = self._segment_rows(self._ordered_lists(), index.probe(query))
+        if not len(rows):
+            return [], np.empty(0, dtype=np.float32)
+
+        d2 = self._row_sq_distances(query, rows)
+        owners = self._owners[rows][np.argsort(d2)]
+        _, first_seen = np.unique(owners, return_index=True)
+        shortlist = owners[np.sort(first_seen)][:index.rerank]
+
+        _, _, slots, _ = self._ordered_segments()
+        segment_of_slot = np.full(len(self._slot_ids), -1, dtype=np.int64)
+        segment_of_slot[slots] = np.arange(len(slots))
+        mean_distances = self._segment_means(query, segment_of_slot[shortlist])
+        return [self._slot_ids[slot] for slot in shortlist], mean_distances
+
+    # ------------------------------------------------------------------
+    # Prototype (coarse-to-fine) matching
+    # ------------------------------------------------------------------
+    def enable_prototypes(self, shortlist=None):
+        """
+        Match in two stages: prototype bounds, then exact re-scoring.
+
+        shortlist caps how many employees are re-scored; None (or 0) re-scores
+        every employee that the bounds cannot rule out, which keeps results
+        identical to the full scan.
+        """
+        with self._lock:
+            if self._prototype_shortlist is None:
+                self._build_prototypes()
+            self._prototype_shortlist = shortlist or 0
+
+    def _build_prototypes(self):
+        """Prototypes of the employees enrolled while prototype matching was off"""
+        order, starts, slots, counts = self._ordered_segments() if self._size else ([], [], [], [])
+        for start, slot, count in zip(starts, slots, counts):
+            rows = self._slot_exact[slot] if self._quantized else self._matrix[order[start:start + count]]
+            self._set_prototype(slot, np.asarray(rows, dtype=np.float32))
+        self._prototypes = None
+
+    def _prototype_table(self):
+        """Prototypes of the live employees in segment order"""
+        segments = self._ordered_segments()
+        if self._prototypes is None or self._prototypes[0] is not segments:
+            slots = segments[2]
+            centroids = self._centroids[slots]
+            self._prototypes = (segments, centroids, np.einsum('ij,ij->i', centroids, centroids),
+                                self._spreads[slots])
+        return self._prototypes[1:]
+
+    def _prototype_scores(self, query, threshold):
+        """Mean distances for the employees the prototype bounds cannot rule out"""
+        centroids, centroid_sq_norms, spreads = self._prototype_table()
+        d2 = centroids @ query
+        d2 *= -2.0
+        d2 += centroid_sq_norms
+        d2 += query @ query
+        lower = np.sqrt(np.maximum(d2, 0.0, out=d2))
+
+        # Nobody can beat the best upper bound, nor match beyond the threshold distance
+        bound = min(float((lower + spreads).min()), 1.0 - threshold)
+        candidates = np.flatnonzero(lower <= bound + BOUND_TOLERANCE)
+        shortlist = self._prototype_shortlist
+        if shortlist and len(candidates) > shortlist:
+            candidates = candidates[np.argpartition(lower[candidates], shortlist - 1)[:shortlist]]
+        if not len(candidates):
+            return [], np.empty(0, dtype=np.float32)
+
+        slots = self._ordered_segments()[2]
+        return [self._slot_ids[slots[c]] for c in candidates], self._segment_means(query, candidates)
+
+    def _row_sq_distances(self, query, rows):
+        """Squared distances between one query and a subset of rows"""
+        d2 = self._products(query[None, :], rows)[0]
+        d2 *= -2.0
+        d2 += self._sq_norms[rows]
+        d2 += query @ query
+        return np.maximum(d2, 0.0, out=d2)
+
+    def distances(self, queries):
+        """Euclidean distances between (q, dim) queries and every stored sample"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self._dim)
+        with self._lock:
+            sq_norms = self._sq_norms[:self._size]
+            d2 = self._products(queries)
+            d2 *= -2.0
+            d2 += sq_norms[None, :]
+            d2 += np.einsum('ij,ij->i', queries, queries)[:, None]
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2, out=d2)
+
+    def scores(self, queries):
+        """
+        Per-employee mean and min distances for a batch of queries.
+
+        Returns (employee_ids, mean_distances, min_distances) where the distance
+        arrays have shape (q, len(employee_ids)).
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self._dim)
+        with self._lock:
+            if not self._size:
+                empty = np.empty((len(queries), 0), dtype=np.float32)
+                return [], empty, empty
+            distances = self.distances(queries)
+            order, starts, slots, counts = self._ordered_segments()
+            employee_ids = [self._slot_ids[slot] for slot in slots]
+
+        grouped = distances[:, order]
+        mean_distances = np.add.reduceat(grouped, starts, axis=1) / counts
+        min_distances = np.minimum.reduceat(grouped, starts, axis=1)
+        return employee_ids, mean_distances, min_distances
+
+    def _candidates(self, queries, threshold):
+        """(employee_ids, mean_distances) scored by the configured matcher, per query"""
+        if self._index is not None:
+            self._ensure_index()
+        if not self._size:
+            return [([], np.empty(0, dtype=np.float32))] * len(queries)
+        if self._index is not None and self._index.trained:
+            candidates = [self._ann_scores(query) for query in queries]
+        elif self._prototype_shortlist is not None:
+            candidates = [self._prototype_scores(query, threshold) for query in queries]
+        else:
+            employee_ids, mean_distances, _ = self.scores(queries)
+            candidates = [(employee_ids, row) for row in mean_distances]
+        if self._rerank:
+            candidates = [self._rerank_exact(query, *candidate) for query, candidate in zip(queries, candidates)]
+        return candidates
+
+    def top_k(self, queries, k, threshold):
+        """
+        The k closest employees to each query by mean distance, closest first.
+
+        Returns one [{"id", "name", "distance"}, ...] list per query. Only the
+        employees the configured matcher scores are ranked (prototype and IVF
+        matching skip hopeless ones), but the first entry is always the one
+        match_batch() would consider.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self._dim)
+        with self._lock:
+            results = []
+            for employee_ids, mean_distances in self._candidates(queries, threshold):
+                mean_distances = np.asarray(mean_distances)
+                if len(mean_distances) > k:
+                    closest = np.argpartition(mean_distances, k - 1)[:k]
+                else:
+                    closest = np.arange(len(mean_distances))
+                closest = closest[np.argsort(mean_distances[closest], kind='stable')]
+                results.append([
+                    {"id": employee_ids[column], "name": self.name(employee_ids[column]),
+                     "distance": float(mean_distances[column])}
+                    for column in closest
+                ])
+            return results
+
+    def match_batch(self, queries, threshold):
+        """
+        Best employee for each query using the average-confidence rule.
+
+        Confidence is 1 - mean distance over the employee's samples; a query
+        matches when its best confidence exceeds the threshold.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self._dim)
+        with self._lock:
+            results = []
+            for employee_ids, mean_distances in self._candidates(queries, threshold):
+                if not employee_ids:
+                    results.append(None)
+                    continue
+                column = int(np.argmin(mean_distances))
+                confidence = 1.0 - float(mean_distances[column])
+                if confidence > threshold:
+                    employee_id = employee_ids[column]
+                    results.append({
+                        "id": employee_id,
+                        "name": self.name(employee_id),
+                        "confidence": confidence,
+                    })
+                else:
+                    results.append(None)
+            return results
+
+    def match(self, encoding, threshold):
+        """Best employee for a single encoding, or None below the threshold"""
+        return self.match_batch(np.asarray(encoding).reshape(1, -1), threshold)[0]
@@ -4,7 +4,7 @@ Face Recognition Server for FaceTrack Application
 This Flask server provides face recognition functionality for the FaceTrack web application.
 It uses face_recognition library (which is based on dlib) for accurate face detection and recognition.
 Eel is used for database operations and frontend communication.
-Employee data is stored in XML format.
+Employee data is stored in XML format by default, or in SQLite (FACETRACK_STORAGE=sqlite).
 
 Requirements:
 - Python 3.7+
@@ -16,28 +16,45 @@ Requirements:
 - eel
 - lxml (for XML processing)
 
+Start-up is lazy: face_recognition/dlib is imported, the gallery loaded and the
+models warmed up in background threads, so Flask accepts requests immediately.
+/api/health answers as soon as the process is up; /api/ready reports when
+recognition can be served.
+
 Install dependencies:
 pip install flask face_recognition numpy Pillow flask-cors eel lxml
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import face_recognition
 import numpy as np
 import json
 import os
 import base64
-import io
-from PIL import Image
 import time
 from datetime import datetime
 import logging
 import eel
-import xml.etree.ElementTree as ET
-from lxml import etree
 import pickle
 import uuid
 import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from face_gallery import FaceGallery
+from ann_index import IVFIndex
+from face_encoder import EncoderPool
+from frame_decoder import DecodedFrame
+from face_tracker import FaceTracker
+from frame_cache import FrameCache, perceptual_hash
+from encoding_store import EncodingStore
+from checkin_cooldown import CheckinCooldown
+from attendance_stats import AttendanceCounters
+from recognition_scheduler import MicroBatchScheduler, SchedulerFull
+from metrics import registry as metrics_registry
+from startup import LazyModule, Readiness
+from shared_gallery import SharedGallery
+from sharding import ShardCoordinator, ShardError, shard_for
+from storage import create_storage, EmployeeDirectory, encode_cursor, decode_cursor
+import atexit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -47,221 +64,428 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize Eel
-eel.init('web')  # 'web' is the directory that contains the frontend files
+# Pipeline metrics, served in Prometheus text format at /api/metrics
+PIPELINE_STAGES = ("base64", "image_decode", "full_decode", "detect", "encode", "match", "attendance")
+stage_seconds = {
+    stage: metrics_registry.histogram("facetrack_stage_seconds", "Time spent in each recognition stage", stage=stage)
+    for stage in PIPELINE_STAGES
+}
+frames_total = metrics_registry.counter("facetrack_frames_total", "Frames received for recognition")
+invalid_frames_total = metrics_registry.counter("facetrack_invalid_frames_total", "Frames that could not be decoded")
+no_face_total = metrics_registry.counter("facetrack_no_face_total", "Frames without a detectable face")
+faces_total = metrics_registry.counter("facetrack_faces_total", "Faces encoded for recognition")
+track_reuses_total = metrics_registry.counter("facetrack_track_reuses_total",
+                                              "Faces identified from their kiosk track without encoding")
+frame_cache_hits = metrics_registry.counter("facetrack_frame_cache_total", "Frame cache lookups by outcome",
+                                            result="hit")
+frame_cache_misses = metrics_registry.counter("facetrack_frame_cache_total", "Frame cache lookups by outcome",
+                                              result="miss")
+matches_total = metrics_registry.counter("facetrack_matches_total", "Faces matched to an employee")
+rejects_total = metrics_registry.counter("facetrack_rejects_total", "Faces below the match threshold")
+checkins_recorded = metrics_registry.counter("facetrack_checkins_total", "Check-ins by outcome", result="recorded")
+checkins_suppressed = metrics_registry.counter("facetrack_checkins_total", "Check-ins by outcome", result="suppressed")
+checkins_failed = metrics_registry.counter("facetrack_checkins_total", "Check-ins by outcome", result="failed")
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        metrics_registry.histogram("facetrack_request_seconds", "HTTP request latency by endpoint",
+                                   endpoint=request.endpoint or "unknown").observe(time.perf_counter() - start)
+    return response
+
+# dlib and its models load on first use (normally the warm-up below, in the background)
+face_recognition = LazyModule("face_recognition")
+
+# Start-up components loaded in the background; see /api/ready
+readiness = Readiness()
 
 # Directory to store XML data and face encodings
-DATA_DIR = "face_data"
-EMPLOYEES_XML = os.path.join(DATA_DIR, "employees.xml")
-ATTENDANCE_XML = os.path.join(DATA_DIR, "attendance.xml")
-ENCODINGS_FILE = os.path.join(DATA_DIR, "encodings.pkl")
+DATA_DIR = os.environ.get("FACETRACK_DATA_DIR", "face_data")
+ENCODINGS_DIR = os.path.join(DATA_DIR, "encodings")
+LEGACY_ENCODINGS_FILE = os.path.join(DATA_DIR, "encodings.pkl")
+
+# Storage backend for employees and attendance: "xml" or "sqlite"
+STORAGE_BACKEND = os.environ.get("FACETRACK_STORAGE", "xml")
+SQLITE_DB = os.environ.get("FACETRACK_SQLITE_DB", os.path.join(DATA_DIR, "facetrack.db"))
+# XML backend: split attendance into "day" or "month" partitions (empty = single attendance.xml)
+ATTENDANCE_PARTITION = os.environ.get("FACETRACK_ATTENDANCE_PARTITION", "") or None
+
+# Several server processes (e.g. gunicorn workers) map one published gallery; the
+# writer process follows the encodings store and publishes new generations
+SHARED_GALLERY = os.environ.get("FACETRACK_SHARED_GALLERY", "0") == "1"
+SHARED_GALLERY_DIR = os.path.join(DATA_DIR, "shared_gallery")
+SHARED_GALLERY_POLL_MS = float(os.environ.get("FACETRACK_SHARED_GALLERY_POLL_MS", "200"))
+if SHARED_GALLERY and STORAGE_BACKEND != "sqlite":
+    # The XML files, their journal and compaction are only safe within one process
+    raise RuntimeError("FACETRACK_SHARED_GALLERY=1 needs FACETRACK_STORAGE=sqlite")
 
 # Create data directory if it doesn't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Lock for thread safety when accessing XML files
-xml_lock = threading.Lock()
+# Minimum average confidence (1 - mean face distance) for a match
+MATCH_THRESHOLD = 0.6
 
-# Cache for face encodings (for faster access)
-employee_encodings_cache = {}
+# Gallery matcher: "exact" scans every sample, "prototype" prunes employees with
+# per-employee centroid bounds before scoring (same results), "ivf" probes an
+# approximate index
+MATCHER_MODE = os.environ.get("FACETRACK_MATCHER", "exact")
+PROTOTYPE_SHORTLIST = int(os.environ.get("FACETRACK_PROTOTYPE_SHORTLIST", "0"))  # 0 = no cap
+ANN_LISTS = int(os.environ.get("FACETRACK_ANN_LISTS", "0"))  # 0 = ~sqrt(samples)
+ANN_NPROBE = int(os.environ.get("FACETRACK_ANN_NPROBE", "8"))  # recall/latency knob
+ANN_RERANK = int(os.environ.get("FACETRACK_ANN_RERANK", "16"))  # employees re-scored exactly
 
-def initialize_xml_files():
-    """Initialize XML files if they don't exist"""
-    # Create employees XML if it doesn't exist
-    if not os.path.exists(EMPLOYEES_XML):
-        root = ET.Element("employees")
-        tree = ET.ElementTree(root)
-        tree.write(EMPLOYEES_XML, encoding='utf-8', xml_declaration=True)
-        logger.info("Created new employees XML file")
-    
-    # Create attendance XML if it doesn't exist
-    if not os.path.exists(ATTENDANCE_XML):
-        root = ET.Element("attendance_records")
-        tree = ET.ElementTree(root)
-        tree.write(ATTENDANCE_XML, encoding='utf-8', xml_declaration=True)
-        logger.info("Created new attendance XML file")
+# In-memory gallery of face encodings: one contiguous matrix, optionally quantized
+# ("float16" or "int8") with the best `rerank` candidates re-scored in float32
+GALLERY_PRECISION = os.environ.get("FACETRACK_GALLERY_PRECISION", "float32")
+GALLERY_RERANK = int(os.environ.get("FACETRACK_GALLERY_RERANK", "8"))
+gallery = FaceGallery(precision=GALLERY_PRECISION, rerank=GALLERY_RERANK)
+metrics_registry.gauge("facetrack_gallery_employees", "Employees in the face gallery", fn=lambda: len(gallery))
+metrics_registry.gauge("facetrack_gallery_samples", "Face samples in the face gallery", fn=lambda: gallery.total_samples)
+metrics_registry.gauge("facetrack_gallery_bytes", "Resident bytes of the face gallery", fn=gallery.memory_bytes)
+
+# Face detector: "hog" (CPU) or "cnn" (batched on GPU-enabled dlib builds)
+FACE_DETECTION_MODEL = os.environ.get("FACETRACK_DETECTION_MODEL", "hog")
+
+# Detection runs on a copy of each frame no larger than this (JPEG frames are decoded
+# at reduced scale); boxes are mapped back and encoded at full resolution. 0 = full size.
+# Downscaling raises the smallest detectable face by the same factor (see DETECT_UPSAMPLE)
+DETECT_MAX_SIDE = int(os.environ.get("FACETRACK_DETECT_MAX_SIDE", "0"))
+DETECT_UPSAMPLE = int(os.environ.get("FACETRACK_DETECT_UPSAMPLE", "1"))
+
+# Faces recognized per frame (largest first) and the smallest face, in full-resolution pixels, worth encoding
+MAX_FACES = int(os.environ.get("FACETRACK_MAX_FACES", "5"))
+MIN_FACE_PX = int(os.environ.get("FACETRACK_MIN_FACE_PX", "0"))
+
+# Faces of a kiosk (X-Kiosk-Id) that stay in place reuse the identity of their track
+# instead of being encoded again, for up to TRACK_REFRESH_S seconds. 0 = no tracking
+TRACK_REFRESH_S = float(os.environ.get("FACETRACK_TRACK_REFRESH_S", "2"))
+face_tracker = FaceTracker(
+    iou_threshold=float(os.environ.get("FACETRACK_TRACK_IOU", "0.5")),
+    refresh_seconds=TRACK_REFRESH_S,
+    idle_seconds=float(os.environ.get("FACETRACK_TRACK_IDLE_S", "0")),
+)
+metrics_registry.gauge("facetrack_tracked_kiosks", "Kiosks with face tracks", fn=face_tracker.kiosks)
+
+# A kiosk frame within FRAME_CACHE_DISTANCE hash bits of one of its frames from the last
+# FRAME_CACHE_TTL_MS reuses that frame's detected faces instead of running detection. 0 = off
+FRAME_CACHE_TTL_MS = float(os.environ.get("FACETRACK_FRAME_CACHE_TTL_MS", "1000"))
+frame_cache = FrameCache(
+    max_entries=int(os.environ.get("FACETRACK_FRAME_CACHE_SIZE", "256")),
+    ttl_seconds=FRAME_CACHE_TTL_MS / 1000,
+    max_distance=int(os.environ.get("FACETRACK_FRAME_CACHE_DISTANCE", "4")),
+)
+metrics_registry.gauge("facetrack_frame_cache_entries", "Frames in the near-duplicate frame cache",
+                       fn=lambda: len(frame_cache))
+metrics_registry.gauge("facetrack_frame_cache_hit_ratio", "Share of frame cache lookups that were hits",
+                       fn=lambda: frame_cache_hits.value / max(1, frame_cache_hits.value + frame_cache_misses.value))
+
+# Worker threads that decode and encode the frames of a batch request
+FRAME_WORKERS = int(os.environ.get("FACETRACK_FRAME_WORKERS", str(os.cpu_count() or 4)))
+MAX_BATCH_FRAMES = int(os.environ.get("FACETRACK_MAX_BATCH_FRAMES", "64"))
+frame_executor = ThreadPoolExecutor(max_workers=FRAME_WORKERS, thread_name_prefix="frame")
+
+# Process pool that encodes enrollment samples across cores (1 = encode in-process)
+ENCODER_WORKERS = int(os.environ.get("FACETRACK_ENCODER_WORKERS", str(os.cpu_count() or 1)))
+encoder_pool = EncoderPool(ENCODER_WORKERS, detection_model=FACE_DETECTION_MODEL)
+# Fork the workers now, before any background threads exist; they warm up in the background
+encoder_pool.start(block=False)
+atexit.register(encoder_pool.shutdown)
+
+storage = create_storage(
+    STORAGE_BACKEND, DATA_DIR, db_path=SQLITE_DB,
+    journal_options={
+        "flush_interval": float(os.environ.get("FACETRACK_JOURNAL_FLUSH_MS", "50")) / 1000,
+        "compact_interval": float(os.environ.get("FACETRACK_JOURNAL_COMPACT_S", "30")),
+        "wait_durable": os.environ.get("FACETRACK_JOURNAL_SYNC", "0") == "1",
+    },
+    archive_options={
+        "granularity": ATTENDANCE_PARTITION,
+        "compress": os.environ.get("FACETRACK_ATTENDANCE_COMPRESS", "1") == "1",
+        "cache_records": int(os.environ.get("FACETRACK_ATTENDANCE_CACHE_RECORDS", "100000")),
+    },
+)
+atexit.register(storage.close)
+logger.info(f"Using {STORAGE_BACKEND} storage backend")
 
-initialize_xml_files()
+# Employees are served from memory; storage is only read on load or external changes
+employee_directory = EmployeeDirectory(storage)
+
+# Running attendance totals for /api/stats, counted once at start-up and kept up to date by record_attendance()
+attendance_counters = AttendanceCounters()
 
 def get_employee_by_id(employee_id):
-    """Get employee data by ID from XML"""
+    """Get employee data by ID"""
     try:
-        with xml_lock:
-            tree = ET.parse(EMPLOYEES_XML)
-            root = tree.getroot()
-            
-            for employee in root.findall("employee"):
-                if employee.get("id") == employee_id:
-                    return {
-                        "id": employee.get("id"),
-                        "name": employee.find("name").text,
-                        "department": employee.find("department").text if employee.find("department") is not None else "",
-                        "position": employee.find("position").text if employee.find("position") is not None else "",
-                        "created_at": employee.get("created_at")
-                    }
-        
-        return None
+        return employee_directory.get(employee_id)
     except Exception as e:
         logger.error(f"Error retrieving employee: {e}")
         return None
 
 def save_employee(employee_id, name, department="", position=""):
-    """Save employee data to XML"""
+    """Save employee data"""
     try:
-        with xml_lock:
-            tree = ET.parse(EMPLOYEES_XML)
-            root = tree.getroot()
-            
-            # Check if employee already exists
-            existing = False
-            for employee in root.findall("employee"):
-                if employee.get("id") == employee_id:
-                    existing = True
-                    employee.find("name").text = name
-                    if employee.find("department") is not None:
-                        employee.find("department").text = department
-                    else:
-                        dept = ET.SubElement(employee, "department")
-                        dept.text = department
-                        
-                    if employee.find("position") is not None:
-                        employee.find("position").text = position
-                    else:
-                        pos = ET.SubElement(employee, "position")
-                        pos.text = position
-                    break
-            
-            # Add new employee if not found
-            if not existing:
-                employee = ET.SubElement(root, "employee")
-                employee.set("id", employee_id)
-                employee.set("created_at", datetime.now().isoformat())
-                
-                name_elem = ET.SubElement(employee, "name")
-                name_elem.text = name
-                
-                dept = ET.SubElement(employee, "department")
-                dept.text = department
-                
-                pos = ET.SubElement(employee, "position")
-                pos.text = position
-            
-            # Write back to file
-            tree.write(EMPLOYEES_XML, encoding='utf-8', xml_declaration=True)
-            
-            # Pretty print for better readability
-            parser = etree.XMLParser(remove_blank_text=True)
-            tree = etree.parse(EMPLOYEES_XML, parser)
-            tree.write(EMPLOYEES_XML, encoding='utf-8', xml_declaration=True, pretty_print=True)
-            
-            return True
+        return employee_directory.save(employee_id, name, department, position)
     except Exception as e:
         logger.error(f"Error saving employee: {e}")
         return False
 
-def load_encodings_from_file():
-    """Load face encodings from pickle file"""
-    if os.path.exists(ENCODINGS_FILE):
-        try:
-            with open(ENCODINGS_FILE, 'rb') as f:
-                global employee_encodings_cache
-                employee_encodings_cache = pickle.load(f)
-            logger.info(f"Loaded {len(employee_encodings_cache)} employee encodings from file")
+# Binary encodings store: memory-mapped base matrix plus an append-only delta log
+encoding_store = EncodingStore(ENCODINGS_DIR, shared=SHARED_GALLERY)
+atexit.register(encoding_store.close)
+
+def load_encodings():
+    """Load face encodings from the store, migrating a legacy encodings.pkl once"""
+    try:
+        if encoding_store.load(gallery):
             return True
-        except Exception as e:
-            logger.error(f"Error loading encodings file: {e}")
-            return False
-    else:
-        logger.info("No existing encodings file found")
+        
+        if os.path.exists(LEGACY_ENCODINGS_FILE):
+            with open(LEGACY_ENCODINGS_FILE, 'rb') as f:
+                gallery.load_dict(pickle.load(f))
+            logger.info(f"Migrating {len(gallery)} employee encodings from {LEGACY_ENCODINGS_FILE}")
+        else:
+            logger.info("No existing encodings found")
+        
+        # Create the first store generation
+        encoding_store.compact(gallery)
+        return True
+    except Exception as e:
+        logger.error(f"Error loading encodings: {e}")
         return False
 
-# Try loading existing encodings
-load_encodings_from_file()
+shared_gallery = None
+if SHARED_GALLERY:
+    shared_gallery = SharedGallery(gallery, encoding_store, SHARED_GALLERY_DIR, load_fn=load_encodings,
+                                   poll_interval=SHARED_GALLERY_POLL_MS / 1000)
+    atexit.register(shared_gallery.stop)
+    metrics_registry.gauge("facetrack_gallery_generation", "Shared gallery generation mapped by this process",
+                           fn=lambda: shared_gallery.generation)
+
+# Sharding: a shard owns the employees that shard_for() assigns to its index; a
+# coordinator holds no encodings and fans queries out to the shard servers
+SHARD_INDEX = int(os.environ.get("FACETRACK_SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.environ.get("FACETRACK_SHARD_COUNT", "1"))
+# Setting FACETRACK_SHARD_COUNT (even to 1) makes this server a shard that serves /api/shard/*
+SHARD_SERVER = "FACETRACK_SHARD_COUNT" in os.environ
+SHARD_URLS = [url for url in os.environ.get("FACETRACK_SHARDS", "").split(",") if url.strip()]
+SHARD_TIMEOUT_MS = float(os.environ.get("FACETRACK_SHARD_TIMEOUT_MS", "500"))
+SHARD_TOP_K = int(os.environ.get("FACETRACK_SHARD_TOP_K", "5"))
+shard_coordinator = None
+if SHARD_URLS:
+    shard_coordinator = ShardCoordinator(SHARD_URLS, timeout=SHARD_TIMEOUT_MS / 1000, k=SHARD_TOP_K)
+    atexit.register(shard_coordinator.shutdown)
+    logger.info(f"Coordinating {len(SHARD_URLS)} gallery shards")
+shard_misses_total = metrics_registry.counter("facetrack_shard_misses_total",
+                                              "Shard answers missing from coordinated queries (timeout or error)")
+
+def load_gallery():
+    """Load the encodings and configure the matcher (start-up component "gallery")"""
+    if shard_coordinator is not None:
+        # The shards hold the encodings
+        return
+    
+    if MATCHER_MODE == "ivf":
+        gallery.attach_index(IVFIndex(n_lists=ANN_LISTS, nprobe=ANN_NPROBE, rerank=ANN_RERANK))
+        logger.info(f"Using IVF matcher (nprobe={ANN_NPROBE}, rerank={ANN_RERANK})")
+    elif MATCHER_MODE == "prototype":
+        gallery.enable_prototypes(PROTOTYPE_SHORTLIST)
+        logger.info(f"Using prototype matcher (shortlist={PROTOTYPE_SHORTLIST or 'uncapped'})")
+    
+    if shared_gallery is not None:
+        # Becomes the writer (loading the store) or maps the writer's first generation
+        shared_gallery.start()
+        shared_gallery.wait_loaded()
+    else:
+        load_encodings()
+    
+    # Build the matcher's lazy structures (segments, prototypes, IVF training) now
+    if len(gallery):
+        gallery.match(np.zeros(gallery.dim, dtype=np.float32), MATCH_THRESHOLD)
+
+# Run one detection and encoding at start-up so the first real frame is not slow
+WARMUP_INFERENCE = os.environ.get("FACETRACK_WARMUP", "1") == "1"
+
+def load_models():
+    """Import face_recognition and optionally warm up dlib (start-up component "models")"""
+    face_recognition.load()
+    if WARMUP_INFERENCE:
+        blank = np.zeros((160, 160, 3), dtype=np.uint8)
+        face_recognition.face_locations(blank, model=FACE_DETECTION_MODEL)
+        # A fixed location forces the landmark and encoder networks to run on the blank frame
+        face_recognition.face_encodings(blank, [(16, 144, 144, 16)])
+
+def rebuild_attendance_counters():
+    """Count the stored attendance once (start-up component "attendance")"""
+    attendance_counters.rebuild(storage)
+
+def _maybe_compact_encodings(delta_bytes):
+    if encoding_store.needs_compaction(delta_bytes):
+        encoding_store.compact(gallery)
+
+def store_face_encodings(employee_id, name, encodings):
+    """Add an employee's encodings to the gallery and persist them as a delta"""
+    # A track identified before the change may now match someone else
+    face_tracker.clear()
+    if shard_coordinator is not None:
+        shard_coordinator.store(employee_id, name, encodings)
+        return
+    if shared_gallery is not None:
+        # The writer applies the delta and publishes it to every process
+        encoding_store.append(employee_id, name, encodings)
+        return
+    gallery.add(employee_id, name, encodings)
+    _maybe_compact_encodings(encoding_store.append(employee_id, name, encodings))
 
-def save_encodings_to_file():
-    """Save face encodings to pickle file"""
+def remove_face_encodings(employee_id):
+    """Remove an employee's encodings from the gallery and persist a tombstone"""
+    face_tracker.clear()
+    if shard_coordinator is not None:
+        shard_coordinator.remove(employee_id)
+        return
+    if shared_gallery is not None:
+        if employee_id in gallery:
+            encoding_store.tombstone(employee_id)
+        return
+    if gallery.remove(employee_id):
+        _maybe_compact_encodings(encoding_store.tombstone(employee_id))
+
+def record_attendance(employee_id, attendance_type="IN"):
+    """Record an attendance entry"""
     try:
-        with open(ENCODINGS_FILE, 'wb') as f:
-            pickle.dump(employee_encodings_cache, f)
-        logger.info(f"Saved {len(employee_encodings_cache)} employee encodings to file")
+        record = {
+            "id": str(uuid.uuid4()),
+            "employee_id": employee_id,
+            "timestamp": datetime.now().isoformat(),
+            "type": attendance_type,
+        }
+        storage.record_attendance(record)
+        attendance_counters.record(employee_id, attendance_type, record["timestamp"])
+        
+        logger.info(f"Recorded {attendance_type} attendance for employee {employee_id}")
         return True
     except Exception as e:
-        logger.error(f"Error saving encodings file: {e}")
+        logger.error(f"Error recording attendance: {e}")
         return False
 
-def record_attendance(employee_id, attendance_type="IN"):
-    """Record an attendance entry in the XML file"""
+# Repeat recognitions within the cooldown return the match without a new record
+CHECKIN_COOLDOWN_S = float(os.environ.get("FACETRACK_CHECKIN_COOLDOWN_S", "300"))
+MAX_SHIFT_HOURS = float(os.environ.get("FACETRACK_MAX_SHIFT_HOURS", "16"))
+checkin_cooldown = CheckinCooldown(
+    CHECKIN_COOLDOWN_S, MAX_SHIFT_HOURS * 3600,
+    # Shared workers settle check-ins in the database instead (see shared_check_in())
+    snapshot_path=None if SHARED_GALLERY else os.path.join(DATA_DIR, "checkin_state.json"),
+)
+atexit.register(checkin_cooldown.close)
+
+def check_in(employee_id):
+    """Record IN/OUT for a recognized employee unless they were just recorded"""
+    with stage_seconds["attendance"].time():
+        attendance_type = checkin_cooldown.check_in(employee_id)
+        if attendance_type is None:
+            checkins_suppressed.inc()
+            return {"recorded": False}
+        if SHARED_GALLERY:
+            return shared_check_in(employee_id, attendance_type)
+        recorded = False
+        try:
+            recorded = record_attendance(employee_id, attendance_type)
+        finally:
+            # A record that failed must not start the cooldown, or the arrival is lost
+            if recorded:
+                checkin_cooldown.confirm(employee_id)
+            else:
+                checkin_cooldown.cancel(employee_id)
+        (checkins_recorded if recorded else checkins_failed).inc()
+        return {"recorded": recorded, "type": attendance_type}
+
+def shared_check_in(employee_id, attendance_type):
+    """
+    check_in() for worker processes sharing the database: this worker's cooldown only
+    filters the repeats it saw itself, so the cooldown and IN/OUT decision are taken
+    again on the employee's latest stored record, in the transaction that records it.
+    """
+    now = datetime.now()
+
+    def stored(record):
+        return (datetime.fromisoformat(record["timestamp"]).timestamp(), record["type"]) if record else None
+
+    def make_record(latest):
+        decided = checkin_cooldown.decide(stored(latest), now.timestamp())
+        if decided is None:
+            return None
+        return {"id": str(uuid.uuid4()), "employee_id": employee_id, "timestamp": now.isoformat(), "type": decided}
+
     try:
-        with xml_lock:
-            tree = ET.parse(ATTENDANCE_XML)
-            root = tree.getroot()
-            
-            record = ET.SubElement(root, "record")
-            record.set("id", str(uuid.uuid4()))
-            record.set("employee_id", employee_id)
-            record.set("timestamp", datetime.now().isoformat())
-            record.set("type", attendance_type)
-            
-            # Write back to file
-            tree.write(ATTENDANCE_XML, encoding='utf-8', xml_declaration=True)
-            
-            # Pretty print for better readability
-            parser = etree.XMLParser(remove_blank_text=True)
-            tree = etree.parse(ATTENDANCE_XML, parser)
-            tree.write(ATTENDANCE_XML, encoding='utf-8', xml_declaration=True, pretty_print=True)
-            
-            logger.info(f"Recorded {attendance_type} attendance for employee {employee_id}")
-            return True
+        latest, record = storage.record_attendance_if(employee_id, make_record)
     except Exception as e:
         logger.error(f"Error recording attendance: {e}")
-        return False
+        checkin_cooldown.cancel(employee_id)
+        checkins_failed.inc()
+        return {"recorded": False, "type": attendance_type}
+    
+    if record is None:
+        # Another worker recorded them within the cooldown
+        checkin_cooldown.sync(employee_id, stored(latest))
+        checkins_suppressed.inc()
+        return {"recorded": False}
+    checkin_cooldown.sync(employee_id, stored(record))
+    attendance_counters.record(employee_id, record["type"], record["timestamp"])
+    checkins_recorded.inc()
+    logger.info(f"Recorded {record['type']} attendance for employee {employee_id}")
+    return {"recorded": True, "type": record["type"]}
 
 def get_all_employees():
-    """Get all employees from XML"""
+    """Get all employees with their enrolled sample counts (not known to a shard coordinator)"""
     try:
-        with xml_lock:
-            tree = ET.parse(EMPLOYEES_XML)
-            root = tree.getroot()
-            
-            employees = []
-            for employee in root.findall("employee"):
-                employees.append({
-                    "id": employee.get("id"),
-                    "name": employee.find("name").text,
-                    "department": employee.find("department").text if employee.find("department") is not None else "",
-                    "position": employee.find("position").text if employee.find("position") is not None else "",
-                    "created_at": employee.get("created_at"),
-                    "samples": len(employee_encodings_cache.get(employee.get("id"), {}).get("encodings", [])),
-                })
-            
-            return employees
+        employees = employee_directory.all()
+        if shard_coordinator is None:
+            for employee in employees:
+                employee["samples"] = gallery.sample_count(employee["id"])
+        return employees
     except Exception as e:
         logger.error(f"Error getting all employees: {e}")
         return []
 
+# Upper bound on the page size of attendance queries
+MAX_ATTENDANCE_PAGE = 1000
+
+def query_attendance_records(since=None, until=None, employee_id=None, attendance_type=None,
+                             cursor=None, limit=100):
+    """
+    Query attendance records newest first.
+
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for an invalid cursor.
+    """
+    limit = max(1, min(int(limit), MAX_ATTENDANCE_PAGE))
+    after = decode_cursor(cursor) if cursor else None
+    raw_records = storage.query_attendance(since, until, employee_id, attendance_type, after, limit)
+    employees = employee_directory.snapshot()
+    
+    records = []
+    for record in raw_records:
+        employee = employees.get(record["employee_id"])
+        records.append({
+            "id": record["id"],
+            "employeeId": record["employee_id"],
+            "employeeName": employee["name"] if employee else "Unknown",
+            "timestamp": record["timestamp"],
+            "type": record["type"]
+        })
+    
+    next_cursor = encode_cursor(raw_records[-1]) if len(raw_records) == limit else None
+    return records, next_cursor
+
 def get_attendance_records(limit=100):
-    """Get attendance records from XML"""
+    """Get the most recent attendance records"""
     try:
-        with xml_lock:
-            tree = ET.parse(ATTENDANCE_XML)
-            root = tree.getroot()
-            
-            records = []
-            for record in root.findall("record"):
-                employee_id = record.get("employee_id")
-                employee = get_employee_by_id(employee_id)
-                
-                records.append({
-                    "id": record.get("id"),
-                    "employeeId": employee_id,
-                    "employeeName": employee["name"] if employee else "Unknown",
-                    "timestamp": record.get("timestamp"),
-                    "type": record.get("type")
-                })
-            
-            # Sort by timestamp desc and limit records
-            records.sort(key=lambda x: x["timestamp"], reverse=True)
-            return records[:limit]
+        records, _ = query_attendance_records(limit=limit)
+        return records
     except Exception as e:
         logger.error(f"Error getting attendance records: {e}")
         return []
@@ -269,72 +493,299 @@ def get_attendance_records(limit=100):
 def delete_employee(employee_id):
     """Delete an employee and their data"""
     try:
-        # Delete from XML
-        with xml_lock:
-            tree = ET.parse(EMPLOYEES_XML)
-            root = tree.getroot()
-            
-            for employee in root.findall("employee"):
-                if employee.get("id") == employee_id:
-                    root.remove(employee)
-                    tree.write(EMPLOYEES_XML, encoding='utf-8', xml_declaration=True)
-                    
-                    # Pretty print for better readability
-                    parser = etree.XMLParser(remove_blank_text=True)
-                    tree = etree.parse(EMPLOYEES_XML, parser)
-                    tree.write(EMPLOYEES_XML, encoding='utf-8', xml_declaration=True, pretty_print=True)
-                    break
-        
-        # Remove from encodings cache
-        if employee_id in employee_encodings_cache:
-            del employee_encodings_cache[employee_id]
-            save_encodings_to_file()
-            
+        # Remove from the gallery first: with sharding it can fail (ShardError),
+        # and then the employee is kept rather than left with orphaned encodings
+        remove_face_encodings(employee_id)
+        checkin_cooldown.forget(employee_id)
+        
+        employee_directory.delete(employee_id)
+        
         return True
     except Exception as e:
         logger.error(f"Error deleting employee: {e}")
         return False
 
-def base64_to_image(base64_string):
-    """Convert base64 string to PIL Image"""
+def decode_frame(image_data):
+    """
+    Decode a frame into a DecodedFrame (detection-sized), or None if invalid.
+    
+    image_data is a base64 string (optionally a data URL) from a JSON body, or the
+    raw image bytes / uploaded file of a binary request, which skip the base64 stage.
+    """
+    frames_total.inc()
     try:
-        # If there's a data URL prefix, remove it
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64 string
-        image_bytes = base64.b64decode(base64_string)
-        image = Image.open(io.BytesIO(image_bytes))
-        return image
+        if isinstance(image_data, str):
+            # If there's a data URL prefix, remove it
+            if ',' in image_data:
+                image_data = image_data.split(',')[1]
+            
+            # Decode base64 string
+            with stage_seconds["base64"].time():
+                image_bytes = base64.b64decode(image_data)
+        else:
+            image_bytes = image_data
+        with stage_seconds["image_decode"].time():
+            return DecodedFrame(image_bytes, DETECT_MAX_SIDE)
     except Exception as e:
-        logger.error(f"Error converting base64 to image: {e}")
+        invalid_frames_total.inc()
+        logger.error(f"Error decoding frame: {e}")
         return None
 
-def process_face_image(image):
-    """Process image and extract face encoding"""
+def process_face_image(frame, kiosk_id=None):
+    """
+    Detect the faces in a DecodedFrame and encode those not identified by a track.
+    Returns (boxes, tracks, reused, encodings), see _encode_faces(); boxes is empty if none.
+    """
     try:
-        # Convert PIL Image to numpy array
-        rgb_image = np.array(image)
-        
-        # Find all face locations in the image
-        face_locations = face_recognition.face_locations(rgb_image)
-        
-        if not face_locations:
+        frame_hash, boxes = _cached_faces(frame, kiosk_id)
+        if boxes is None:
+            boxes = _select_faces(frame, _locate_faces(frame.detection))
+            if frame_hash is not None:
+                frame_cache.put(kiosk_id, frame_hash, boxes)
+        faces = _encode_faces(frame, boxes, kiosk_id)
+        if not faces[0]:
+            no_face_total.inc()
             logger.warning("No faces found in image")
-            return None
-        
-        # Get face encodings
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-        
-        if not face_encodings:
-            logger.warning("Failed to encode face")
-            return None
-        
-        # Return the first face encoding
-        return face_encodings[0]
+        return faces
     except Exception as e:
         logger.error(f"Error processing face image: {e}")
+        return [], [], [], []
+
+def _cached_faces(frame, kiosk_id):
+    """
+    (frame hash, boxes) for the frame cache: the boxes detected in a recent near-duplicate
+    frame of the kiosk, or None. The hash is None when the frame is not cached.
+    """
+    if kiosk_id is None or FRAME_CACHE_TTL_MS <= 0:
+        return None, None
+    frame_hash = perceptual_hash(frame.detection)
+    boxes = frame_cache.get(kiosk_id, frame_hash)
+    (frame_cache_misses if boxes is None else frame_cache_hits).inc()
+    return frame_hash, boxes
+
+def _locate_faces(rgb_image):
+    with stage_seconds["detect"].time():
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=DETECT_UPSAMPLE,
+                                               model=FACE_DETECTION_MODEL)
+
+def _locate_faces_batch(rgb_images):
+    """Face locations for each image; CNN detection runs batched per image size"""
+    if FACE_DETECTION_MODEL != "cnn":
+        return list(frame_executor.map(_locate_faces, rgb_images))
+    
+    locations = [None] * len(rgb_images)
+    by_shape = {}
+    for index, rgb_image in enumerate(rgb_images):
+        by_shape.setdefault(rgb_image.shape, []).append(index)
+    for indices in by_shape.values():
+        batch = [rgb_images[index] for index in indices]
+        with stage_seconds["detect"].time():
+            found_batch = face_recognition.batch_face_locations(
+                batch, number_of_times_to_upsample=DETECT_UPSAMPLE, batch_size=len(batch))
+        for index, found in zip(indices, found_batch):
+            locations[index] = found
+    return locations
+
+def _select_faces(frame, face_locations):
+    """Full-resolution boxes of the faces to encode: at least MIN_FACE_PX, largest first, at most MAX_FACES"""
+    boxes = [box for box in frame.to_full(face_locations)
+             if min(box[2] - box[0], box[1] - box[3]) >= MIN_FACE_PX]
+    boxes.sort(key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True)
+    return boxes[:MAX_FACES]
+
+def track_faces(kiosk_id, boxes):
+    """(tracks, reused) of the faces of a kiosk's frame; untracked without a kiosk id"""
+    if kiosk_id is None or TRACK_REFRESH_S <= 0:
+        return [None] * len(boxes), [False] * len(boxes)
+    return face_tracker.update(kiosk_id, boxes)
+
+def _encode_faces(frame, boxes, kiosk_id=None):
+    """
+    (boxes, tracks, reused, encodings) of the selected faces: their full-resolution
+    boxes, their kiosk tracks (None when untracked), whether each face's identity is
+    reused from its track, and the encodings of the other faces, in order, encoded
+    together on the full-resolution frame.
+    """
+    tracks, reused = track_faces(kiosk_id, boxes)
+    pending = [box for box, reuse in zip(boxes, reused) if not reuse]
+    track_reuses_total.inc(len(boxes) - len(pending))
+    if not pending:
+        return boxes, tracks, reused, []
+    with stage_seconds["full_decode"].time():
+        rgb_image = frame.full()
+    with stage_seconds["encode"].time():
+        encodings = face_recognition.face_encodings(rgb_image, pending)
+    faces_total.inc(len(encodings))
+    return boxes, tracks, reused, encodings
+
+def process_face_images(frames, kiosk_ids=None):
+    """process_face_image() results for a list of DecodedFrames"""
+    kiosk_ids = kiosk_ids or [None] * len(frames)
+    cached = [_cached_faces(frame, kiosk_id) for frame, kiosk_id in zip(frames, kiosk_ids)]
+    boxes = [frame_boxes for _, frame_boxes in cached]
+    
+    # Detection only runs on the frames the cache had nothing for
+    missing = [index for index, frame_boxes in enumerate(boxes) if frame_boxes is None]
+    locations = _locate_faces_batch([frames[index].detection for index in missing])
+    for index, face_locations in zip(missing, locations):
+        boxes[index] = _select_faces(frames[index], face_locations)
+        frame_hash = cached[index][0]
+        if frame_hash is not None:
+            frame_cache.put(kiosk_ids[index], frame_hash, boxes[index])
+    return list(frame_executor.map(_encode_faces, frames, boxes, kiosk_ids))
+
+def match_encodings(encodings):
+    """
+    Best matching employee (or None) for each encoding, locally or across the shards.
+    Raises ShardError when a shard did not answer, so nobody is checked in on a
+    partial gallery.
+    """
+    with stage_seconds["match"].time():
+        if shard_coordinator is None:
+            return gallery.match_batch(encodings, MATCH_THRESHOLD)
+        matches, missing = shard_coordinator.match_batch(encodings, MATCH_THRESHOLD)
+    if missing:
+        shard_misses_total.inc(len(missing))
+        raise ShardError(f"Gallery shards unavailable: {', '.join(missing)}")
+    return matches
+
+def face_results(boxes, matches):
+    """
+    Response for one frame: every face with its box and identity, and a check-in per
+    matched face. The top-level person/attendance are the largest matched face's.
+    """
+    faces = []
+    attendance = {}
+    for (top, right, bottom, left), best_match in zip(boxes, matches):
+        (matches_total if best_match else rejects_total).inc()
+        face = {"box": {"top": top, "right": right, "bottom": bottom, "left": left}, "person": best_match}
+        if best_match:
+            # Record attendance, once per employee however often they appear in the frame
+            employee_id = best_match["id"]
+            if employee_id not in attendance:
+                attendance[employee_id] = check_in(employee_id)
+            face["attendance"] = attendance[employee_id]
+        faces.append(face)
+    
+    primary = next((face for face in faces if face["person"]), None)
+    if primary:
+        return {"success": True, "person": primary["person"], "attendance": primary["attendance"], "faces": faces}
+    return {"success": True, "person": None, "message": "No match found", "faces": faces}
+
+def face_matches(tracks, reused, matches):
+    """Match of every face: its track's identity where reused, else the next fresh match"""
+    fresh = iter(matches)
+    results = []
+    for track, reuse in zip(tracks, reused):
+        if reuse:
+            results.append(track.match)
+            continue
+        best_match = next(fresh)
+        if track is not None:
+            face_tracker.identify(track, best_match)
+        results.append(best_match)
+    return results
+
+def recognize_faces(boxes, tracks, reused, encodings):
+    """Match the encoded faces of one frame against the gallery in one operation and check them all in"""
+    matches = match_encodings(np.asarray(encodings)) if encodings else []
+    return face_results(boxes, face_matches(tracks, reused, matches))
+
+def recognize_frames(frames_data, kiosk_ids=None):
+    """
+    Recognize a batch of frames (base64 strings or raw images, see decode_frame()).
+    
+    Frames are decoded and encoded concurrently, and the encodings of every face in
+    every frame are matched against the gallery in one matrix operation. kiosk_ids
+    (one per frame, None = untracked) lets faces reuse their track's identity.
+    Returns one result per frame in the shape of the single-frame /api/recognize
+    response.
+    """
+    kiosk_ids = kiosk_ids or [None] * len(frames_data)
+    frames = list(frame_executor.map(decode_frame, frames_data))
+    results = [{"success": False, "error": "Invalid image data"} if frame is None else None
+               for frame in frames]
+    
+    decoded = [index for index, frame in enumerate(frames) if frame is not None]
+    faces = process_face_images([frames[index] for index in decoded], [kiosk_ids[index] for index in decoded])
+    
+    found = []
+    for index, frame_faces in zip(decoded, faces):
+        if not frame_faces[0]:
+            no_face_total.inc()
+            results[index] = {"success": False, "error": "No face detected in image"}
+        else:
+            found.append((index, frame_faces))
+    
+    encodings = [encoding for _, frame_faces in found for encoding in frame_faces[3]]
+    matches = match_encodings(np.array(encodings)) if encodings else []
+    offset = 0
+    for index, (boxes, tracks, reused, frame_encodings) in found:
+        count = len(frame_encodings)
+        results[index] = face_results(boxes, face_matches(tracks, reused, matches[offset:offset + count]))
+        offset += count
+    
+    return results
+
+def recognize_submitted(items):
+    """recognize_frames() for the scheduler's (frame, kiosk id) items"""
+    return recognize_frames([image_data for image_data, _ in items], [kiosk_id for _, kiosk_id in items])
+
+# Micro-batching of concurrent /api/recognize requests (off by default)
+SCHEDULER_ENABLED = os.environ.get("FACETRACK_SCHEDULER", "0") == "1"
+SCHEDULER_MAX_BATCH = int(os.environ.get("FACETRACK_SCHEDULER_MAX_BATCH", "16"))
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get("FACETRACK_SCHEDULER_MAX_WAIT_MS", "10"))
+SCHEDULER_WORKERS = int(os.environ.get("FACETRACK_SCHEDULER_WORKERS", "2"))
+SCHEDULER_MAX_QUEUE = int(os.environ.get("FACETRACK_SCHEDULER_MAX_QUEUE", "256"))
+SCHEDULER_TIMEOUT_S = float(os.environ.get("FACETRACK_SCHEDULER_TIMEOUT_S", "30"))
+recognition_scheduler = None
+if SCHEDULER_ENABLED:
+    recognition_scheduler = MicroBatchScheduler(
+        recognize_submitted,
+        max_batch_size=SCHEDULER_MAX_BATCH,
+        max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+        workers=SCHEDULER_WORKERS,
+        max_queue=SCHEDULER_MAX_QUEUE,
+    )
+    atexit.register(recognition_scheduler.shutdown)
+    metrics_registry.gauge("facetrack_scheduler_queue_depth", "Frames waiting for a micro-batch",
+                           fn=recognition_scheduler.queue_depth)
+
+# Slow start-up steps run in the background while Flask already answers /api/health
+STARTUP_COMPONENTS = {
+    "attendance": rebuild_attendance_counters,
+    "gallery": load_gallery,
+    "models": load_models,
+}
+if ENCODER_WORKERS > 1:
+    STARTUP_COMPONENTS["encoder_pool"] = encoder_pool.wait_warm
+# Components each kind of request needs before it can be served
+RECOGNIZE_REQUIRES = ("attendance", "gallery", "models")
+ENROLL_REQUIRES = ("gallery", "encoder_pool" if ENCODER_WORKERS > 1 else "models")
+
+for component, load_component in STARTUP_COMPONENTS.items():
+    readiness.start(component, load_component)
+    metrics_registry.gauge("facetrack_startup_seconds", "Time each start-up component took to load",
+                           fn=lambda component=component: readiness.seconds(component), component=component)
+metrics_registry.gauge("facetrack_ready", "1 once every start-up component has loaded",
+                       fn=lambda: int(readiness.is_ready()))
+
+def scheduler_busy_response():
+    """503 for a request the micro-batch scheduler could not queue or answer in time"""
+    return jsonify({
+        "success": False,
+        "error": "Server busy, try again"
+    }), 503, {"Retry-After": "1"}
+
+def not_ready_error(*components):
+    """Error message while any of the components is still loading (or failed), else None"""
+    if readiness.is_ready(*components):
         return None
+    states = readiness.status()["components"]
+    failed = [component for component in components if states.get(component, {}).get("state") == "failed"]
+    if failed:
+        return f"Server failed to load {', '.join(failed)}; see /api/ready"
+    return "Server is starting up, try again shortly"
 
 # Expose functions to JavaScript via Eel
 @eel.expose
@@ -346,35 +797,27 @@ def eel_get_employees():
 def eel_enroll_face(employee_id, name, face_data, department="", position=""):
     """Enroll a face via Eel"""
     try:
+        error = not_ready_error(*ENROLL_REQUIRES)
+        if error:
+            return {"success": False, "error": error}
+        
         # Parse the face data
         face_samples = json.loads(face_data)["samples"]
         
-        # Process each face sample
-        valid_encodings = []
-        for sample in face_samples:
-            image = base64_to_image(sample)
-            if not image:
-                continue
-                
-            encoding = process_face_image(image)
-            if encoding is not None:
-                valid_encodings.append(encoding)
+        # Encode the face samples in parallel (order preserved)
+        valid_encodings = [encoding for encoding in encoder_pool.encode_samples(face_samples)
+                           if encoding is not None]
         
         if not valid_encodings:
             return {"success": False, "error": "No valid face encodings could be extracted"}
         
+        # Update gallery and encodings store first: with sharding it can fail
+        # (ShardError), and then no employee record is left without encodings
+        store_face_encodings(employee_id, name, valid_encodings)
+        
         # Store employee data
         save_employee(employee_id, name, department, position)
         
-        # Update cache
-        employee_encodings_cache[employee_id] = {
-            "name": name,
-            "encodings": valid_encodings
-        }
-        
-        # Save to file
-        save_encodings_to_file()
-        
         return {"success": True, "samples": len(valid_encodings)}
     except Exception as e:
         logger.error(f"Error in eel_enroll_face: {e}")
@@ -384,74 +827,93 @@ def eel_enroll_face(employee_id, name, face_data, department="", position=""):
 def eel_recognize_face(image_data):
     """Recognize a face via Eel"""
     try:
+        error = not_ready_error(*RECOGNIZE_REQUIRES)
+        if error:
+            return {"success": False, "error": error}
+        
         # Convert base64 to image
-        image = base64_to_image(image_data)
-        if not image:
+        frame = decode_frame(image_data)
+        if frame is None:
             return {"success": False, "error": "Invalid image data"}
         
-        # Process the face
-        face_encoding = process_face_image(image)
-        if face_encoding is None:
+        # Process the faces; the desktop UI has a single camera
+        faces = process_face_image(frame, EEL_KIOSK_ID)
+        if not faces[0]:
             return {"success": False, "error": "No face detected in image"}
         
-        # Compare against known faces
-        best_match = None
-        best_confidence = 0
-        
-        for employee_id, employee_data in employee_encodings_cache.items():
-            known_encodings = employee_data["encodings"]
-            
-            # Calculate face distances
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            
-            # Convert distance to confidence (1 - distance)
-            confidences = [1 - dist for dist in face_distances]
-            
-            # Use average confidence across all samples
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            # Consider a match if confidence exceeds threshold
-            if avg_confidence > 0.6 and avg_confidence > best_confidence:
-                best_match = {
-                    "id": employee_id,
-                    "name": employee_data["name"],
-                    "confidence": avg_confidence
-                }
-                best_confidence = avg_confidence
-        
-        if best_match:
-            # Record attendance
-            record_attendance(best_match["id"])
-            return {"success": True, "person": best_match}
-        else:
-            return {"success": True, "person": None, "message": "No match found"}
+        # Compare against known faces and record attendance
+        return recognize_faces(*faces)
     except Exception as e:
         logger.error(f"Error in eel_recognize_face: {e}")
         return {"success": False, "error": str(e)}
 
-@eel.expose
-def get_attendance_records(limit=100):
+@eel.expose("get_attendance_records")
+def eel_get_attendance_records(limit=100):
     """Get attendance records via Eel"""
     return get_attendance_records(limit)
 
-@eel.expose
-def delete_employee(employee_id):
+@eel.expose("delete_employee")
+def eel_delete_employee(employee_id):
     """Delete an employee via Eel"""
+    if not_ready_error("gallery"):
+        return False
     return delete_employee(employee_id)
 
+# Tracking id of the Eel desktop UI's camera
+EEL_KIOSK_ID = "eel"
+
+def request_kiosk_id():
+    """The kiosk a /api/recognize frame comes from (X-Kiosk-Id header), or None"""
+    return request.headers.get("X-Kiosk-Id") or None
+
+# Content types /api/recognize accepts as a raw frame body (instead of JSON)
+RAW_FRAME_TYPES = ("image/jpeg", "image/png", "application/octet-stream")
+
+def request_frame():
+    """The frame of a /api/recognize request: the raw image body, or the JSON "image" (base64)"""
+    if request.mimetype in RAW_FRAME_TYPES:
+        return request.get_data(cache=False) or None
+    data = request.json
+    return data.get('image') if data else None
+
+def request_frames():
+    """Frames of a batch request: the files of a multipart body in order, or the JSON "images" list"""
+    if request.mimetype == "multipart/form-data":
+        # One read per part: PIL decodes bytes faster than through the spooled part file
+        return [upload.read() for _, upload in request.files.items(multi=True)]
+    data = request.json
+    return data.get('images') if data else None
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Pipeline metrics in Prometheus text format"""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Endpoint to check if the server is running"""
     return jsonify({"status": "ok", "timestamp": datetime.now().isoformat()})
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once every start-up component has loaded, 503 before"""
+    status = readiness.status()
+    status["timestamp"] = datetime.now().isoformat()
+    return jsonify(status), (200 if status["ready"] else 503)
+
 @app.route('/api/enroll', methods=['POST'])
 def enroll_face():
-    """Enroll a new face in the system"""
+    """Enroll a new face in the system (JSON with base64 samples, or multipart with image files)"""
     try:
-        data = request.json
+        if request.mimetype == "multipart/form-data":
+            data = request.form
+            # Raw bytes are what the encoder pool's workers receive, so read each part once
+            face_samples = [upload.read() for _, upload in request.files.items(multi=True)]
+        else:
+            data = request.json
+            face_samples = data.get('faceSamples', [])
         employee_id = str(data.get('employeeId'))
         employee_name = data.get('employeeName')
-        face_samples = data.get('faceSamples', [])
         department = data.get('department', '')
         position = data.get('position', '')
         
@@ -461,16 +923,16 @@ def enroll_face():
                 "error": "Missing required fields"
             }), 400
         
-        # Process each face sample
-        valid_encodings = []
-        for sample in face_samples:
-            image = base64_to_image(sample)
-            if not image:
-                continue
-                
-            encoding = process_face_image(image)
-            if encoding is not None:
-                valid_encodings.append(encoding)
+        error = not_ready_error(*ENROLL_REQUIRES)
+        if error:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 503
+        
+        # Encode the face samples in parallel (order preserved)
+        valid_encodings = [encoding for encoding in encoder_pool.encode_samples(face_samples)
+                           if encoding is not None]
         
         if not valid_encodings:
             return jsonify({
@@ -478,18 +940,13 @@ def enroll_face():
                 "error": "No valid face encodings could be extracted"
             }), 400
         
+        # Update gallery and encodings store first: with sharding it can fail
+        # (ShardError), and then no employee record is left without encodings
+        store_face_encodings(employee_id, employee_name, valid_encodings)
+        
         # Save employee data
         save_employee(employee_id, employee_name, department, position)
         
-        # Update cache
-        employee_encodings_cache[employee_id] = {
-            "name": employee_name,
-            "encodings": valid_encodings
-        }
-        
-        # Save encodings to file
-        save_encodings_to_file()
-        
         return jsonify({
             "success": True,
             "employeeId": employee_id,
@@ -504,10 +961,10 @@ def enroll_face():
 
 @app.route('/api/recognize', methods=['POST'])
 def recognize_face():
-    """Recognize a face from an image"""
+    """Recognize a face from an image (JSON with a base64 "image", or a raw image/jpeg body)"""
     try:
-        data = request.json
-        image_data = data.get('image')
+        image_data = request_frame()
+        kiosk_id = request_kiosk_id()
         
         if not image_data:
             return jsonify({
@@ -515,67 +972,179 @@ def recognize_face():
                 "error": "No image provided"
             }), 400
         
+        error = not_ready_error(*RECOGNIZE_REQUIRES)
+        if error:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 503
+        
+        if recognition_scheduler is not None:
+            # Coalesced with concurrent requests into one recognize_frames() batch
+            try:
+                future = recognition_scheduler.submit((image_data, kiosk_id))
+            except SchedulerFull:
+                return scheduler_busy_response()
+            try:
+                result = future.result(timeout=SCHEDULER_TIMEOUT_S)
+            except FutureTimeoutError:
+                # Drop the frame if it is still queued; a running batch finishes regardless
+                future.cancel()
+                return scheduler_busy_response()
+            return jsonify(result), (200 if result["success"] else 400)
+        
         # Convert base64 to image
-        image = base64_to_image(image_data)
-        if not image:
+        frame = decode_frame(image_data)
+        if frame is None:
             return jsonify({
                 "success": False,
                 "error": "Invalid image data"
             }), 400
         
-        # Process the face
-        face_encoding = process_face_image(image)
-        if face_encoding is None:
+        # Process the faces
+        faces = process_face_image(frame, kiosk_id)
+        if not faces[0]:
             return jsonify({
                 "success": False,
                 "error": "No face detected in image"
             }), 400
         
-        # Compare against known faces
-        best_match = None
-        best_confidence = 0
+        # Compare against known faces and record attendance
+        return jsonify(recognize_faces(*faces))
+    except ShardError as e:
+        # Matching on the answering shards alone could check in the wrong employee
+        logger.warning(f"Recognition refused in recognize_face: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
+    except Exception as e:
+        logger.error(f"Error in recognize_face: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/recognize/batch', methods=['POST'])
+def recognize_face_batch():
+    """Recognize faces in a batch of frames ({"images": [base64, ...]}, or multipart image files)"""
+    try:
+        images = request_frames()
         
-        for employee_id, employee_data in employee_encodings_cache.items():
-            known_encodings = employee_data["encodings"]
-            
-            # Calculate face distances
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            
-            # Convert distance to confidence (1 - distance)
-            confidences = [1 - dist for dist in face_distances]
-            
-            # Use average confidence across all samples
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            # Consider a match if confidence exceeds threshold
-            if avg_confidence > 0.6 and avg_confidence > best_confidence:
-                best_match = {
-                    "id": employee_id,
-                    "name": employee_data["name"],
-                    "confidence": avg_confidence
-                }
-                best_confidence = avg_confidence
+        if not images or not isinstance(images, list):
+            return jsonify({
+                "success": False,
+                "error": "No images provided"
+            }), 400
         
-        if best_match:
-            # Record attendance
-            record_attendance(best_match["id"])
+        if len(images) > MAX_BATCH_FRAMES:
             return jsonify({
-                "success": True,
-                "person": best_match
-            })
-        else:
+                "success": False,
+                "error": f"At most {MAX_BATCH_FRAMES} images per batch"
+            }), 400
+        
+        error = not_ready_error(*RECOGNIZE_REQUIRES)
+        if error:
             return jsonify({
-                "success": True,
-                "person": None,
-                "message": "No match found"
-            })
+                "success": False,
+                "error": error
+            }), 503
+        
+        return jsonify({
+            "success": True,
+            "results": recognize_frames(images)
+        })
+    except ShardError as e:
+        # Matching on the answering shards alone could check in the wrong employee
+        logger.warning(f"Recognition refused in recognize_face_batch: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
     except Exception as e:
-        logger.error(f"Error in recognize_face: {e}")
+        logger.error(f"Error in recognize_face_batch: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def shard_match():
+    """Local top-k for query encodings ({"encodings": [[...], ...], "k": 5}), used by a coordinator"""
+    try:
+        data = request.json
+        encodings = data.get('encodings') if data else None
+        
+        if not encodings or not isinstance(encodings, list):
+            return jsonify({
+                "success": False,
+                "error": "No encodings provided"
+            }), 400
+        
+        error = not_ready_error("gallery")
+        if error:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 503
+        
+        k = max(1, int(data.get('k', SHARD_TOP_K)))
+        threshold = float(data.get('threshold', MATCH_THRESHOLD))
+        with stage_seconds["match"].time():
+            results = gallery.top_k(np.asarray(encodings, dtype=np.float32), k, threshold)
+        return jsonify({
+            "success": True,
+            "shard": SHARD_INDEX,
+            "results": results
+        })
+    except Exception as e:
+        logger.error(f"Error in shard_match: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def shard_encodings(employee_id):
+    """Store ({"name", "encodings"}) or delete the encodings of an employee owned by this shard"""
+    try:
+        if shard_for(employee_id, SHARD_COUNT) != SHARD_INDEX:
+            return jsonify({
+                "success": False,
+                "error": f"Employee {employee_id} belongs to shard {shard_for(employee_id, SHARD_COUNT)}"
+            }), 400
+        
+        error = not_ready_error("gallery")
+        if error:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 503
+        
+        if request.method == 'DELETE':
+            remove_face_encodings(employee_id)
+            return jsonify({"success": True})
+        
+        data = request.json
+        encodings = data.get('encodings') if data else None
+        if not encodings or not data.get('name'):
+            return jsonify({
+                "success": False,
+                "error": "Missing required fields"
+            }), 400
+        
+        store_face_encodings(employee_id, data['name'], np.asarray(encodings, dtype=np.float32))
+        return jsonify({"success": True, "samples": len(encodings)})
+    except Exception as e:
+        logger.error(f"Error in shard_encodings: {e}")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+if SHARD_SERVER:
+    # Only a shard answers a coordinator's queries and enrollments
+    app.add_url_rule('/api/shard/match', view_func=shard_match, methods=['POST'])
+    app.add_url_rule('/api/shard/encodings/<employee_id>', view_func=shard_encodings, methods=['PUT', 'DELETE'])
+
 @app.route('/api/employees', methods=['GET'])
 def list_employees():
     """List all enrolled employees"""
@@ -597,6 +1166,13 @@ def list_employees():
 def delete_employee_endpoint(employee_id):
     """Delete an employee's face data"""
     try:
+        error = not_ready_error("gallery")
+        if error:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 503
+        
         success = delete_employee(employee_id)
         
         if not success:
@@ -620,26 +1196,25 @@ def delete_employee_endpoint(employee_id):
 def get_stats():
     """Get system statistics"""
     try:
-        employees = get_all_employees()
-        
-        # Count face samples
-        total_samples = 0
-        for employee_id in employee_encodings_cache:
-            total_samples += len(employee_encodings_cache[employee_id]["encodings"])
-        
-        # Count attendance records
-        with xml_lock:
-            tree = ET.parse(ATTENDANCE_XML)
-            root = tree.getroot()
-            total_attendance = len(root.findall("record"))
+        # Maintained counters: no employee or attendance scans per request
+        if SHARED_GALLERY and (attendance_counters.age() or 0) > SHARED_GALLERY_POLL_MS / 1000:
+            # Other workers record check-ins too; recount from the shared database
+            attendance_counters.rebuild(storage)
+        attendance = attendance_counters.snapshot()
+        stats = {
+            "totalEmployees": employee_directory.count(),
+            "totalAttendance": attendance["total"],
+            "todayIn": attendance["todayIn"],
+            "todayOut": attendance["todayOut"],
+            "todayAttendees": attendance["todayAttendees"]
+        }
+        if shard_coordinator is None:
+            # A coordinator holds no encodings
+            stats["totalSamples"] = gallery.total_samples
         
         return jsonify({
             "success": True,
-            "stats": {
-                "totalEmployees": len(employees),
-                "totalSamples": total_samples,
-                "totalAttendance": total_attendance
-            }
+            "stats": stats
         })
     except Exception as e:
         logger.error(f"Error in get_stats: {e}")
@@ -650,13 +1225,32 @@ def get_stats():
 
 @app.route('/api/attendance', methods=['GET'])
 def get_attendance():
-    """Get attendance records"""
+    """
+    Get attendance records, newest first.
+
+    Query parameters (all optional): since, until (ISO timestamps, until is
+    exclusive), employeeId, type (IN/OUT), cursor (from nextCursor), limit.
+    """
     try:
-        records = get_attendance_records(limit=100)
+        try:
+            records, next_cursor = query_attendance_records(
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                employee_id=request.args.get('employeeId'),
+                attendance_type=request.args.get('type'),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', 100),
+            )
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
-            "records": records
+            "records": records,
+            "nextCursor": next_cursor
         })
     except Exception as e:
         logger.error(f"Error in get_attendance: {e}")
@@ -667,11 +1261,14 @@ def get_attendance():
 
 # Run Flask and Eel together
 if __name__ == '__main__':
-    logger.info("Starting Face Recognition Server with Eel and XML storage on port 5000")
+    port = int(os.environ.get("FACETRACK_PORT", "5000"))
+    logger.info(f"Starting Face Recognition Server with Eel and {STORAGE_BACKEND} storage on port {port}")
     
-    # Start Eel in a separate thread
-    import threading
-    threading.Thread(target=eel.start, args=('index.html', {'port': 8000}), daemon=True).start()
+    # Start Eel in a separate thread (shards serve only the API)
+    if SHARD_COUNT == 1:
+        eel.init('web')  # 'web' is the directory that contains the frontend files
+        threading.Thread(target=eel.start, args=('index.html', {'port': 8000}), daemon=True).start()
     
-    # Run Flask
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Run Flask; the reloader would import this module in a second process and repeat
+    # every start-up step (encoder pool, models, gallery, journal) on the same files
+    app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
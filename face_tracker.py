@@ -0,0 +1,129 @@
+"""
+Per-kiosk face tracking for the FaceTrack recognition server.
+
+A kiosk sends a stream of frames, and a person standing in front of it shows up
+in many consecutive ones at nearly the same place. FaceTracker keeps the faces
+of each kiosk's recent frames as tracks and associates every new detection with
+the track whose box it overlaps most (intersection over union, greedily, best
+overlap first). A track remembers the match of its last encoding, and a face is
+only encoded and matched again when:
+- no track overlaps it by at least iou_threshold (a new face)
+- its track's identity is older than refresh_seconds
+
+Detection still runs on every frame so the tracks follow the boxes; only the
+encoding and the gallery match are skipped for a face that is already known.
+The reused match is passed to check-in exactly like a fresh one, so the
+cooldown and IN/OUT decisions are the same.
+
+Only the box overlap links two frames, not the face itself, so a track ends as
+soon as a frame misses its face: someone stepping into the spot a person just
+left is always encoded. idle_seconds > 0 lets tracks survive missed frames (for
+a detector that flickers), at the risk of handing a track's identity to a person
+who takes that spot within the window. The least recently active kiosks beyond
+max_kiosks are forgotten. clear() drops every track, e.g. when the gallery
+changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    intersection = height * width
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+    return intersection / union
+
+
+class Track:
+    """A face followed across one kiosk's frames"""
+
+    __slots__ = ("box", "match", "identified_at", "seen_at")
+
+    def __init__(self, box, now):
+        self.box = box
+        self.match = None  # gallery match of the last encoding (None = no match)
+        self.identified_at = None
+        self.seen_at = now
+
+
+class FaceTracker:
+    """IoU association of face boxes with each kiosk's tracks"""
+
+    def __init__(self, iou_threshold=0.5, refresh_seconds=2.0, idle_seconds=0.0, max_kiosks=1024):
+        """
+        iou_threshold: least overlap for a box to continue a track
+        refresh_seconds: age after which a track's identity is encoded again
+        idle_seconds: how long a track survives frames where it was not detected
+                      (0 = it ends with the first frame that misses it)
+        max_kiosks: kiosks whose tracks are kept (least recently active out first)
+        """
+        self.iou_threshold = iou_threshold
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self.max_kiosks = max_kiosks
+
+        self._lock = threading.Lock()
+        self._kiosks = OrderedDict()  # kiosk id -> (time of its last frame, [Track])
+
+    def update(self, kiosk_id, boxes, now=None):
+        """
+        Associate the face boxes of a kiosk's frame with its tracks.
+
+        Returns (tracks, reused): the Track of each box, and whether its identity
+        (track.match) is reused; the faces that are not must be encoded, and
+        their matches handed to identify().
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_frame, stored = self._kiosks.pop(kiosk_id, (None, []))
+            # The last frame's tracks, and tracks it missed that are still within idle_seconds
+            previous = [track for track in stored
+                        if track.seen_at == last_frame or now - track.seen_at <= self.idle_seconds]
+
+            pairs = sorted(((iou(box, track.box), b, t)
+                            for b, box in enumerate(boxes) for t, track in enumerate(previous)), reverse=True)
+            tracks = [None] * len(boxes)
+            continued = set()
+            for overlap, b, t in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if tracks[b] is None and t not in continued:
+                    tracks[b] = previous[t]
+                    continued.add(t)
+
+            for b, box in enumerate(boxes):
+                if tracks[b] is None:
+                    tracks[b] = Track(box, now)
+                else:
+                    tracks[b].box = box
+                    tracks[b].seen_at = now
+            reused = [track.identified_at is not None and now - track.identified_at < self.refresh_seconds
+                      for track in tracks]
+
+            missed = [track for t, track in enumerate(previous)
+                      if t not in continued and now - track.seen_at < self.idle_seconds]
+            self._kiosks[kiosk_id] = (now, tracks + missed)
+            while len(self._kiosks) > self.max_kiosks:
+                self._kiosks.popitem(last=False)
+        return tracks, reused
+
+    def identify(self, track, match, now=None):
+        """Remember the match of a freshly encoded face"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            track.match = match
+            track.identified_at = now
+
+    def clear(self):
+        with self._lock:
+            self._kiosks.clear()
+
+    def kiosks(self):
+        with self._lock:
+            return len(self._kiosks)
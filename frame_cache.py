@@ -0,0 +1,88 @@
+"""
+Near-duplicate frame cache for the FaceTrack recognition server.
+
+Most frames a kiosk sends look like the previous ones: nobody in view, or a
+person standing still. FrameCache remembers what face detection found in a
+kiosk's recent frames, keyed by a perceptual hash of each frame, so a frame
+whose hash is within max_distance bits (Hamming distance) of a cached one of the
+same kiosk reuses that detection instead of running the detector.
+
+The hash is a 64-bit difference hash: the frame is reduced to a 9x8 grayscale
+thumbnail and each bit says whether a pixel is brighter than its right-hand
+neighbour. Camera noise and a few pixels of movement flip a handful of bits,
+while a person stepping into or out of view flips many.
+
+Entries expire ttl_seconds after the detection they hold ran (a hit does not
+extend them), so a scene drifting slowly is detected again at least that often.
+The least recently used entries beyond max_entries are dropped.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+
+
+def perceptual_hash(rgb_image):
+    """64-bit difference hash of an RGB array"""
+    thumbnail = Image.fromarray(rgb_image).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class FrameCache:
+    """LRU cache of per-kiosk values looked up by near-duplicate frame hash"""
+
+    def __init__(self, max_entries=256, ttl_seconds=1.0, max_distance=4):
+        """
+        max_entries: cached frames across all kiosks
+        ttl_seconds: lifetime of an entry from when it was stored
+        max_distance: most differing hash bits for a frame to count as a duplicate
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kiosk id, frame hash) -> (monotonic stored at, value)
+
+    def get(self, kiosk_id, frame_hash, now=None):
+        """Value of the kiosk's closest live entry within max_distance, or None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            best = None
+            for key, (stored_at, value) in self._entries.items():
+                if key[0] != kiosk_id or now - stored_at >= self.ttl_seconds:
+                    continue
+                distance = hamming(key[1], frame_hash)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, key, value)
+            if best is None:
+                return None
+            self._entries.move_to_end(best[1])
+            return best[2]
+
+    def put(self, kiosk_id, frame_hash, value, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[(kiosk_id, frame_hash)] = (now, value)
+            self._entries.move_to_end((kiosk_id, frame_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,87 @@
+"""
+Frame decoding for recognition, with face detection at reduced resolution.
+
+HOG detection cost grows with the pixel count (and face_recognition upsamples
+the image once more by default), while a kiosk face usually spans well over a
+hundred pixels of a 640x480 frame. DecodedFrame therefore decodes a frame for
+detection at no more than `max_side` pixels on its longer side:
+
+- JPEG frames use Pillow's draft mode, so libjpeg decodes straight to 1/2, 1/4
+  or 1/8 scale (DCT scaling) and the full-resolution pixels are never produced;
+  anything still above `max_side` is resized down
+- other formats are decoded once at full resolution and resized
+
+The full-resolution image is only decoded when full() is called, i.e. for frames
+where a face was found, and to_full() maps the detected boxes back onto it so
+encoding sees the original pixels. An idle kiosk's frames never pay for a full
+decode. Decoded images are exposed as read-only views of Pillow's buffer instead
+of being copied into a new array.
+
+max_side=0 detects at full resolution (the behaviour before this module).
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def _rgb_array(image):
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # Read-only view of the decoded pixels; dlib only reads them
+    return np.asarray(image)
+
+
+class DecodedFrame:
+    """A frame decoded for detection, with the full-resolution image on demand"""
+
+    def __init__(self, data, max_side=0):
+        """
+        data: encoded image bytes (JPEG, PNG, ...); raises on undecodable data
+        max_side: longest side of the detection image (0 = full resolution)
+        """
+        self._data = data
+        self._full = None
+        image = self._open()
+        self.size = image.size  # full resolution (width, height)
+
+        width, height = image.size
+        scale = max_side / max(width, height) if max_side else 1.0
+        if scale < 1.0:
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            if image.format == "JPEG":
+                # Picks the smallest DCT scale that still covers the target size
+                image.draft("RGB", target)
+            if image.size != target:
+                image = image.resize(target, Image.BILINEAR)
+        self.detection = _rgb_array(image)
+        if self.detection.shape[1] == width and self.detection.shape[0] == height:
+            self._full = self.detection
+
+    def _open(self):
+        # BytesIO shares the bytes object's buffer instead of copying it
+        return Image.open(io.BytesIO(self._data))
+
+    @property
+    def downscaled(self):
+        return self._full is not self.detection
+
+    def full(self):
+        """Full-resolution RGB array (decoded on first use)"""
+        if self._full is None:
+            self._full = _rgb_array(self._open())
+        return self._full
+
+    def to_full(self, locations):
+        """Map (top, right, bottom, left) boxes from the detection image to full resolution"""
+        if not self.downscaled:
+            return list(locations)
+        height, width = self.detection.shape[:2]
+        sx, sy = self.size[0] / width, self.size[1] / height
+        full_width, full_height = self.size
+        return [
+            (max(0, int(top * sy)), min(full_width, int(round(right * sx))),
+             min(full_height, int(round(bottom * sy))), max(0, int(left * sx)))
+            for top, right, bottom, left in locations
+        ]
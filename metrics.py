@@ -0,0 +1,177 @@
+"""
+Low-overhead metrics for the FaceTrack recognition server.
+
+Counters, gauges and fixed-bucket histograms kept in process memory and rendered
+in the Prometheus text exposition format (served at /api/metrics). Recording a
+sample is a perf_counter() pair, a bisect over the bucket bounds and a short
+locked update, so instrumentation can stay on in production.
+
+Metrics with the same name and different labels form one family, e.g.
+
+    STAGE = registry.histogram("facetrack_stage_seconds", "...", stage="detect")
+    with STAGE.time():
+        ...
+"""
+
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond gallery matches to slow CNN detection
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, labels=()):
+        self.labels = labels
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self, name):
+        yield f"{name}{_format_labels(self.labels)} {_format_value(self._value)}"
+
+
+class Gauge:
+    """Current value; either set explicitly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, labels=(), fn=None):
+        self.labels = labels
+        self._value = 0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+    def samples(self, name):
+        yield f"{name}{_format_labels(self.labels)} {_format_value(self.value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds for timings)"""
+
+    kind = "histogram"
+
+    def __init__(self, labels=(), buckets=DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Context manager observing the wall time of a with-block"""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self, name):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(self.labels, [('le', _format_value(float(bound)))])} {cumulative}"
+        yield f"{name}_sum{_format_labels(self.labels)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(self.labels)} {cumulative}"
+
+
+class _Timer:
+    """Cheaper than a @contextmanager generator on the per-frame hot path"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Named metric families rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._families = {}  # name -> (kind, help, {label items: metric})
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            kind, _, metrics = self._families.setdefault(name, (cls.kind, help_text, {}))
+            if kind != cls.kind:
+                raise ValueError(f"Metric {name} is already registered as a {kind}")
+            if key not in metrics:
+                metrics[key] = cls(labels=key, **kwargs)
+            return metrics[key]
+
+    def counter(self, name, help_text, **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, fn=None, **labels):
+        return self._get(Gauge, name, help_text, labels, fn=fn)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.values()))
+                        for name, (kind, help_text, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                lines.extend(metric.samples(name))
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the server
+registry = MetricsRegistry()
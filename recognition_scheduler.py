@@ -0,0 +1,126 @@
+"""
+Micro-batching scheduler for recognition requests.
+
+Concurrent callers submit single frames and get a Future back. A dispatcher
+thread takes frames from a FIFO queue and coalesces them into micro-batches: a
+batch is closed when it reaches max_batch_size or when the oldest frame in it
+has waited max_wait_ms. Each batch is handed to a fixed pool of workers that runs
+the batch function (decode, detect, encode and one gallery match for the whole
+batch) and resolves every caller's Future with its own result.
+
+The queue is bounded, so a burst beyond max_queue is rejected immediately
+instead of piling up latency; the worker count bounds how many batches run at
+once. While all workers are busy the dispatcher keeps collecting, so batches grow
+with load.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerFull(Exception):
+    """Raised by submit() when the request queue is full"""
+
+
+class MicroBatchScheduler:
+    """Coalesces concurrently submitted items into batches for a batch function"""
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=10.0, workers=2, max_queue=1024):
+        """
+        process_batch: callable taking a list of items and returning a list of
+            results in the same order
+        max_batch_size: largest batch handed to process_batch
+        max_wait_ms: latency budget for filling a batch after its first item
+        workers: number of batches processed concurrently
+        max_queue: pending items accepted before submit() raises SchedulerFull
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._slots = threading.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognize-batch")
+        self._stopping = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="recognize-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, item):
+        """Queue one item; the returned Future resolves to its result"""
+        if self._stopping.is_set():
+            raise RuntimeError("Scheduler is shut down")
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise SchedulerFull("Recognition queue is full")
+        return future
+
+    def queue_depth(self):
+        """Items waiting to be batched"""
+        return self._queue.qsize()
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Wait for a free worker before closing the batch, so batches grow under load
+            self._slots.acquire()
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._executor.submit(self._run_batch, batch)
+            except RuntimeError as e:
+                # The interpreter is exiting and the executor refuses new batches
+                self._slots.release()
+                for _, future in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                return
+
+    def _run_batch(self, batch):
+        try:
+            # Callers that gave up waiting cancel their Future; skip their items
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            items = [item for item, _ in batch]
+            results = self.process_batch(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"Error processing recognition batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """Stop accepting items, finish running batches and fail queued ones"""
+        self._stopping.set()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Scheduler is shut down"))
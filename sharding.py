@@ -0,0 +1,146 @@
+"""
+Sharded face gallery with scatter-gather matching.
+
+A gallery too large for one node is split across shard servers by employee id:
+shard_for() hashes the id, so every node agrees on the owner without a lookup
+table. Each shard is an ordinary face_recognition_server.py instance
+(FACETRACK_SHARD_INDEX / FACETRACK_SHARD_COUNT) that only holds its own
+employees and answers POST /api/shard/match with its local top-k.
+
+The coordinator (FACETRACK_SHARDS) detects and encodes faces itself, sends the
+encodings to every shard in parallel, merges the shards' top-k lists and applies
+the match threshold to the global best. Shards that do not answer within the
+timeout are reported instead of stalling every kiosk, and the query matches
+no one: a missing shard may hold an employee closer than the best surviving
+candidate. Enrollments and deletions are routed to the owning shard only.
+"""
+
+import json
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ShardError(Exception):
+    """Raised when a shard rejects or fails an enrollment or deletion"""
+
+
+def shard_for(employee_id, shard_count):
+    """Index of the shard that owns an employee (stable across processes and nodes)"""
+    return zlib.crc32(str(employee_id).encode("utf-8")) % shard_count
+
+
+def _request(url, payload=None, method="GET", timeout=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            error = json.load(e).get("error")
+        except ValueError:
+            error = None
+        raise ShardError(f"{url} answered {e.code}: {error or e.reason}") from None
+
+
+class ShardCoordinator:
+    """Fans queries out to shard servers and merges their results"""
+
+    def __init__(self, shard_urls, timeout=1.0, k=5):
+        """
+        shard_urls: base URLs of the shards, in shard index order
+        timeout: seconds to wait for the shards of one query batch
+        k: candidates requested from each shard and kept after merging
+        """
+        self.shard_urls = [url.rstrip("/") for url in shard_urls]
+        self.timeout = timeout
+        self.k = k
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.shard_urls), thread_name_prefix="shard")
+
+    def owner(self, employee_id):
+        return self.shard_urls[shard_for(employee_id, len(self.shard_urls))]
+
+    def top_k(self, encodings, threshold):
+        """
+        Merged top-k candidates per encoding across all shards.
+
+        Returns (candidates, missing): one [{"id", "name", "distance"}, ...]
+        list per encoding, closest first, and the URLs of the shards that did
+        not answer in time or failed.
+        """
+        payload = {"encodings": np.asarray(encodings, dtype=np.float32).tolist(), "k": self.k,
+                   "threshold": threshold}
+        futures = {
+            self._executor.submit(_request, f"{url}/api/shard/match", payload, "POST", self.timeout): url
+            for url in self.shard_urls
+        }
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        merged = [[] for _ in range(len(payload["encodings"]))]
+        missing = [futures[future] for future in not_done]
+        for future in done:
+            url = futures[future]
+            try:
+                shard_results = future.result()["results"]
+            except Exception as e:
+                logger.warning(f"Shard {url} failed: {e}")
+                missing.append(url)
+                continue
+            for candidates, shard_candidates in zip(merged, shard_results):
+                candidates.extend(shard_candidates)
+        if missing:
+            logger.warning(f"Shards {', '.join(sorted(missing))} left out of a query (timeout {self.timeout}s)")
+
+        for index, candidates in enumerate(merged):
+            candidates.sort(key=lambda candidate: candidate["distance"])
+            merged[index] = candidates[:self.k]
+        return merged, sorted(missing)
+
+    def match_batch(self, encodings, threshold):
+        """
+        Best employee for each encoding, FaceGallery.match_batch() style.
+
+        Returns (matches, missing); matches hold {"id", "name", "confidence"} or
+        None when the global best does not beat the threshold. While any shard is
+        missing every match is None, since its employees were not compared.
+        """
+        candidates, missing = self.top_k(encodings, threshold)
+        if missing:
+            return [None] * len(candidates), missing
+        matches = []
+        for ranked in candidates:
+            confidence = 1.0 - ranked[0]["distance"] if ranked else 0.0
+            if ranked and confidence > threshold:
+                matches.append({"id": ranked[0]["id"], "name": ranked[0]["name"], "confidence": confidence})
+            else:
+                matches.append(None)
+        return matches, missing
+
+    def store(self, employee_id, name, encodings):
+        """Send an employee's encodings to the owning shard; raises ShardError"""
+        payload = {"name": name, "encodings": np.asarray(encodings, dtype=np.float32).tolist()}
+        url = f"{self.owner(employee_id)}/api/shard/encodings/{urllib.parse.quote(str(employee_id), safe='')}"
+        try:
+            _request(url, payload, "PUT", timeout=max(self.timeout, 10.0))
+        except (urllib.error.URLError, OSError) as e:
+            raise ShardError(f"{url} is unreachable: {e}") from None
+
+    def remove(self, employee_id):
+        """Delete an employee's encodings on the owning shard; raises ShardError"""
+        url = f"{self.owner(employee_id)}/api/shard/encodings/{urllib.parse.quote(str(employee_id), safe='')}"
+        try:
+            _request(url, method="DELETE", timeout=max(self.timeout, 10.0))
+        except (urllib.error.URLError, OSError) as e:
+            raise ShardError(f"{url} is unreachable: {e}") from None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
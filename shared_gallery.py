@@ -0,0 +1,201 @@
+"""
+Shared-memory face gallery for multi-process deployments (e.g. gunicorn workers).
+
+Every worker process maps the same published gallery read-only instead of
+holding its own copy. The publish directory holds:
+
+    generation            8-byte counter of the newest generation, memory-mapped
+    gallery-<gen>.npy     float32 (rows, 128) matrix, rows grouped per employee
+    gallery-<gen>.json    employee index ({"ids", "names", "counts"}) in row order
+
+Exactly one process is the writer: whichever holds the lock on writer.lock. It
+loads the encodings store, follows the records other workers append to its delta
+log (EncodingStore(shared=True)), compacts it when needed and publishes a new
+generation whenever something changed. Generations are written under a temporary
+name and renamed into place before the counter is bumped, so readers never see a
+partial one. Readers poll the counter and adopt a new generation with
+FaceGallery.load_arrays() on a read-only memory map: the page cache backs the
+matrix once for all workers, and a worker that enrolled a face sees it in every
+process after one poll interval. Adopting a generation keeps the IVF partitions
+(retrained only when the gallery outgrew them) and builds prototypes only for
+the prototype matcher.
+
+If the writer exits, its lock is released and the next reader to poll takes over.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared galleries
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COUNTER = struct.Struct("<Q")
+
+# Published generations kept on disk for readers still switching to a newer one
+KEEP_GENERATIONS = 3
+
+
+class GallerySnapshots:
+    """Published gallery generations plus the memory-mapped generation counter"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        counter_path = self._path("generation")
+        with open(counter_path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size < COUNTER.size:
+                f.write(b"\0" * COUNTER.size)
+        self._counter_file = open(counter_path, "r+b")
+        self._counter = mmap.mmap(self._counter_file.fileno(), COUNTER.size)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def generation(self):
+        """Newest published generation (0 before the first publish)"""
+        return COUNTER.unpack_from(self._counter)[0]
+
+    def publish(self, gallery):
+        """Write the gallery as the next generation and announce it; returns the generation"""
+        employee_ids, names, counts, matrix = gallery.export_arrays()
+        generation = self.generation() + 1
+
+        matrix_path = self._path(f"gallery-{generation}.npy")
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(matrix_path + ".tmp", matrix_path)
+        index_path = self._path(f"gallery-{generation}.json")
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": employee_ids, "names": names, "counts": [int(count) for count in counts]}, f)
+        os.replace(index_path + ".tmp", index_path)
+
+        COUNTER.pack_into(self._counter, 0, generation)
+        for name in (f"gallery-{generation - KEEP_GENERATIONS}.npy", f"gallery-{generation - KEEP_GENERATIONS}.json"):
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+        return generation
+
+    def open(self, generation):
+        """(employee_ids, names, counts, read-only matrix) of a published generation"""
+        with open(self._path(f"gallery-{generation}.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        matrix = np.load(self._path(f"gallery-{generation}.npy"), mmap_mode="r") if index["ids"] else \
+            np.empty((0, 0), dtype=np.float32)
+        return index["ids"], index["names"], index["counts"], matrix
+
+    def close(self):
+        self._counter.close()
+        self._counter_file.close()
+
+
+class SharedGallery:
+    """Keeps one process's FaceGallery on the newest published generation"""
+
+    def __init__(self, gallery, store, directory, load_fn=None, poll_interval=0.2):
+        """
+        gallery: the process's FaceGallery, replaced in place on each generation
+        store: the shared EncodingStore
+        load_fn: loads the store into the gallery when this process becomes the
+                 writer (defaults to store.load(gallery))
+        poll_interval: seconds between generation checks (and writer publishes)
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared galleries need fcntl (POSIX)")
+        self.gallery = gallery
+        self.store = store
+        self.snapshots = GallerySnapshots(directory)
+        self.load_fn = load_fn or (lambda: store.load(gallery))
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.is_writer = False
+        self._writer_lock = open(os.path.join(directory, "writer.lock"), "a+b")
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Adopt the current generation (or become the writer) and keep polling in the background"""
+        self.poll()
+        self._thread = threading.Thread(target=self._run, name="shared-gallery", daemon=True)
+        self._thread.start()
+
+    def wait_loaded(self, timeout=None):
+        """Block until the gallery holds a published generation; False on timeout"""
+        return self._loaded.wait(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error updating the shared gallery: {e}")
+
+    def poll(self):
+        """One step: take over as writer if possible, then publish or adopt changes"""
+        if not self.is_writer:
+            self._try_become_writer()
+        if self.is_writer:
+            self._publish_changes()
+        else:
+            self.refresh()
+
+    def _try_become_writer(self):
+        try:
+            fcntl.flock(self._writer_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+        with self.store.exclusive():
+            self.load_fn()
+            self.generation = self.snapshots.publish(self.gallery)
+        self.is_writer = True
+        self._loaded.set()
+        logger.info(f"Publishing the shared gallery as writer (generation {self.generation})")
+
+    def _publish_changes(self):
+        with self.store.exclusive():
+            applied = self.store.follow(self.gallery)
+            if applied:
+                if self.store.needs_compaction(self.store.delta_bytes()):
+                    self.store.compact(self.gallery)
+                self.generation = self.snapshots.publish(self.gallery)
+
+    def refresh(self):
+        """Adopt the newest published generation; True if the gallery changed"""
+        generation = self.snapshots.generation()
+        if generation == self.generation:
+            return False
+        try:
+            employee_ids, names, counts, matrix = self.snapshots.open(generation)
+        except FileNotFoundError:
+            # Superseded while we looked; the next poll picks up the newer one
+            return False
+        start = time.perf_counter()
+        self.gallery.load_arrays(employee_ids, names, counts, matrix)
+        self.generation = generation
+        self._loaded.set()
+        logger.info(f"Mapped shared gallery generation {generation} ({len(employee_ids)} employees) "
+                    f"in {time.perf_counter() - start:.3f}s")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.is_writer:
+            fcntl.flock(self._writer_lock.fileno(), fcntl.LOCK_UN)
+            self.is_writer = False
+        self._writer_lock.close()
+        self.snapshots.close()
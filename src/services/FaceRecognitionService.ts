@@ -11,6 +11,11 @@ interface RecognitionResponse {
     name: string;
     confidence: number;
   };
+  // Every face found in the frame, largest first; person is the largest matched one
+  faces?: {
+    box: { top: number; right: number; bottom: number; left: number };
+    person: { id: string; name: string; confidence: number } | null;
+  }[];
   error?: string;
 }
 
@@ -22,26 +27,69 @@ interface EnrollmentResponse {
 
 interface StatsResponse {
   totalEmployees: number;
-  totalSamples: number;
+  totalSamples?: number; // not reported by a shard coordinator
   totalAttendance: number;
+  todayIn: number;
+  todayOut: number;
+  todayAttendees: number;
 }
 
+/**
+ * Random kiosk id; crypto.randomUUID only exists in secure contexts (HTTPS or localhost)
+ */
+const newKioskId = (): string => {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  const bytes = new Uint8Array(16);
+  if (typeof crypto !== 'undefined' && typeof crypto.getRandomValues === 'function') {
+    crypto.getRandomValues(bytes);
+  } else {
+    for (let i = 0; i < bytes.length; i++) {
+      bytes[i] = Math.floor(Math.random() * 256);
+    }
+  }
+  return Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('');
+};
+
+let sessionKioskId: string | null = null;
+
+/**
+ * Stable id of this browser's camera, so the server can track faces across its frames.
+ * Never throws: without storage the id lasts for the page session
+ */
+const getKioskId = (): string => {
+  try {
+    let kioskId = localStorage.getItem('facetrack_kiosk_id');
+    if (!kioskId) {
+      kioskId = newKioskId();
+      localStorage.setItem('facetrack_kiosk_id', kioskId);
+    }
+    return kioskId;
+  } catch (error) {
+    sessionKioskId = sessionKioskId || newKioskId();
+    return sessionKioskId;
+  }
+};
+
 /**
  * Recognizes a face from an image
- * @param imageData Base64 encoded image data
+ * @param imageData Image data URL (e.g. from canvas.toDataURL('image/jpeg')) or a JPEG Blob
  * @returns Recognition result or null if not recognized
  */
-export const recognizeFace = async (imageData: string): Promise<{ id: string, name: string } | null> => {
+export const recognizeFace = async (imageData: string | Blob): Promise<{ id: string, name: string } | null> => {
   try {
-    // Remove the data URL prefix to get just the base64 data
-    const base64Data = imageData.split(',')[1];
+    // Send the JPEG bytes as the request body: a third smaller than base64 in JSON,
+    // and the server decodes them without a base64 pass
+    const image = typeof imageData === 'string' ? await (await fetch(imageData)).blob() : imageData;
     
     const response = await fetch(`${API_BASE_URL}/api/recognize`, {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json',
+        'Content-Type': image.type || 'image/jpeg',
+        'X-Kiosk-Id': getKioskId(),
       },
-      body: JSON.stringify({ image: base64Data }),
+      body: image,
     });
 
     if (!response.ok) {
@@ -0,0 +1,98 @@
+"""
+Cold-start helpers for the FaceTrack recognition server.
+
+LazyModule defers a heavy import (face_recognition pulls in dlib and its models)
+until first use, so importing the server does not pay for it. Readiness runs the
+slow start-up steps (loading the gallery, importing and warming up the models,
+starting the encoder pool) in background threads and records their state and
+duration; the server reports them at /api/ready and refuses work that depends on
+a component until it is ready.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    logger.info(f"Imported {self._name} in {time.perf_counter() - start:.2f}s")
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+class Readiness:
+    """State and timing of named start-up components run in background threads"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._components = {}  # name -> {"state", "seconds", "error"}
+        self._events = {}
+
+    def start(self, name, fn):
+        """Run fn() in a daemon thread as component `name`"""
+        with self._lock:
+            self._components[name] = {"state": "loading", "seconds": None, "error": None}
+            self._events[name] = threading.Event()
+        thread = threading.Thread(target=self._run, args=(name, fn), name=f"startup-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            state, error = "ready", None
+        except Exception as e:
+            logger.error(f"Start-up step {name} failed: {e}")
+            state, error = "failed", str(e)
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self._components[name] = {"state": state, "seconds": round(seconds, 3), "error": error,
+                                      "readyAfter": round(time.perf_counter() - self.started_at, 3)}
+        self._events[name].set()
+        logger.info(f"Start-up step {name} {state} in {seconds:.2f}s")
+
+    def is_ready(self, *names):
+        """True when every named component (all when none given) finished successfully"""
+        with self._lock:
+            names = names or tuple(self._components)
+            return all(self._components.get(name, {}).get("state") == "ready" for name in names)
+
+    def seconds(self, name):
+        """Duration of a finished component, 0.0 while it is loading or unknown"""
+        with self._lock:
+            return self._components.get(name, {}).get("seconds") or 0.0
+
+    def wait(self, name, timeout=None):
+        """Block until a component finished (successfully or not); False on timeout"""
+        event = self._events.get(name)
+        return event.wait(timeout) if event is not None else False
+
+    def status(self):
+        """{"ready", "uptime", "components": {name: {...}}}"""
+        with self._lock:
+            components = {name: dict(info) for name, info in self._components.items()}
+        return {
+            "ready": all(info["state"] == "ready" for info in components.values()),
+            "uptime": round(time.perf_counter() - self.started_at, 3),
+            "components": components,
+        }
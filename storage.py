@@ -0,0 +1,675 @@
+"""
+Storage backends for FaceTrack employee and attendance data.
+
+Two interchangeable backends implement the same small interface:
+
+- XMLStorage keeps the original employees.xml / attendance.xml layout, with
+  check-ins going through the append-only AttendanceJournal. Attendance can
+  instead be split into per-day or per-month partitions (AttendanceArchive).
+- SQLiteStorage keeps everything in one embedded SQLite database in WAL mode,
+  with indexes on employee id, timestamp and type so single-row lookups and
+  time-range queries do not depend on the size of the attendance history.
+
+Attendance records are plain dicts with the XML attribute names:
+{"id", "employee_id", "timestamp", "type"}.
+
+query_attendance() returns records newest first, filtered by a half-open time
+range [since, until), employee and type, and paginated with an opaque cursor
+(the (timestamp, id) of the last record of the previous page). Both backends seek
+directly to the requested range instead of scanning the whole history.
+
+Command line:
+    python storage.py migrate [--data-dir face_data] [--db face_data/facetrack.db]
+    python storage.py export  [--data-dir face_data] [--db face_data/facetrack.db]
+    python storage.py partition [--data-dir face_data] [--granularity month] [--no-compress]
+
+`migrate` copies the XML files (including any uncompacted journal) into SQLite;
+`export` writes the SQLite contents back to employees.xml / attendance.xml;
+`partition` splits attendance.xml into a partitioned archive under attendance/.
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from lxml import etree
+
+from attendance_archive import AttendanceArchive, AttendanceIndex
+from attendance_journal import AttendanceJournal
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_FIELDS = ("id", "employee_id", "timestamp", "type")
+
+
+def _write_pretty(tree, path):
+    """Write an ElementTree and re-indent it with lxml for readability"""
+    tree.write(path, encoding='utf-8', xml_declaration=True)
+    parser = etree.XMLParser(remove_blank_text=True)
+    tree = etree.parse(path, parser)
+    tree.write(path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+
+
+def encode_cursor(record):
+    """Opaque pagination cursor pointing just past a record"""
+    raw = json.dumps([record["timestamp"], record["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a cursor; raises ValueError if malformed"""
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(timestamp), str(record_id)
+
+
+def _employee_from_element(employee):
+    return {
+        "id": employee.get("id"),
+        "name": employee.find("name").text,
+        "department": employee.find("department").text if employee.find("department") is not None else "",
+        "position": employee.find("position").text if employee.find("position") is not None else "",
+        "created_at": employee.get("created_at")
+    }
+
+
+class XMLStorage:
+    """Employee and attendance storage in XML files"""
+
+    def __init__(self, data_dir, journal_options=None, archive_options=None):
+        """
+        archive_options: {"granularity", "compress", "cache_records"} for a
+            partitioned attendance archive. A granularity ("day" or "month")
+            splits an existing attendance.xml on first start; an archive that
+            already exists is always used, whatever the options.
+        """
+        self.data_dir = data_dir
+        self.employees_xml = os.path.join(data_dir, "employees.xml")
+        self.attendance_xml = os.path.join(data_dir, "attendance.xml")
+        self.archive_dir = os.path.join(data_dir, "attendance")
+
+        # Lock for thread safety when accessing XML files
+        self.xml_lock = threading.Lock()
+
+        os.makedirs(data_dir, exist_ok=True)
+        archive_options = dict(archive_options or {})
+        granularity = archive_options.pop("granularity", None)
+        if granularity and not AttendanceArchive.exists(self.archive_dir) and os.path.exists(self.attendance_xml):
+            partition_attendance_xml(data_dir, granularity, **archive_options)
+        self.archive = None
+        if granularity or AttendanceArchive.exists(self.archive_dir):
+            self.archive = AttendanceArchive(self.archive_dir, granularity, **archive_options)
+        self._initialize_files()
+
+        # Check-ins are appended to a journal and compacted in the background, into
+        # attendance.xml or into the archive's partitions
+        self.journal = AttendanceJournal(
+            os.path.join(data_dir, "attendance.journal"),
+            self.archive_dir if self.archive else self.attendance_xml, self.xml_lock,
+            writer=self.archive.append if self.archive else None,
+            **(journal_options or {})
+        )
+
+        # Time-ordered index over all attendance, built on first query
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def _initialize_files(self):
+        """Initialize XML files if they don't exist"""
+        if not os.path.exists(self.employees_xml):
+            root = ET.Element("employees")
+            ET.ElementTree(root).write(self.employees_xml, encoding='utf-8', xml_declaration=True)
+            logger.info("Created new employees XML file")
+
+        if self.archive is None and not os.path.exists(self.attendance_xml):
+            root = ET.Element("attendance_records")
+            ET.ElementTree(root).write(self.attendance_xml, encoding='utf-8', xml_declaration=True)
+            logger.info("Created new attendance XML file")
+
+    def close(self):
+        self.journal.close()
+
+    # ------------------------------------------------------------------
+    # Employees
+    # ------------------------------------------------------------------
+    def get_employee(self, employee_id):
+        """Get employee data by ID, or None"""
+        with self.xml_lock:
+            root = ET.parse(self.employees_xml).getroot()
+            for employee in root.findall("employee"):
+                if employee.get("id") == employee_id:
+                    return _employee_from_element(employee)
+        return None
+
+    def list_employees(self):
+        """Get all employees"""
+        with self.xml_lock:
+            root = ET.parse(self.employees_xml).getroot()
+            return [_employee_from_element(employee) for employee in root.findall("employee")]
+
+    def save_employee(self, employee_id, name, department="", position=""):
+        """Insert or update an employee"""
+        with self.xml_lock:
+            tree = ET.parse(self.employees_xml)
+            root = tree.getroot()
+
+            # Check if employee already exists
+            existing = False
+            for employee in root.findall("employee"):
+                if employee.get("id") == employee_id:
+                    existing = True
+                    employee.find("name").text = name
+                    if employee.find("department") is not None:
+                        employee.find("department").text = department
+                    else:
+                        dept = ET.SubElement(employee, "department")
+                        dept.text = department
+
+                    if employee.find("position") is not None:
+                        employee.find("position").text = position
+                    else:
+                        pos = ET.SubElement(employee, "position")
+                        pos.text = position
+                    break
+
+            # Add new employee if not found
+            if not existing:
+                employee = ET.SubElement(root, "employee")
+                employee.set("id", employee_id)
+                employee.set("created_at", datetime.now().isoformat())
+
+                name_elem = ET.SubElement(employee, "name")
+                name_elem.text = name
+
+                dept = ET.SubElement(employee, "department")
+                dept.text = department
+
+                pos = ET.SubElement(employee, "position")
+                pos.text = position
+
+            _write_pretty(tree, self.employees_xml)
+            return True
+
+    def delete_employee(self, employee_id):
+        """Delete an employee; returns False if they did not exist"""
+        with self.xml_lock:
+            tree = ET.parse(self.employees_xml)
+            root = tree.getroot()
+
+            for employee in root.findall("employee"):
+                if employee.get("id") == employee_id:
+                    root.remove(employee)
+                    _write_pretty(tree, self.employees_xml)
+                    return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Attendance
+    # ------------------------------------------------------------------
+    def record_attendance(self, record):
+        """Append an attendance record"""
+        if self.archive is not None:
+            # Readers see it through the journal until it is compacted into its partition
+            self.journal.append(record)
+            return
+        # The buffered append and the index update stay in one step so an index being
+        # built sees the record exactly once; the fsync wait happens outside the lock
+        with self._index_lock:
+            seq = self.journal.append(record, wait=False)
+            if self._index is not None:
+                self._index.add(record)
+        self.journal.wait_synced(seq)
+
+    def _attendance_index(self):
+        with self._index_lock:
+            if self._index is None:
+                self._index = AttendanceIndex(self.attendance_records())
+                logger.info(f"Indexed {len(self._index)} attendance records")
+            return self._index
+
+    def attendance_records(self):
+        """All attendance records, compacted and journaled, in file order"""
+        self.journal.start()
+        with self.xml_lock:
+            if self.archive is not None:
+                records = self.archive.records()
+            else:
+                root = ET.parse(self.attendance_xml).getroot()
+                records = [dict(record.attrib) for record in root.findall("record")]
+            records.extend(self.journal.pending_records())
+        return records
+
+    def latest_attendance(self, limit=100):
+        """The most recent attendance records, newest first"""
+        return self.query_attendance(limit=limit)
+
+    def query_attendance(self, since=None, until=None, employee_id=None, attendance_type=None,
+                         after=None, limit=100):
+        """Filtered attendance records newest first (see module docstring)"""
+        if self.archive is None:
+            return self._attendance_index().query(since, until, employee_id, attendance_type, after, limit)
+
+        self.journal.start()
+        with self.xml_lock:
+            records = self.archive.query(since, until, employee_id, attendance_type, after, limit)
+            pending = self.journal.pending_records()
+        if not pending:
+            return records
+        # At most a compaction's worth of journaled records: filter them directly
+        pending = AttendanceIndex(pending).query(since, until, employee_id, attendance_type, after, limit)
+        records.extend(pending)
+        records.sort(key=lambda record: (record["timestamp"], record["id"]), reverse=True)
+        return records[:limit]
+
+    def attendance_count(self):
+        """Total number of attendance records"""
+        self.journal.start()
+        with self.xml_lock:
+            if self.archive is not None:
+                return self.archive.count() + self.journal.pending_count()
+            root = ET.parse(self.attendance_xml).getroot()
+            return len(root.findall("record")) + self.journal.pending_count()
+
+
+class SQLiteStorage:
+    """Employee and attendance storage in an embedded SQLite database (WAL mode)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS employees (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            department TEXT NOT NULL DEFAULT '',
+            position TEXT NOT NULL DEFAULT '',
+            created_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS attendance (
+            id TEXT PRIMARY KEY,
+            employee_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            type TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_attendance_employee ON attendance (employee_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_attendance_type ON attendance (type, timestamp);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('employees_version', 0);
+        CREATE TRIGGER IF NOT EXISTS employees_inserted AFTER INSERT ON employees BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'employees_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_updated AFTER UPDATE ON employees BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'employees_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_deleted AFTER DELETE ON employees BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'employees_version';
+        END;
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self):
+        """Per-thread connection (sqlite3 connections must not cross threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connection owned by another (finished) thread
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Employees
+    # ------------------------------------------------------------------
+    def get_employee(self, employee_id):
+        """Get employee data by ID, or None"""
+        row = self._connection().execute(
+            "SELECT id, name, department, position, created_at FROM employees WHERE id = ?",
+            (employee_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list_employees(self):
+        """Get all employees"""
+        rows = self._connection().execute(
+            "SELECT id, name, department, position, created_at FROM employees ORDER BY rowid"
+        )
+        return [dict(row) for row in rows]
+
+    def save_employee(self, employee_id, name, department="", position=""):
+        """Insert or update an employee"""
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO employees (id, name, department, position, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    name = excluded.name,
+                    department = excluded.department,
+                    position = excluded.position
+                """,
+                (employee_id, name, department or "", position or "", datetime.now().isoformat())
+            )
+        return True
+
+    def delete_employee(self, employee_id):
+        """Delete an employee; returns False if they did not exist"""
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
+        return cursor.rowcount > 0
+
+    def employees_version(self):
+        """Counter bumped by every change to the employees table, by any process"""
+        return self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'employees_version'"
+        ).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Attendance
+    # ------------------------------------------------------------------
+    def record_attendance(self, record):
+        """Append an attendance record"""
+        self.record_attendance_many([record])
+
+    def record_attendance_if(self, employee_id, make_record):
+        """
+        Read the employee's latest attendance record (or None) and insert
+        make_record(latest) in one write transaction, so processes sharing the
+        database decide on the same history. make_record returns None to insert
+        nothing. Returns (latest, inserted record or None).
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, employee_id, timestamp, type FROM attendance WHERE employee_id = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT 1",
+                (employee_id,)
+            ).fetchone()
+            latest = dict(row) if row else None
+            record = make_record(latest)
+            if record is not None:
+                conn.execute(
+                    "INSERT INTO attendance (id, employee_id, timestamp, type) VALUES (?, ?, ?, ?)",
+                    tuple(record[field] for field in ATTENDANCE_FIELDS)
+                )
+        return latest, record
+
+    def record_attendance_many(self, records):
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO attendance (id, employee_id, timestamp, type) VALUES (?, ?, ?, ?)",
+                [tuple(record[field] for field in ATTENDANCE_FIELDS) for record in records]
+            )
+
+    def attendance_records(self):
+        """All attendance records in timestamp order"""
+        rows = self._connection().execute(
+            "SELECT id, employee_id, timestamp, type FROM attendance ORDER BY timestamp"
+        )
+        return [dict(row) for row in rows]
+
+    def latest_attendance(self, limit=100):
+        """The most recent attendance records, newest first"""
+        return self.query_attendance(limit=limit)
+
+    def query_attendance(self, since=None, until=None, employee_id=None, attendance_type=None,
+                         after=None, limit=100):
+        """Filtered attendance records newest first (see module docstring)"""
+        clauses, params = [], []
+        if employee_id is not None:
+            clauses.append("employee_id = ?")
+            params.append(employee_id)
+        if attendance_type is not None:
+            clauses.append("type = ?")
+            params.append(attendance_type)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if after is not None:
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT id, employee_id, timestamp, type FROM attendance {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit]
+        )
+        return [dict(row) for row in rows]
+
+    def attendance_count(self):
+        """Total number of attendance records"""
+        return self._connection().execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+
+
+class EmployeeDirectory:
+    """
+    In-memory employee index keyed by id in front of a storage backend.
+
+    Loaded once, updated in place by save/delete, and reloaded when the backing
+    employees file is modified by someone else (detected through its mtime, or
+    the employees version of a SQLite database).
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.watch_path = getattr(storage, "employees_xml", None)
+        self.watch_version = getattr(storage, "employees_version", None)
+        self._lock = threading.RLock()
+        self._employees = None
+        self._mtime = None
+
+    def _current_mtime(self):
+        if self.watch_version is not None:
+            return self.watch_version()
+        if not self.watch_path:
+            return None
+        try:
+            return os.stat(self.watch_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _ensure_loaded(self):
+        mtime = self._current_mtime()
+        if self._employees is not None and mtime == self._mtime:
+            return self._employees
+        with self._lock:
+            if self._employees is None or mtime != self._mtime:
+                self._employees = {employee["id"]: employee for employee in self.storage.list_employees()}
+                self._mtime = mtime
+                logger.info(f"Loaded {len(self._employees)} employees into the directory")
+            return self._employees
+
+    def invalidate(self):
+        with self._lock:
+            self._employees = None
+
+    def snapshot(self):
+        """Current {employee_id: employee} mapping; treat it as read-only"""
+        return self._ensure_loaded()
+
+    def get(self, employee_id):
+        """Employee dict by id, or None"""
+        employee = self._ensure_loaded().get(employee_id)
+        return dict(employee) if employee else None
+
+    def count(self):
+        """Number of employees"""
+        return len(self._ensure_loaded())
+
+    def all(self):
+        """All employees in insertion order"""
+        return [dict(employee) for employee in self._ensure_loaded().values()]
+
+    def save(self, employee_id, name, department="", position=""):
+        """Insert or update an employee in storage and in the directory"""
+        with self._lock:
+            employees = self._ensure_loaded()
+            self.storage.save_employee(employee_id, name, department, position)
+            previous = employees.get(employee_id)
+            updated = dict(employees)
+            updated[employee_id] = {
+                "id": employee_id,
+                "name": name,
+                "department": department,
+                "position": position,
+                "created_at": previous["created_at"] if previous else datetime.now().isoformat(),
+            }
+            if previous is None:
+                # created_at is assigned by the backend; read it back once
+                updated[employee_id] = self.storage.get_employee(employee_id) or updated[employee_id]
+            self._employees = updated
+            self._mtime = self._current_mtime()
+            return True
+
+    def delete(self, employee_id):
+        """Delete an employee from storage and from the directory"""
+        with self._lock:
+            employees = self._ensure_loaded()
+            deleted = self.storage.delete_employee(employee_id)
+            if employee_id in employees:
+                updated = dict(employees)
+                del updated[employee_id]
+                self._employees = updated
+            self._mtime = self._current_mtime()
+            return deleted
+
+
+def create_storage(backend, data_dir, db_path=None, journal_options=None, archive_options=None):
+    """Build the configured storage backend ("xml" or "sqlite")"""
+    if backend == "xml":
+        return XMLStorage(data_dir, journal_options=journal_options, archive_options=archive_options)
+    if backend == "sqlite":
+        return SQLiteStorage(db_path or os.path.join(data_dir, "facetrack.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def migrate_xml_to_sqlite(data_dir, db_path):
+    """Copy employees and attendance from the XML files into SQLite"""
+    source = XMLStorage(data_dir)
+    target = SQLiteStorage(db_path)
+    try:
+        employees = source.list_employees()
+        with target._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO employees (id, name, department, position, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(e["id"], e["name"], e["department"] or "", e["position"] or "", e["created_at"])
+                 for e in employees]
+            )
+        records = source.attendance_records()
+        target.record_attendance_many(records)
+        logger.info(f"Migrated {len(employees)} employees and {len(records)} attendance records to {db_path}")
+        return len(employees), len(records)
+    finally:
+        source.close()
+        target.close()
+
+
+def export_sqlite_to_xml(db_path, data_dir):
+    """Write the SQLite contents to employees.xml and attendance.xml"""
+    source = SQLiteStorage(db_path)
+    try:
+        os.makedirs(data_dir, exist_ok=True)
+        employees = source.list_employees()
+        root = ET.Element("employees")
+        for e in employees:
+            employee = ET.SubElement(root, "employee", id=e["id"])
+            if e["created_at"]:
+                employee.set("created_at", e["created_at"])
+            for field in ("name", "department", "position"):
+                ET.SubElement(employee, field).text = e[field]
+        _write_pretty(ET.ElementTree(root), os.path.join(data_dir, "employees.xml"))
+
+        records = source.attendance_records()
+        root = ET.Element("attendance_records")
+        for record in records:
+            ET.SubElement(root, "record", {field: record[field] for field in ATTENDANCE_FIELDS})
+        _write_pretty(ET.ElementTree(root), os.path.join(data_dir, "attendance.xml"))
+
+        logger.info(f"Exported {len(employees)} employees and {len(records)} attendance records to {data_dir}")
+        return len(employees), len(records)
+    finally:
+        source.close()
+
+
+def partition_attendance_xml(data_dir, granularity="month", compress=True, cache_records=100000):
+    """Split attendance.xml (and any uncompacted journal) into a partitioned archive"""
+    archive_dir = os.path.join(data_dir, "attendance")
+    if AttendanceArchive.exists(archive_dir):
+        raise ValueError(f"{archive_dir} is already a partitioned attendance archive")
+    source = XMLStorage(data_dir)
+    try:
+        records = source.attendance_records()
+    finally:
+        # Folds a leftover journal into attendance.xml, so nothing is replayed twice
+        source.close()
+
+    archive = AttendanceArchive(archive_dir, granularity, compress=compress, cache_records=cache_records)
+    archive.append(records)
+    # Keep the original file, under a name nothing reads any more
+    os.replace(source.attendance_xml, source.attendance_xml + ".pre-partition")
+    logger.info(f"Partitioned {len(records)} attendance records by {archive.granularity} "
+                f"into {len(archive.partitions)} partitions under {archive_dir}")
+    return len(records), len(archive.partitions)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Migrate FaceTrack data between XML and SQLite")
+    parser.add_argument("command", choices=["migrate", "export", "partition"])
+    parser.add_argument("--data-dir", default="face_data")
+    parser.add_argument("--db", default=None, help="SQLite database (default: <data-dir>/facetrack.db)")
+    parser.add_argument("--granularity", choices=["day", "month"], default="month",
+                        help="attendance partition size for `partition`")
+    parser.add_argument("--no-compress", action="store_true", help="leave sealed partitions uncompressed")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(args.data_dir, "facetrack.db")
+    if args.command == "migrate":
+        migrate_xml_to_sqlite(args.data_dir, db_path)
+    elif args.command == "partition":
+        partition_attendance_xml(args.data_dir, args.granularity, compress=not args.no_compress)
+    else:
+        export_sqlite_to_xml(db_path, args.data_dir)
+
+
+if __name__ == "__main__":
+    main()